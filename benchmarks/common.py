@@ -0,0 +1,44 @@
+"""Synthetic census-like datasets for the benchmarks."""
+
+import numpy as np
+import pandas as pd
+
+# domain sizes of census columns, cycled through for wider datasets
+CENSUS_DOMAIN_SIZES = (6, 2, 6, 2, 8, 5, 2, 3, 4, 9, 8, 4, 2, 5, 6, 3)
+
+
+def make_metadata(width):
+    """Metadata of ``width`` finite columns, in the census.json format."""
+
+    return [
+        {
+            "name": f"col{i}",
+            "type": "finite",
+            "representation": [
+                str(v)
+                for v in range(
+                    CENSUS_DOMAIN_SIZES[i % len(CENSUS_DOMAIN_SIZES)]
+                )
+            ],
+        }
+        for i in range(width)
+    ]
+
+
+def make_dataset(rows, metadata, seed=0):
+    """A dataset following ``metadata``, where each column copies the one
+    before it (modulo its domain size) for half of the rows, so that methods
+    have some structure to find."""
+
+    rng = np.random.default_rng(seed)
+    columns = {}
+    previous = None
+    for col in metadata:
+        size = len(col["representation"])
+        codes = rng.integers(0, size, rows)
+        if previous is not None:
+            copy = rng.random(rows) < 0.5
+            codes[copy] = previous[copy] % size
+        columns[col["name"]] = np.asarray(col["representation"])[codes]
+        previous = codes
+    return pd.DataFrame(columns)
@@ -0,0 +1,121 @@
+"""Stage timings and peak memory of the generators, over rows and widths.
+
+Run with ``asv run``, or ``asv run --quick --bench Generators`` for a single
+pass. Every sample gets a fresh generator from ``setup``.
+"""
+
+import functools
+import tempfile
+
+import numpy as np
+
+from reprosyn.methods import (
+    DS_BAYNET,
+    DS_INDHIST,
+    DS_PRIVBAYES,
+    IPF,
+    MST,
+    PRIVBAYES,
+    SYNTHPOP,
+)
+
+from .common import make_dataset, make_metadata
+
+METHODS = {
+    "IPF": IPF,
+    "IPF_DENSE": functools.partial(IPF, dense=True),
+    "MST": MST,
+    "PRIVBAYES": PRIVBAYES,
+    "DS_INDHIST": DS_INDHIST,
+    "DS_BAYNET": DS_BAYNET,
+    "DS_PRIVBAYES": DS_PRIVBAYES,
+    "SYNTHPOP": SYNTHPOP,
+}
+
+# dense IPF counts the full joint domain, skip it past this many cells
+IPF_MAX_CELLS = 10**7
+
+
+class _Generator:
+    params = (list(METHODS), [1_000, 10_000, 100_000], [4, 8, 16])
+    param_names = ["method", "rows", "width"]
+
+    number = 1
+    repeat = (1, 3, 60.0)
+    warmup_time = 0.0
+    timeout = 1800.0
+
+    def setup(self, method, rows, width):
+        metadata = make_metadata(width)
+        domain = np.prod([len(col["representation"]) for col in metadata])
+        if method == "IPF_DENSE" and domain > IPF_MAX_CELLS:
+            raise NotImplementedError("IPF domain too large")
+
+        self.out = tempfile.TemporaryDirectory()
+        self.gen = METHODS[method](
+            dataset=make_dataset(rows, metadata),
+            metadata=metadata,
+            size=rows,
+            out=self.out.name,
+        )
+
+    def teardown(self, method, rows, width):
+        self.out.cleanup()
+
+
+class Generators(_Generator):
+    def time_preprocess(self, method, rows, width):
+        self.gen.preprocess()
+
+    def time_fit_generate(self, method, rows, width):
+        # generate fits the model on first call
+        self.gen.preprocess()
+        self.gen.generate()
+
+    def peakmem_run(self, method, rows, width):
+        self.gen.run()
+
+
+class Saving(_Generator):
+    """The stages following generate."""
+
+    def setup(self, method, rows, width):
+        super().setup(method, rows, width)
+        self.gen.preprocess()
+        self.gen.generate()
+
+    def time_postprocess_save(self, method, rows, width):
+        self.gen.postprocess()
+        self.gen.save()
+
+
+class Sampling:
+    """Generating from an already fitted model, for methods that keep one."""
+
+    params = (
+        ["MST", "PRIVBAYES", "DS_INDHIST", "DS_BAYNET", "DS_PRIVBAYES"],
+        [10_000, 100_000, 1_000_000],
+        [8],
+    )
+    param_names = ["method", "size", "width"]
+
+    number = 1
+    repeat = (1, 3, 60.0)
+    warmup_time = 0.0
+    timeout = 1800.0
+
+    def setup(self, method, size, width):
+        metadata = make_metadata(width)
+        self.gen = METHODS[method](
+            dataset=make_dataset(10_000, metadata),
+            metadata=metadata,
+            size=size,
+        )
+        self.gen.preprocess()
+        self.gen.generate()
+
+    def time_generate(self, method, size, width):
+        self.gen.generate()
+
+    def peakmem_generate(self, method, size, width):
+        self.gen.generate()
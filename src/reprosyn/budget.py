@@ -0,0 +1,234 @@
+"""Privacy budget accounting across pipeline runs.
+
+Each run is converted to zero-concentrated differential privacy (zCDP), where
+the rho of independent runs on the same source simply add up. A
+:class:`PrivacyLedger` stores every charge in a local SQLite file, so the
+cumulative spend survives restarts and is shared by all worker processes
+using the same file.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import sqlite3
+import time
+
+import pandas as pd
+
+from reprosyn.methods.mbi.accountant import cdp_rho
+
+
+# relative slack when comparing summed rho against the budget
+BUDGET_RTOL = 1e-9
+
+
+class BudgetExceededError(Exception):
+    """Raised when a run would exceed the configured privacy budget."""
+
+
+def zcdp_rho(epsilon, delta=0.0):
+    """The zCDP parameter rho implied by a run's privacy parameters.
+
+    Parameters
+    ----------
+    epsilon : float
+        privacy parameter epsilon
+    delta : float, optional
+        privacy parameter delta, by default 0.0
+
+    Returns
+    -------
+    float
+        rho, using :func:`~reprosyn.methods.mbi.accountant.cdp_rho` for
+        (epsilon, delta)-DP, and ``epsilon**2 / 2`` for pure epsilon-DP
+
+    Notes
+    -----
+    This treats every run as a zCDP mechanism calibrated to (epsilon,
+    delta), as MST is. It is unsound for mechanisms that only satisfy
+    approximate (epsilon, delta)-DP, such as PATEGAN and the
+    DataSynthesizer methods, which are not rho-zCDP for the rho returned,
+    so their spend is undercounted.
+    """
+
+    if not delta:
+        return epsilon**2 / 2
+    return cdp_rho(epsilon, delta)
+
+
+def dataset_fingerprint(data: pd.DataFrame):
+    """A stable identifier of a dataset, used as its ledger source.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        dataset
+
+    Returns
+    -------
+    str
+        sha256 of the row hashes and column names
+    """
+
+    digest = hashlib.sha256()
+    digest.update("\x1f".join(map(str, data.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=False).values)
+    return digest.hexdigest()
+
+
+class PrivacyLedger:
+    """A persistent ledger of privacy spend per data source.
+
+    Parameters
+    ----------
+    path : str
+        SQLite file holding the ledger, created if it does not exist
+    epsilon : float
+        total privacy budget epsilon of each source
+    delta : float, optional
+        total privacy budget delta of each source, by default 0.0
+    timeout : float, optional
+        seconds to wait for other processes holding the ledger lock, by
+        default 30.0
+
+    Attributes
+    ----------
+    budget : float
+        total budget of each source, as zCDP rho
+
+    Notes
+    -----
+    Charges are converted with :func:`zcdp_rho`, which assumes each run is
+    a zCDP mechanism. The ledger is only sound for such methods, e.g. MST,
+    and undercounts the spend of approximate-DP methods such as PATEGAN
+    and the DataSynthesizer methods.
+    """
+
+    def __init__(self, path, epsilon, delta=0.0, timeout=30.0):
+        self.path = str(path)
+        self.timeout = timeout
+        self.budget = zcdp_rho(epsilon, delta)
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS charges ("
+                "id INTEGER PRIMARY KEY, source TEXT NOT NULL, method TEXT, "
+                "epsilon REAL, delta REAL, rho REAL NOT NULL, created REAL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS charges_source "
+                "ON charges (source)"
+            )
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # autocommit, transactions are opened explicitly where needed
+        conn = sqlite3.connect(
+            self.path, timeout=self.timeout, isolation_level=None
+        )
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _source_key(source):
+        if isinstance(source, pd.DataFrame):
+            return dataset_fingerprint(source)
+        return str(source)
+
+    @staticmethod
+    def _spent(conn, source):
+        (rho,) = conn.execute(
+            "SELECT COALESCE(SUM(rho), 0.0) FROM charges WHERE source = ?",
+            (source,),
+        ).fetchone()
+        return rho
+
+    def spent(self, source):
+        """Total rho charged to a source.
+
+        Parameters
+        ----------
+        source : str | pd.DataFrame
+            source name, or a dataset, see :func:`dataset_fingerprint`
+        """
+
+        with self._connect() as conn:
+            return self._spent(conn, self._source_key(source))
+
+    def remaining(self, source):
+        """Rho left in the budget of a source."""
+
+        return self.budget - self.spent(source)
+
+    def charge(self, source, epsilon, delta=0.0, method=None):
+        """Records a run against a source, if it fits in the budget.
+
+        The check and the record happen in one exclusive transaction, so
+        concurrent workers cannot overspend between them.
+
+        Parameters
+        ----------
+        source : str | pd.DataFrame
+            source name, or a dataset, see :func:`dataset_fingerprint`
+        epsilon : float
+            privacy parameter epsilon of the run
+        delta : float, optional
+            privacy parameter delta of the run, by default 0.0
+        method : str, optional
+            name of the method, recorded for reference
+
+        Returns
+        -------
+        float
+            rho charged
+
+        Raises
+        ------
+        BudgetExceededError
+            If the run would exceed the budget, in which case nothing is
+            recorded.
+        """
+
+        source = self._source_key(source)
+        rho = zcdp_rho(epsilon, delta)
+
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            spent = self._spent(conn, source)
+            if spent + rho > self.budget * (1 + BUDGET_RTOL):
+                conn.execute("ROLLBACK")
+                raise BudgetExceededError(
+                    f"Run needs rho={rho:.6g} but only "
+                    f"{max(self.budget - spent, 0.0):.6g} of {self.budget:.6g}"
+                    f" remains for source {source[:16]}"
+                )
+            conn.execute(
+                "INSERT INTO charges "
+                "(source, method, epsilon, delta, rho, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (source, method, epsilon, delta, rho, time.time()),
+            )
+            conn.execute("COMMIT")
+
+        return rho
+
+    def history(self, source):
+        """All charges of a source, oldest first.
+
+        Returns
+        -------
+        pd.DataFrame
+            columns method, epsilon, delta, rho and created (unix time)
+        """
+
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                "SELECT method, epsilon, delta, rho, created FROM charges "
+                "WHERE source = ? ORDER BY id",
+                conn,
+                params=(self._source_key(source),),
+            )
@@ -7,9 +7,19 @@ from io import StringIO
 import os
 
 import click
+import pandas as pd
 
+from reprosyn.budget import PrivacyLedger
+from reprosyn.evaluation import Evaluator
+from reprosyn.profiling import PROFILERS, RunProfiler
 from reprosyn.generator import PipelineBase
-from reprosyn.cli_utils import wrap_generator, get_config_path
+from reprosyn.cli_utils import (
+    ProgressPrinter,
+    Size,
+    run_generator,
+    wrap_generator,
+    get_config_path,
+)
 
 # from reprosyn.methods.ipf.cli import ipfcommand
 from reprosyn.methods import COMMANDS
@@ -35,6 +45,63 @@ from reprosyn.methods import COMMANDS
     type=int,
     help="number of rows to synthesise",
 )
+@click.option(
+    "--chunksize",
+    type=click.IntRange(min=1),
+    default=None,
+    help="generate and write the output in chunks of this many rows",
+)
+@click.option(
+    "--threads",
+    type=click.IntRange(min=1),
+    default=None,
+    help="intra-op threads of TensorFlow/torch, and BLAS threads",
+)
+@click.option(
+    "--interop_threads",
+    type=click.IntRange(min=1),
+    default=None,
+    help="inter-op threads of TensorFlow/torch",
+)
+@click.option(
+    "--stats",
+    is_flag=True,
+    help="append per-stage time and memory to run_stats.jsonl in --out",
+)
+@click.option(
+    "--progress",
+    is_flag=True,
+    help="log the iterations, losses and ETA of long fits to stderr",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="profile the run, writing the profile and a summary to --out",
+)
+@click.option(
+    "--profiler",
+    type=click.Choice(PROFILERS),
+    default="auto",
+    help="profiler of --profile, auto uses pyinstrument if installed",
+)
+@click.option(
+    "--profile_top",
+    type=click.IntRange(min=1),
+    default=30,
+    help="number of functions in the --profile summary",
+)
+@click.option(
+    "--max_memory",
+    type=Size(),
+    default=None,
+    help="refuse runs estimated to need more memory, e.g. 8G",
+)
+@click.option(
+    "--dry_run",
+    "--dry-run",
+    is_flag=True,
+    help="print the estimated memory and compute of the run, and exit",
+)
 @click.option(
     "--generateconfig",
     is_flag=True,
@@ -66,6 +133,25 @@ from reprosyn.methods import COMMANDS
     default=None,
     help="domain to use, in privacy toolbox format, defaults to census",
 )
+@click.option(
+    "--ledger",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="SQLite privacy ledger to charge, refuses runs over budget. "
+    "Assumes every method is zCDP, undercounting approximate-DP methods",
+)
+@click.option(
+    "--budget_epsilon",
+    type=float,
+    default=1.0,
+    help="total epsilon of each dataset in --ledger",
+)
+@click.option(
+    "--budget_delta",
+    type=float,
+    default=1e-5,
+    help="total delta of each dataset in --ledger",
+)
 @click.pass_context
 def cli(ctx, **params):
     """A cli tool synthesising the 1% census
@@ -95,6 +181,18 @@ def cli(ctx, **params):
         )  # if nothing given with not update
 
     ctx.default_map = {ctx.invoked_subcommand: config_params}
+
+    # generators receive a ledger object, rather than its configuration
+    budget = ctx.params.pop("budget_epsilon"), ctx.params.pop("budget_delta")
+    if params["ledger"] is not None:
+        ctx.params["ledger"] = PrivacyLedger(params["ledger"], *budget)
+
+    # generators receive a progress callback, rather than the flag
+    ctx.params["progress"] = ProgressPrinter() if params["progress"] else None
+
+    profile = [ctx.params.pop(k) for k in ["profiler", "profile_top"]]
+    if ctx.params.pop("profile") and not params["generateconfig"]:
+        _start_profile(ctx, *profile)
     # print(f"Executing generator {ctx.invoked_subcommand}")
 
 
@@ -148,11 +246,91 @@ def custom(ctx, location):
         raise ValueError("location must specify a GeneratorFunc subclass.")
 
     generator = gen(**ctx.parent.params, **method_args)
-    generator.run()
+    run_generator(generator)
 
     return generator.output
 
 
+@cli.command(
+    "evaluate", short_help="Score synthetic datasets against --dataset"
+)
+@click.argument(
+    "synthetic", nargs=-1, required=True, type=click.Path(exists=True)
+)
+@click.option(
+    "--k",
+    type=click.IntRange(min=1),
+    default=3,
+    help="largest order of the marginals compared by total variation distance",
+)
+@click.option(
+    "--bins",
+    type=click.IntRange(min=1),
+    default=20,
+    help="bins of numeric columns with more distinct values than this",
+)
+@click.option(
+    "--propensity/--no-propensity",
+    default=True,
+    help="whether to score propensity pMSE",
+)
+@click.option(
+    "--propensity_rows",
+    type=click.IntRange(min=1),
+    default=None,
+    help="rows sampled from each dataset to fit the propensity model",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    help="threads counting marginals",
+)
+@click.pass_context
+def evaluate(ctx, synthetic, **params):
+    """Score synthetic datasets against the real --dataset.
+
+    Prints one CSV row of metrics per synthetic dataset, see
+    :meth:`reprosyn.evaluation.Evaluator.score`. The real dataset is encoded
+    once, so scoring a sweep of outputs is cheap.
+
+    E.g. ``rsyn --dataset census.csv evaluate mst/output.csv ipf/output.csv``
+    """
+
+    dataset = ctx.parent.params["dataset"]
+    if dataset.isatty():
+        click.echo("Please give a dataset using --dataset or STDIN")
+        click.echo(ctx.get_help())
+        return
+
+    evaluator = Evaluator(pd.read_csv(dataset), **params)
+    scores = pd.DataFrame(
+        [evaluator.score(pd.read_csv(path)) for path in synthetic],
+        index=pd.Index(synthetic, name="synthetic"),
+    )
+    click.echo(scores.to_csv(), nl=False)
+
+
+def _start_profile(ctx, profiler, top):
+    """Profiles the rest of the command, alongside per-stage timings, and
+    saves the profile to --out once it is done."""
+
+    try:
+        profiler = RunProfiler(profiler, top)
+    except ValueError as err:
+        raise click.BadParameter(str(err), param_hint="--profiler")
+
+    ctx.params["stats"] = True
+
+    def save():
+        profiler.stop()
+        for fn in profiler.save(ctx.params["out"]):
+            click.echo(f"Profile written to {fn}", err=True)
+
+    ctx.call_on_close(save)
+    profiler.start()
+
+
 def _load_generator_class(location):
     """Find and load a generator class from a `path:name` string."""
 
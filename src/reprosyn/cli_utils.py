@@ -1,6 +1,10 @@
 import click
+import datetime
 import json
 import os
+import time
+
+from reprosyn.costs import parse_size
 
 
 def get_config_path(params):
@@ -35,3 +39,78 @@ def wrap_generator(func):
                 _print_help()
 
     return wrapper
+
+
+def run_generator(generator):
+    """Runs ``generator``, printing its estimate as a JSON line on a dry
+    run, see :meth:`~reprosyn.generator.PipelineBase.run`."""
+
+    estimate = generator.run()
+    if estimate is not None:
+        click.echo(json.dumps(estimate))
+
+
+class ProgressPrinter:
+    """Logs progress events to stderr, see
+    :class:`~reprosyn.instrumentation.ProgressReporter`.
+
+    Each stage is logged at most every ``interval`` seconds, and on its last
+    iteration.
+    """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.logged = {}
+
+    def __call__(self, event):
+        now = time.monotonic()
+        last = (
+            event["total"] is not None and event["iteration"] >= event["total"]
+        )
+        logged = self.logged.get(event["stage"])
+        if not last and logged is not None and now - logged < self.interval:
+            return
+        self.logged[event["stage"]] = now
+        click.echo(format_progress(event), err=True)
+
+
+def format_progress(event):
+    """One line summary of a progress event"""
+
+    parts = [event["stage"]]
+    if event["total"]:
+        percent = 100 * event["iteration"] / event["total"]
+        parts.append(f"{event['iteration']}/{event['total']} ({percent:.0f}%)")
+    else:
+        parts.append(str(event["iteration"]))
+
+    loss = event["loss"]
+    if isinstance(loss, dict):
+        parts += [f"{name} loss {value:.4g}" for name, value in loss.items()]
+    elif loss is not None:
+        parts.append(f"loss {loss:.4g}")
+
+    if event["iterations_per_sec"]:
+        parts.append(f"{event['iterations_per_sec']:.3g} it/s")
+    if event["rows_per_sec"]:
+        parts.append(f"{event['rows_per_sec']:.3g} rows/s")
+    if event["eta"] is not None:
+        eta = datetime.timedelta(seconds=round(event["eta"]))
+        parts.append(f"eta {eta}")
+
+    return ", ".join(parts)
+
+
+class Size(click.ParamType):
+    """A number of bytes, e.g. ``512M`` or ``8G``, see
+    :func:`~reprosyn.costs.parse_size`."""
+
+    name = "size"
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, int):
+            return value
+        try:
+            return parse_size(value)
+        except ValueError as err:
+            self.fail(str(err), param, ctx)
@@ -0,0 +1,112 @@
+"""Estimates of the peak memory and compute of runs, before they start.
+
+Methods implement :meth:`~reprosyn.generator.PipelineBase.estimate_cost`
+from the domain sizes in their metadata and their parameters, without
+reading or allocating anything proportional to the domain. ``rsyn
+--dry_run`` reports the estimates, and ``max_memory`` refuses runs over a
+limit.
+
+Estimates are upper bounds of the order of magnitude, not predictions: peak
+memory in bytes, and compute in elementary cell operations, which are only
+comparable between methods to within a constant factor.
+"""
+
+import math
+import os
+import re
+
+# bytes of a float64 or int64 cell
+BYTES_PER_CELL = 8
+
+UNITS = {"": 1, "K": 2**10, "M": 2**20, "G": 2**30, "T": 2**40}
+
+
+class ResourceLimitError(Exception):
+    """Raised when a run is estimated to need more than its limits."""
+
+
+def domain_sizes(metadata, numeric_size=1):
+    """Number of values of each column of ``metadata``.
+
+    Parameters
+    ----------
+    metadata : list[dict]
+        metadata, see `Data Format <https://privacy-sdg-toolbox.readthedocs.io/en/latest/dataset-schema.html>`_
+    numeric_size : int, optional
+        size given to numeric columns, e.g. their number of histogram bins,
+        by default 1
+
+    Returns
+    -------
+    list[int]
+        the number of categories of finite columns, and ``numeric_size`` of
+        the others
+    """
+
+    return [
+        len(col["representation"]) if "finite" in col["type"] else numeric_size
+        for col in metadata
+    ]
+
+
+def clique_cells(sizes, k):
+    """Cells of the largest ``k``-way marginal of columns of ``sizes``, an
+    exact integer however large it gets."""
+
+    return math.prod(sorted(sizes, reverse=True)[:k])
+
+
+def pair_cells(sizes):
+    """Cells of all 2-way marginals of columns of ``sizes``."""
+
+    total = sum(sizes)
+    return (total**2 - sum(n**2 for n in sizes)) // 2
+
+
+def tree_cells(sizes):
+    """Cells of the largest 2-way marginals spanning a tree over columns of
+    ``sizes``: the star around the largest column."""
+
+    if not sizes:
+        return 0
+    return max(sizes) * (sum(sizes) - max(sizes))
+
+
+def physical_memory():
+    """Total physical memory of the machine.
+
+    Returns
+    -------
+    int | None
+        bytes, or None where the platform does not report it
+    """
+
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def parse_size(size):
+    """Bytes in a size such as ``512M``, ``8GB``, ``1.5G`` or ``1000``,
+    with binary units.
+
+    Raises
+    ------
+    ValueError
+        If ``size`` is not a number with an optional K, M, G or T unit.
+    """
+
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMGT]?)i?B?\s*", str(size).upper())
+    if match is None:
+        raise ValueError(f"Invalid size {size}, e.g. 512M or 8G")
+    return int(float(match[1]) * UNITS[match[2]])
+
+
+def format_size(size):
+    """``size`` bytes in the largest binary unit below it, e.g. ``1.5G``."""
+
+    for unit in reversed(UNITS):
+        if size >= UNITS[unit]:
+            return f"{size / UNITS[unit]:.3g}{unit}"
+    return f"{size:.3g}"
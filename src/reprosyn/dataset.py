@@ -135,9 +135,10 @@ class Dataset:
         if isinstance(metadata, list):
             return metadata
         elif isinstance(metadata, io.TextIOWrapper):
-            return json.loads(metadata)
+            return json.load(metadata)
         elif path.isfile(metadata):
-            return json.loads(metadata)
+            with open(metadata) as f:
+                return json.load(f)
         elif _is_url(metadata):
             return _json_from_url(metadata)
         else:
@@ -0,0 +1,303 @@
+"""Fidelity of synthetic data to the dataset it was generated from.
+
+Both datasets are encoded once to integer codes over the categories of the
+real data, with numeric columns of many distinct values cut into bins. All
+k-way marginals are then counted with one ``np.bincount`` per chunk of rows
+(see :mod:`reprosyn.marginals`), rather than a pandas projection per
+marginal. An :class:`Evaluator` keeps the encoding and the statistics of the
+real data, so scoring a sweep of synthetic outputs only pays for those once.
+"""
+
+from __future__ import annotations
+
+import itertools
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.linear_model import LogisticRegression
+
+from reprosyn.marginals import (
+    marginal_counts,
+    pairwise_cramers_v,
+    pairwise_normalized_mutual_information,
+)
+
+
+class Evaluator:
+    """Scores synthetic datasets against a real dataset.
+
+    Parameters
+    ----------
+    real : pd.DataFrame
+        real dataset, synthetic datasets are compared on its columns
+    k : int, optional
+        largest order of the marginals compared by total variation distance,
+        by default 3
+    bins : int, optional
+        numeric columns with more distinct values than this are cut into
+        this many equal-width bins over the range of the real data, by
+        default 20
+    propensity : bool, optional
+        whether to score propensity pMSE, by default True
+    propensity_rows : int, optional
+        rows sampled from each dataset to fit the propensity model, by
+        default None, which uses all rows
+    workers : int, optional
+        threads counting marginals, by default 1
+    seed : int, optional
+        seed of the propensity row sampling, by default None
+
+    Attributes
+    ----------
+    columns : list
+        columns compared
+    shape : list[int]
+        number of codes of each column, including one for missing values
+        and one for values that do not occur in the real data
+    """
+
+    def __init__(
+        self,
+        real: pd.DataFrame,
+        k=3,
+        bins=20,
+        propensity=True,
+        propensity_rows=None,
+        workers=1,
+        seed=None,
+    ):
+        self.columns = list(real.columns)
+        self.k = min(k, len(self.columns))
+        self.propensity = propensity
+        self.propensity_rows = propensity_rows
+        self.workers = workers
+        self.rng = np.random.default_rng(seed)
+
+        self.encoders = [_fit_encoder(real[col], bins) for col in self.columns]
+        self.shape = [len(categories) + 2 for categories in self.encoders]
+        self.numeric = [col for col in self.columns if _is_numeric(real[col])]
+
+        self.real_codes = self.encode(real)
+        self.real_stats = self._statistics(real, self.real_codes)
+
+    def encode(self, data: pd.DataFrame):
+        """Integer codes of a dataset over the categories of the real data.
+
+        Returns
+        -------
+        np.ndarray
+            codes of shape (rows, columns), where column ``i`` takes values
+            in ``range(self.shape[i])``
+        """
+
+        missing = [col for col in self.columns if col not in data.columns]
+        if missing:
+            raise ValueError(f"Columns missing from synthetic data: {missing}")
+
+        codes = np.empty((len(data), len(self.columns)), dtype=np.intp)
+        for j, (col, categories) in enumerate(
+            zip(self.columns, self.encoders)
+        ):
+            codes[:, j] = _encode(data[col], categories)
+        return codes
+
+    def _marginal_counts(self, codes, k):
+        return marginal_counts(
+            codes,
+            self.shape,
+            list(itertools.combinations(range(len(self.columns)), k)),
+            workers=self.workers,
+        )
+
+    def _statistics(self, data, codes):
+        stats = {
+            "marginals": {
+                k: self._marginal_counts(codes, k)
+                for k in range(1, self.k + 1)
+            },
+            "mutual_information": pairwise_normalized_mutual_information(
+                codes, self.shape, self.workers
+            ),
+            "cramers_v": pairwise_cramers_v(codes, self.shape, self.workers),
+        }
+        if len(self.numeric) > 1:
+            stats["correlation"] = (
+                data[self.numeric].astype(float).corr().to_numpy()
+            )
+        return stats
+
+    def marginal_tvd(self, synthetic: pd.DataFrame, k=2):
+        """Total variation distance of every k-way marginal.
+
+        Returns
+        -------
+        pd.Series
+            distance of each marginal, indexed by its column names
+        """
+
+        if not 1 <= k <= self.k:
+            raise ValueError(f"k must be between 1 and {self.k}")
+
+        codes = self.encode(synthetic)
+        return self._marginal_tvd(
+            k, self._marginal_counts(codes, k), len(codes)
+        )
+
+    def _marginal_tvd(self, k, synthetic_counts, nsynthetic):
+        real_counts, offsets = self.real_stats["marginals"][k]
+        counts, _ = synthetic_counts
+        diff = np.abs(
+            real_counts / max(len(self.real_codes), 1)
+            - counts / max(nsynthetic, 1)
+        )
+        tvd = np.add.reduceat(diff, offsets[:-1]) / 2
+        index = list(itertools.combinations(self.columns, k))
+        return pd.Series(tvd, index=pd.MultiIndex.from_tuples(index))
+
+    def propensity_mse(self, synthetic: pd.DataFrame):
+        """Propensity mean squared error (pMSE) of a synthetic dataset.
+
+        A logistic regression on the one-hot codes of all columns predicts
+        whether a row is synthetic. pMSE is the mean squared difference
+        between its predictions and the share of synthetic rows, 0 when the
+        datasets are indistinguishable.
+        """
+
+        return self._propensity_mse(self.encode(synthetic))
+
+    def _propensity_mse(self, codes):
+        real = self._sample(self.real_codes)
+        synthetic = self._sample(codes)
+        if len(real) == 0 or len(synthetic) == 0:
+            return np.nan
+
+        labels = np.r_[np.zeros(len(real)), np.ones(len(synthetic))]
+
+        features = _one_hot(np.concatenate([real, synthetic]), self.shape)
+        model = LogisticRegression(max_iter=1000)
+        model.fit(features, labels)
+        scores = model.predict_proba(features)[:, 1]
+        return float(np.mean((scores - labels.mean()) ** 2))
+
+    def _sample(self, codes):
+        if self.propensity_rows is None or len(codes) <= self.propensity_rows:
+            return codes
+        rows = self.rng.choice(len(codes), self.propensity_rows, replace=False)
+        return codes[rows]
+
+    def score(self, synthetic: pd.DataFrame):
+        """Summary fidelity metrics of a synthetic dataset.
+
+        Returns
+        -------
+        dict
+            ``tvd_<k>``: mean total variation distance of the k-way
+            marginals, for each ``k`` up to ``self.k``;
+            ``mutual_information_diff``, ``cramers_v_diff`` and
+            ``correlation_diff``: mean absolute difference of the pairwise
+            normalized mutual information, Cramér's V and (numeric columns
+            only) Pearson correlation matrices, NaN without any pairs;
+            ``pmse``: see :meth:`propensity_mse`, if ``self.propensity``
+        """
+
+        codes = self.encode(synthetic)
+        stats = self._statistics(synthetic, codes)
+
+        scores = {
+            f"tvd_{k}": float(self._marginal_tvd(k, counts, len(codes)).mean())
+            for k, counts in stats["marginals"].items()
+        }
+        for name in ["mutual_information", "cramers_v", "correlation"]:
+            scores[f"{name}_diff"] = _mean_abs_diff(
+                self.real_stats.get(name), stats.get(name)
+            )
+        if self.propensity:
+            scores["pmse"] = self._propensity_mse(codes)
+
+        return scores
+
+
+def evaluate(real: pd.DataFrame, synthetic: pd.DataFrame, **kwargs):
+    """Summary fidelity metrics of a synthetic dataset.
+
+    Parameters
+    ----------
+    real : pd.DataFrame
+        real dataset
+    synthetic : pd.DataFrame
+        synthetic dataset, with the columns of ``real``
+    **kwargs
+        see :class:`Evaluator`
+
+    Returns
+    -------
+    dict
+        see :meth:`Evaluator.score`
+    """
+
+    return Evaluator(real, **kwargs).score(synthetic)
+
+
+def _is_numeric(col):
+    return pd.api.types.is_numeric_dtype(col) and not (
+        pd.api.types.is_bool_dtype(col)
+        or isinstance(col.dtype, pd.CategoricalDtype)
+    )
+
+
+def _fit_encoder(col, bins):
+    """Categories of a real column, either its distinct values, or the bin
+    edges of a numeric column with more than ``bins`` of them."""
+
+    if _is_numeric(col) and col.nunique() > bins:
+        values = col.to_numpy(dtype=float)
+        edges = np.histogram_bin_edges(values[~np.isnan(values)], bins)
+        return _Bins(edges)
+    return pd.Index(col.dropna().unique())
+
+
+class _Bins:
+    def __init__(self, edges):
+        self.edges = edges
+
+    def __len__(self):
+        return len(self.edges) - 1
+
+
+def _encode(col, categories):
+    """Codes of a column, with missing values coded ``len(categories)`` and
+    values that are not among the categories ``len(categories) + 1``."""
+
+    missing = col.isna().to_numpy()
+    if isinstance(categories, _Bins):
+        # values out of the real range fall into the outer bins
+        values = pd.to_numeric(col, errors="coerce").to_numpy(dtype=float)
+        codes = np.digitize(values, categories.edges[1:-1])
+        unknown = np.isnan(values) & ~missing
+    else:
+        codes = categories.get_indexer(col)
+        unknown = codes < 0
+
+    codes[unknown] = len(categories) + 1
+    codes[missing] = len(categories)
+    return codes
+
+
+def _one_hot(codes, shape):
+    offsets = np.concatenate([[0], np.cumsum(shape)[:-1]])
+    nrows, ncols = codes.shape
+    return sparse.csr_matrix(
+        (
+            np.ones(nrows * ncols),
+            (np.repeat(np.arange(nrows), ncols), (codes + offsets).ravel()),
+        ),
+        shape=(nrows, int(np.sum(shape))),
+    )
+
+
+def _mean_abs_diff(real, synthetic):
+    if real is None or synthetic is None or len(real) < 2:
+        return np.nan
+    upper = np.triu_indices(len(real), k=1)
+    return float(np.nanmean(np.abs(real[upper] - synthetic[upper])))
@@ -3,16 +3,25 @@
 """
 from __future__ import annotations
 
+import datetime
 import inspect
+import itertools
 import json
 import pathlib
 import warnings
 from os import path
 
-import click
-
+from reprosyn.costs import (
+    BYTES_PER_CELL,
+    ResourceLimitError,
+    format_size,
+    physical_memory,
+)
 from reprosyn.dataset import Dataset
+from reprosyn.instrumentation import ProgressReporter, RunStats, measure
+from reprosyn.resources import configure_threads
 
+import numpy as np
 import pandas as pd
 
 
@@ -34,7 +43,34 @@ class PipelineBase:
         output directory, by default "./"
     size : int, optional
         number of rows to synthesise, defaults to length of dataset
-
+    ledger : PrivacyLedger, optional
+        a :class:`~budget.PrivacyLedger` charged with the method's
+        ``epsilon`` and ``delta`` before fitting, by default None
+    chunksize : int, optional
+        if given, :meth:`run` generates, postprocesses and saves the output
+        in chunks of at most this many rows, see :meth:`iter_generate`, by
+        default None
+    threads : int, optional
+        intra-op threads of TensorFlow and torch, and BLAS threads, see
+        :func:`~resources.configure_threads`, by default None, which keeps
+        the backends' defaults
+    interop_threads : int, optional
+        inter-op threads of TensorFlow and torch, by default None
+    stats : bool, optional
+        if True, :meth:`run` appends its :attr:`run_stats` to
+        ``run_stats.jsonl`` in the output directory, one JSON line per
+        stage, by default False
+    progress : callable, optional
+        called with a progress event by long-running stages, see
+        :class:`~instrumentation.ProgressReporter`, by default None
+    max_memory : int, optional
+        bytes that :meth:`run` may use, by default None. Runs whose
+        :meth:`estimate_cost` exceeds it are refused before allocating
+        anything, see :meth:`check_cost`.
+    dry_run : bool, optional
+        if True, :meth:`run` only returns :meth:`estimate_cost`, with the
+        ``method`` name, without running, by default False.
+        :func:`~cli_utils.run_generator` prints it as a JSON line.
 
     Attributes
     ----------
@@ -48,6 +84,10 @@ class PipelineBase:
         Arbitrary keyword method parameters
     output: pandas.Dataframe
         synthetic dataset
+    run_stats: RunStats
+        wall time, CPU time, peak RSS and row throughput of each stage of
+        the last :meth:`run`, see :class:`~instrumentation.RunStats`.
+        Methods add sub-stages with :meth:`timer`.
     """
 
     generator = staticmethod(_base_generate_func)
@@ -58,6 +98,14 @@ class PipelineBase:
         metadata=None,
         out="./",
         size=None,
+        ledger=None,
+        chunksize=None,
+        threads=None,
+        interop_threads=None,
+        stats=False,
+        progress=None,
+        max_memory=None,
+        dry_run=False,
         **kwargs,
     ):
 
@@ -72,7 +120,17 @@ class PipelineBase:
         self.size = size or len(self.dataset.data)
         self.output_dir = pathlib.Path(out)
         self.params = kwargs
+        self.ledger = ledger
+        self.chunksize = chunksize
+        self.stats = stats
+        self.progress = progress
+        self.max_memory = max_memory
+        self.dry_run = dry_run
         self.output = None
+        self.run_stats = RunStats()
+
+        if threads is not None or interop_threads is not None:
+            configure_threads(threads, interop_threads)
 
         self.check_generator()
 
@@ -85,6 +143,110 @@ class PipelineBase:
                 "leading argument for the instance in its definition."
             )
 
+    def timer(self, name):
+        """Context manager timing a (sub-)stage into :attr:`run_stats`.
+
+        E.g. a method's ``generate`` can report
+        ``with self.timer("select"): ...``, which is recorded as
+        ``generate.select`` during :meth:`run`.
+        """
+        return self.run_stats.timer(name)
+
+    def progress_reporter(self, name, total=None, start=0):
+        """A :class:`~instrumentation.ProgressReporter` of a (sub-)stage,
+        reporting to ``self.progress``.
+
+        Stages are named as in :meth:`timer`, e.g. ``generate.estimate``.
+        Methods report each iteration of their fits with
+        ``reporter.update(loss=...)``, and can skip computing losses when
+        ``reporter.enabled`` is False.
+        """
+        return ProgressReporter(
+            self.progress,
+            self.run_stats.stage_name(name),
+            total=total,
+            start=start,
+        )
+
+    def is_fitted(self):
+        """Whether the method holds a fitted model, so that :meth:`generate`
+        will only sample. To be implemented by methods that keep one."""
+        return False
+
+    def estimate_cost(self):
+        """Estimates the peak memory and compute of :meth:`run` from the
+        metadata and parameters, see :mod:`~reprosyn.costs`. To be
+        implemented by methods, by default counts copies of the input and
+        output datasets only.
+
+        Returns
+        -------
+        dict
+            ``memory``, peak bytes, and ``compute``, relative number of cell
+            operations, as well as any method-specific sizes behind them,
+            e.g. the number of cells of the largest table
+        """
+
+        cells = len(self.dataset.metadata) * (
+            len(self.dataset.data) + self.size
+        )
+        return {"memory": 2 * BYTES_PER_CELL * cells, "compute": cells}
+
+    def check_cost(self):
+        """Checks :meth:`estimate_cost` against ``self.max_memory``, and
+        warns if it exceeds the physical memory of the machine.
+
+        Returns
+        -------
+        dict
+            the estimate
+
+        Raises
+        ------
+        ResourceLimitError
+            If the run is estimated to need more than ``self.max_memory``.
+        """
+
+        cost = self.estimate_cost()
+        memory = cost["memory"]
+        name = type(self).__name__
+        if self.max_memory is not None and memory > self.max_memory:
+            raise ResourceLimitError(
+                f"{name} is estimated to need {format_size(memory)}, over "
+                f"the limit of {format_size(self.max_memory)}."
+            )
+        available = physical_memory()
+        if available is not None and memory > available:
+            warnings.warn(
+                f"{name} is estimated to need {format_size(memory)}, more "
+                f"than the {format_size(available)} of physical memory."
+            )
+        return cost
+
+    def charge_budget(self):
+        """Charges the method's privacy parameters to ``self.ledger``
+
+        Raises
+        ------
+        ValueError
+            If the method has no ``epsilon`` parameter to account for.
+        BudgetExceededError
+            If the run would exceed the ledger's budget.
+        """
+
+        if "epsilon" not in self.params:
+            raise ValueError(
+                f"{type(self).__name__} has no epsilon, so its privacy "
+                "spend cannot be accounted for."
+            )
+
+        self.ledger.charge(
+            self.dataset.data,
+            self.params["epsilon"],
+            self.params.get("delta", 0.0),
+            method=type(self).__name__,
+        )
+
     def preprocess(self):
         """Preprocessing to be implemented by method"""
         pass
@@ -100,19 +262,102 @@ class PipelineBase:
         self.output = self.generator(self.dataset, self.size, **self.params)
         return self.output
 
+    def iter_generate(self):
+        """Generates the output in chunks of at most ``self.chunksize`` rows,
+        so that arbitrarily large outputs can be streamed to disk. To be
+        implemented by methods that can sample incrementally, by default
+        yields the whole output of :meth:`generate` at once.
+
+        Yields
+        ------
+        any
+            Consecutive chunks of the output, type will depend on method
+        """
+        self.generate()
+        yield self.output
+
     def postprocess(self):
         """Postprocessing to be implemented by method"""
         pass
 
-    def save(self):
-        self.output.to_csv(self.output_dir / "output.csv", index=False)
+    def save(self, append=False):
+        """Saves output, or appends it to the saved output if ``append``"""
+        self.output.to_csv(
+            self.output_dir / "output.csv",
+            mode="a" if append else "w",
+            header=not append,
+            index=False,
+        )
 
     def run(self):
-        """Runs pipeline"""
-        self.preprocess()
-        self.generate()
-        self.postprocess()
-        self.save()
+        """Runs pipeline, streaming the output if ``chunksize`` is set.
+
+        Each stage is measured into :attr:`run_stats`, and the whole run
+        under ``run``. Runs over ``max_memory`` are refused first, see
+        :meth:`check_cost`, and a ``dry_run`` stops there.
+
+        Returns
+        -------
+        dict | None
+            on a ``dry_run``, the ``method`` with its estimate, see
+            :meth:`estimate_cost`, else None
+        """
+        if self.dry_run:
+            return {"method": type(self).__name__, **self.estimate_cost()}
+        self.check_cost()
+
+        self.run_stats = RunStats()
+        started = datetime.datetime.now(datetime.timezone.utc)
+
+        with measure() as total:
+            self._run_stages()
+
+        self.run_stats["run"] = {**total, "calls": 1}
+        for stage in ["generate", "postprocess", "save", "run"]:
+            self.run_stats.add_rows(stage, self.size)
+
+        if self.stats:
+            self.save_run_stats(started)
+
+    def _run_stages(self):
+        with self.timer("preprocess"):
+            self.preprocess()
+        if self.ledger is not None and not self.is_fitted():
+            self.charge_budget()
+        if self.chunksize is None:
+            with self.timer("generate"):
+                self.generate()
+            with self.timer("postprocess"):
+                self.postprocess()
+            with self.timer("save"):
+                self.save()
+        else:
+            chunks = self.iter_generate()
+            for i in itertools.count():
+                with self.timer("generate"):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                self.output = chunk
+                with self.timer("postprocess"):
+                    self.postprocess()
+                with self.timer("save"):
+                    self.save(append=i > 0)
+
+    def save_run_stats(self, started=None, fn="run_stats.jsonl"):
+        """Appends :attr:`run_stats` to ``fn`` in the output directory, as
+        one JSON line per stage."""
+        started = started or datetime.datetime.now(datetime.timezone.utc)
+        with open(self.output_dir / fn, "a") as f:
+            for stage, stats in self.run_stats.items():
+                record = {
+                    "method": type(self).__name__,
+                    "started": started.isoformat(),
+                    "size": self.size,
+                    "stage": stage,
+                    **stats,
+                }
+                f.write(json.dumps(record) + "\n")
 
 
 def encode_ordinal(dataset: Dataset):
@@ -217,8 +462,126 @@ def decode_ordinal(data: pd.DataFrame, encoders: dict):
         decoded dataframe
     """
 
-    df = data.copy()
+    df = data.copy(deep=False)
     for col, enc in encoders.items():
-        df[col] = df[col].apply(lambda x: enc["from_index"][x])
+        lookup = np.empty(len(enc["from_index"]), dtype=object)
+        lookup[list(enc["from_index"])] = list(enc["from_index"].values())
+        df[col] = np.take(lookup, df[col].to_numpy(dtype=np.intp))
 
     return df
+
+
+def column_bounds(
+    col: dict, data: pd.DataFrame | None = None, epsilon: float | None = None
+):
+    """Range of a numeric metadata column.
+
+    Parameters
+    ----------
+    col : dict
+        metadata column, see `Data Format <https://privacy-sdg-toolbox.readthedocs.io/en/latest/dataset-schema.html>`_
+    data : pd.DataFrame, optional
+        dataset to compute the range from, if the column has no ``min`` and
+        ``max`` entries, by default None
+    epsilon : float, optional
+        privacy budget of the method the range is for, by default None. If
+        set, a range computed from ``data`` warns that it is not private.
+
+    Returns
+    -------
+    tuple
+        (min, max) of the column
+
+    Raises
+    ------
+    ValueError
+        If the range is neither in the metadata nor computable from data.
+
+    Notes
+    -----
+    A range computed from the data is not differentially private. Give
+    ``min`` and ``max`` in the metadata where that matters.
+    """
+
+    if "min" in col and "max" in col:
+        return col["min"], col["max"]
+    if data is None:
+        raise ValueError(f"Numeric column {col['name']} needs a min and max")
+
+    if epsilon:
+        warnings.warn(
+            f"Numeric column {col['name']} has no min and max in metadata, "
+            "so its range is taken from the data, which is not "
+            f"differentially private despite epsilon={epsilon}."
+        )
+    values = data[col["name"]]
+    return values.min().item(), values.max().item()
+
+
+def describe_columns(
+    metadata: list,
+    finite_type: str,
+    numeric_types: dict,
+    data: pd.DataFrame | None = None,
+    epsilon: float | None = None,
+):
+    """Describes metadata columns as the generators of ``gans`` and
+    ``data_synthesiser`` read them, with each method's own column types.
+
+    Parameters
+    ----------
+    metadata : list[dict]
+        metadata, see `Data Format <https://privacy-sdg-toolbox.readthedocs.io/en/latest/dataset-schema.html>`_
+    finite_type : str
+        column type of finite columns
+    numeric_types : dict
+        column type of each numeric representation, e.g. "integer" and
+        "number"
+    data : pd.DataFrame, optional
+        dataset, used for the range of numeric columns without ``min`` and
+        ``max`` in metadata, see :func:`column_bounds`
+    epsilon : float, optional
+        privacy budget of the method, by default None, see
+        :func:`column_bounds`
+
+    Returns
+    -------
+    dict
+        a 'columns' key gives a list[dict] of column info. Finite columns
+        have keys 'name', 'type', 'size', 'i2s', and numeric columns have
+        keys 'name', 'type', 'min', 'max'.
+
+    Raises
+    ------
+    ValueError
+        If a column is neither finite nor in ``numeric_types``.
+    """
+
+    columns = []
+    for col in metadata:
+        if "finite" in col["type"]:
+            columns.append(
+                {
+                    "name": col["name"],
+                    "type": finite_type,
+                    "size": len(col["representation"]),
+                    "i2s": col["representation"],
+                }
+            )
+        elif col["representation"] in numeric_types:
+            cmin, cmax = column_bounds(col, data, epsilon)
+            columns.append(
+                {
+                    "name": col["name"],
+                    "type": numeric_types[col["representation"]],
+                    "min": cmin,
+                    "max": cmax,
+                }
+            )
+        else:
+            raise ValueError(
+                f"Unsupported representation {col['representation']} of "
+                f"column {col['name']}"
+            )
+
+    return {"columns": columns}
@@ -0,0 +1,196 @@
+"""Wall time, CPU time, peak memory and progress of pipeline stages.
+
+:class:`RunStats` collects one entry per stage. Stages timed while another
+is running are recorded under a dotted name, e.g. ``generate.select``, so
+methods can break their stages down without knowing how they are called.
+:class:`ProgressReporter` reports iterations, losses and throughput while a
+stage runs.
+"""
+
+import contextlib
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def peak_rss():
+    """Peak resident set size of this process so far, its high-water mark
+    over its whole lifetime rather than of any one stage.
+
+    Returns
+    -------
+    int | None
+        bytes, or None where the platform does not report it
+    """
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in bytes on macOS, and kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@contextlib.contextmanager
+def measure():
+    """Measures the enclosed block.
+
+    Yields
+    ------
+    dict
+        filled on exit with ``wall_time`` and ``cpu_time`` in seconds, and
+        in bytes ``peak_rss``, the high-water mark of the process at exit,
+        see :func:`peak_rss`, and ``peak_rss_increase``, how far the block
+        raised it
+
+    Notes
+    -----
+    ``peak_rss_increase`` is a lower bound on the memory the block needs:
+    it is 0 for a block that stays below a peak reached earlier in the
+    process, however much it allocates.
+    """
+
+    stats = {}
+    wall, cpu = time.perf_counter(), time.process_time()
+    start_rss = peak_rss()
+    try:
+        yield stats
+    finally:
+        stats["wall_time"] = time.perf_counter() - wall
+        stats["cpu_time"] = time.process_time() - cpu
+        stats["peak_rss"] = peak_rss()
+        stats["peak_rss_increase"] = (
+            None if start_rss is None else stats["peak_rss"] - start_rss
+        )
+
+
+class RunStats(dict):
+    """Statistics of each stage of a run, keyed by stage name.
+
+    Each entry holds the ``wall_time`` and ``cpu_time`` summed over the
+    ``calls`` of the stage, the ``peak_rss_increase`` of its call that
+    raised the process's high-water mark the most, the ``peak_rss`` of the
+    process at the end of its last call, see :func:`measure`, and, once
+    :meth:`add_rows` is called, ``rows`` and ``rows_per_sec``.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._running = []
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        """Times the enclosed block as stage ``name``, nested under the
+        stages currently running.
+
+        E.g. ``with stats.timer("select"): ...`` within ``generate``
+        records ``generate.select``.
+        """
+
+        stage = self.stage_name(name)
+        self._running.append(name)
+        try:
+            with measure() as stats:
+                yield
+        finally:
+            self._running.pop()
+            entry = self.setdefault(
+                stage, {"wall_time": 0.0, "cpu_time": 0.0, "calls": 0}
+            )
+            entry["wall_time"] += stats["wall_time"]
+            entry["cpu_time"] += stats["cpu_time"]
+            entry["calls"] += 1
+            entry["peak_rss"] = stats["peak_rss"]
+            if stats["peak_rss_increase"] is not None:
+                entry["peak_rss_increase"] = max(
+                    entry.get("peak_rss_increase", 0),
+                    stats["peak_rss_increase"],
+                )
+
+    def stage_name(self, name):
+        """Name of stage ``name``, nested under the stages running."""
+        return ".".join(self._running + [name])
+
+    def add_rows(self, stage, rows):
+        """Records that ``stage`` processed ``rows`` rows, and its
+        throughput."""
+
+        entry = self[stage]
+        entry["rows"] = entry.get("rows", 0) + rows
+        if entry["wall_time"] > 0:
+            entry["rows_per_sec"] = entry["rows"] / entry["wall_time"]
+
+
+class ProgressReporter:
+    """Reports the progress of a long-running stage to a callback.
+
+    Each :meth:`update` calls ``callback(event)`` with a dict of
+
+    - ``stage``: name of the stage
+    - ``iteration``: iterations done so far, and ``total`` if known
+    - ``loss``: the latest loss, a float or a dict of floats, or None
+    - ``elapsed``: seconds since the reporter was created
+    - ``iterations_per_sec``, and ``rows_per_sec`` if updates count rows
+    - ``eta``: estimated seconds left, None without a ``total``
+
+    Parameters
+    ----------
+    callback : callable, optional
+        receives the events, by default None, which reports nothing
+    stage : str
+        name of the stage
+    total : int, optional
+        expected number of iterations, by default None
+    start : int, optional
+        iterations already done, e.g. when resuming from a checkpoint, which
+        do not count towards the rates, by default 0
+    """
+
+    def __init__(self, callback, stage, total=None, start=0):
+        self.callback = callback
+        self.stage = stage
+        self.total = total
+        self.start = start
+        self.iteration = start
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    @property
+    def enabled(self):
+        """Whether events are reported, so that backends can skip
+        computing losses nobody will see."""
+        return self.callback is not None
+
+    def update(self, iterations=1, loss=None, rows=None):
+        """Records ``iterations`` more iterations, which processed ``rows``
+        rows, and reports the progress so far."""
+
+        self.iteration += iterations
+        self.rows += rows or 0
+        if not self.enabled:
+            return
+
+        elapsed = time.perf_counter() - self.started
+        done = self.iteration - self.start
+        rate = done / elapsed if elapsed > 0 else None
+        eta = None
+        if self.total is not None and rate:
+            eta = max(self.total - self.iteration, 0) / rate
+
+        self.callback(
+            {
+                "stage": self.stage,
+                "iteration": self.iteration,
+                "total": self.total,
+                "loss": loss,
+                "elapsed": elapsed,
+                "iterations_per_sec": rate,
+                "rows_per_sec": (
+                    self.rows / elapsed if self.rows and elapsed > 0 else None
+                ),
+                "eta": eta,
+            }
+        )
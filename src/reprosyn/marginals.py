@@ -0,0 +1,346 @@
+"""Contingency tables over integer-encoded data.
+
+Rather than projecting a dataframe once per marginal, the functions here
+offset every marginal into a single flat cell index and count all of them
+with one ``np.bincount`` per chunk of rows.
+"""
+
+from __future__ import annotations
+
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# maximum number of cell indices materialised per chunk of rows
+MAX_CHUNK_CELLS = 2**22
+
+
+def marginal_counts(values, shape, marginals, chunksize=None, workers=1):
+    """Counts k-way marginals of an integer-encoded matrix in one pass.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        integer matrix of shape (individuals, features), where column ``i``
+        takes values in ``range(shape[i])``.
+    shape : tuple[int]
+        number of categories of each column.
+    marginals : list[tuple[int]]
+        column index tuples to count, all of the same length ``k``
+    chunksize : int, optional
+        rows counted at once, by default chosen so that a chunk holds at most
+        ``MAX_CHUNK_CELLS`` cell indices
+    workers : int, optional
+        number of threads counting chunks concurrently, by default 1
+
+    Returns
+    -------
+    np.ndarray
+        flat counts of all marginals, marginal ``m`` is stored in
+        ``counts[offsets[m]:offsets[m + 1]]`` in row-major order.
+    np.ndarray
+        offsets of each marginal, of length ``len(marginals) + 1``.
+    """
+
+    values = np.asarray(values)
+    shape = np.asarray(shape, dtype=np.int64)
+
+    offsets = np.zeros(len(marginals) + 1, dtype=np.int64)
+    if len(marginals) == 0:
+        return np.zeros(0, dtype=np.int64), offsets
+
+    columns = np.array(marginals, dtype=np.intp).reshape(len(marginals), -1)
+    sizes = shape[columns]
+    # row-major strides of the cells of each marginal
+    strides = np.ones_like(sizes)
+    strides[:, :-1] = np.cumprod(sizes[:, :0:-1], axis=1)[:, ::-1]
+    np.cumsum(sizes.prod(axis=1), out=offsets[1:])
+
+    if chunksize is None:
+        chunksize = max(1, MAX_CHUNK_CELLS // len(marginals))
+
+    def count(start):
+        block = values[start : start + chunksize].astype(np.int64)
+        cells = np.broadcast_to(offsets[:-1], (len(block), len(columns)))
+        for k in range(columns.shape[1]):
+            cells = cells + block[:, columns[:, k]] * strides[:, k]
+        return np.bincount(cells.ravel(), minlength=offsets[-1])
+
+    starts = range(0, values.shape[0], chunksize)
+    counts = np.zeros(offsets[-1], dtype=np.int64)
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for c in pool.map(count, starts):
+                counts += c
+    else:
+        for start in starts:
+            counts += count(start)
+
+    return counts, offsets
+
+
+def pairwise_counts(values, shape, pairs=None, chunksize=None, workers=1):
+    """Counts every 2-way marginal of an integer-encoded matrix in one pass.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        integer matrix of shape (individuals, features), where column ``i``
+        takes values in ``range(shape[i])``.
+    shape : tuple[int]
+        number of categories of each column.
+    pairs : list[tuple[int]], optional
+        column index pairs to count, by default all ``(i, j)`` with ``i < j``
+    chunksize : int, optional
+        rows counted at once, by default chosen so that a chunk holds at most
+        ``MAX_CHUNK_CELLS`` cell indices
+    workers : int, optional
+        number of threads counting chunks concurrently, by default 1
+
+    Returns
+    -------
+    np.ndarray
+        flat counts of all marginals, marginal ``p`` is stored in
+        ``counts[offsets[p]:offsets[p + 1]]`` in row-major order.
+    np.ndarray
+        offsets of each marginal, of length ``len(pairs) + 1``.
+    """
+
+    if pairs is None:
+        pairs = list(itertools.combinations(range(np.shape(values)[1]), 2))
+
+    return marginal_counts(
+        values, shape, pairs, chunksize=chunksize, workers=workers
+    )
+
+
+def pairwise_marginals(values, shape, pairs=None, chunksize=None, workers=1):
+    """All 2-way contingency tables of an integer-encoded matrix.
+
+    See :func:`pairwise_counts` for parameters.
+
+    Returns
+    -------
+    dict
+        dictionary of ``(i, j): counts``, where counts has shape
+        ``(shape[i], shape[j])``.
+    """
+
+    if pairs is None:
+        pairs = list(itertools.combinations(range(np.shape(values)[1]), 2))
+
+    counts, offsets = pairwise_counts(
+        values, shape, pairs, chunksize=chunksize, workers=workers
+    )
+
+    return {
+        (a, b): counts[offsets[p] : offsets[p + 1]].reshape(shape[a], shape[b])
+        for p, (a, b) in enumerate(pairs)
+    }
+
+
+def marginal_tables(values, shape, marginals, chunksize=None, workers=1):
+    """Contingency tables of marginals of any lengths, counted with one
+    :func:`marginal_counts` pass per length.
+
+    See :func:`marginal_counts` for parameters.
+
+    Returns
+    -------
+    list[np.ndarray]
+        counts of each marginal, with an axis per column, in order
+    """
+
+    by_length = {}
+    for m, marginal in enumerate(marginals):
+        by_length.setdefault(len(marginal), []).append(m)
+
+    tables = [None] * len(marginals)
+    for index in by_length.values():
+        counts, offsets = marginal_counts(
+            values,
+            shape,
+            [marginals[m] for m in index],
+            chunksize=chunksize,
+            workers=workers,
+        )
+        for m, start, stop in zip(index, offsets[:-1], offsets[1:]):
+            tables[m] = counts[start:stop].reshape(
+                [shape[col] for col in marginals[m]]
+            )
+
+    return tables
+
+
+def mutual_information(values, shape, marginals, workers=1):
+    """Mutual information, in nats, between the last column of each
+    marginal and the other columns of it together.
+
+    Marginals are counted in batches of at most ``MAX_CHUNK_CELLS`` cells,
+    see :func:`marginal_tables`, so any number of them can be scored.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        integer matrix of shape (individuals, features), where column ``i``
+        takes values in ``range(shape[i])``.
+    shape : tuple[int]
+        number of categories of each column.
+    marginals : list[tuple[int]]
+        column index tuples ``(*parents, child)``
+    workers : int, optional
+        number of threads counting chunks concurrently, by default 1
+
+    Returns
+    -------
+    np.ndarray
+        mutual information of each marginal
+    """
+
+    batches, batch, cells = [], [], 0
+    for marginal in marginals:
+        size = int(np.prod([shape[col] for col in marginal]))
+        if batch and cells + size > MAX_CHUNK_CELLS:
+            batches.append(batch)
+            batch, cells = [], 0
+        batch.append(marginal)
+        cells += size
+    batches.append(batch)
+
+    scores = []
+    for batch in batches:
+        for table in marginal_tables(values, shape, batch, workers=workers):
+            table = table.reshape(-1, table.shape[-1])
+            scores.append(
+                _entropy(table.sum(axis=1))
+                + _entropy(table.sum(axis=0))
+                - _entropy(table.ravel())
+            )
+
+    return np.array(scores).clip(0.0)
+
+
+def _pairwise_cells(values, shape, workers):
+    """Counts of the non-empty cells of all 2-way marginals, alongside the
+    1-way counts of their row and column."""
+
+    values = np.asarray(values)
+    shape = np.asarray(shape, dtype=np.int64)
+    pairs = list(itertools.combinations(range(values.shape[1]), 2))
+    counts, offsets = pairwise_counts(values, shape, pairs, workers=workers)
+
+    # 1-way counts of all columns, laid end to end
+    ones = [
+        np.bincount(values[:, j], minlength=shape[j])
+        for j in range(values.shape[1])
+    ]
+    one_offsets = np.concatenate([[0], np.cumsum(shape)[:-1]])
+
+    left = np.array([a for a, _ in pairs], dtype=np.intp)
+    right = np.array([b for _, b in pairs], dtype=np.intp)
+    cells = np.flatnonzero(counts)
+    pair = np.searchsorted(offsets, cells, side="right") - 1
+    row, col = np.divmod(cells - offsets[pair], shape[right][pair])
+
+    flat_ones = np.concatenate(ones) if ones else np.zeros(0, np.int64)
+    return (
+        ones,
+        left,
+        right,
+        pair,
+        counts[cells],
+        flat_ones[one_offsets[left][pair] + row],
+        flat_ones[one_offsets[right][pair] + col],
+    )
+
+
+def _entropy(counts):
+    counts = counts[counts > 0]
+    total = counts.sum()
+    return -np.sum((counts / total) * (np.log(counts) - np.log(total)))
+
+
+def pairwise_normalized_mutual_information(values, shape, workers=1):
+    """Normalized mutual information between every pair of columns of an
+    integer-encoded matrix.
+
+    Each pair is computed once from the contingency tables of
+    :func:`pairwise_counts`, and mirrored. Mutual information is normalized
+    by the arithmetic mean of the entropies as in sklearn's
+    ``normalized_mutual_info_score``, so two constant columns score 1.
+
+    See :func:`pairwise_counts` for parameters.
+
+    Returns
+    -------
+    np.ndarray
+        symmetric matrix of shape (features, features), with a unit diagonal
+    """
+
+    nrows, ncols = np.shape(values)
+    if ncols < 2 or nrows == 0:
+        return np.ones((ncols, ncols))
+
+    ones, left, right, pair, n, n_row, n_col = _pairwise_cells(
+        values, shape, workers
+    )
+    entropies = np.array([_entropy(c) for c in ones])
+    constant = np.array([np.count_nonzero(c) <= 1 for c in ones])
+
+    # as in sklearn's mutual_info_score
+    terms = (n / nrows) * (
+        np.log(n) + np.log(nrows) - np.log(n_row) - np.log(n_col)
+    )
+    terms[np.abs(terms) < np.finfo(terms.dtype).eps] = 0.0
+    mi = np.bincount(pair, weights=terms, minlength=len(left)).clip(0.0)
+
+    normalizer = (entropies[left] + entropies[right]) / 2
+    scores = np.divide(mi, normalizer, out=np.zeros_like(mi), where=mi > 0)
+    scores[constant[left] & constant[right]] = 1.0
+
+    return _symmetric(ncols, left, right, scores)
+
+
+def pairwise_cramers_v(values, shape, workers=1):
+    """Cramér's V between every pair of columns of an integer-encoded
+    matrix, from the contingency tables of :func:`pairwise_counts`.
+
+    Only categories that occur count towards the degrees of freedom, and
+    pairs involving a constant column score 0.
+
+    See :func:`pairwise_counts` for parameters.
+
+    Returns
+    -------
+    np.ndarray
+        symmetric matrix of shape (features, features), with a unit diagonal
+    """
+
+    nrows, ncols = np.shape(values)
+    if ncols < 2 or nrows == 0:
+        return np.eye(ncols)
+
+    ones, left, right, pair, n, n_row, n_col = _pairwise_cells(
+        values, shape, workers
+    )
+    levels = np.array([np.count_nonzero(c) for c in ones])
+
+    # chi2 / nrows, summed over the non-empty cells only
+    phi2 = np.bincount(
+        pair, weights=n / n_row * (n / n_col), minlength=len(left)
+    )
+    phi2 = (phi2 - 1.0).clip(0.0)
+    dof = np.minimum(levels[left], levels[right]) - 1
+    scores = np.sqrt(
+        np.divide(phi2, dof, out=np.zeros_like(phi2), where=dof > 0)
+    )
+
+    return _symmetric(ncols, left, right, scores.clip(0.0, 1.0))
+
+
+def _symmetric(ncols, left, right, scores):
+    matrix = np.eye(ncols)
+    matrix[left, right] = scores
+    matrix[right, left] = scores
+    return matrix
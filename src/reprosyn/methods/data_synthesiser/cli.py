@@ -1,6 +1,6 @@
 import click
 
-from reprosyn.cli_utils import wrap_generator
+from reprosyn.cli_utils import run_generator, wrap_generator
 from reprosyn.methods.data_synthesiser.wrapper import (
     DS_BAYNET,
     DS_INDHIST,
@@ -28,7 +28,7 @@ from reprosyn.methods.data_synthesiser.wrapper import (
 def cmd_baynet(ctx, **kwargs):
 
     generator = DS_BAYNET(**ctx.parent.params, **kwargs)
-    generator.run()
+    run_generator(generator)
     return generator.output
 
 
@@ -47,7 +47,7 @@ def cmd_baynet(ctx, **kwargs):
 def cmd_indhist(ctx, **kwargs):
 
     generator = DS_INDHIST(**ctx.parent.params, **kwargs)
-    generator.run()
+    run_generator(generator)
     return generator.output
 
 
@@ -78,5 +78,5 @@ def cmd_indhist(ctx, **kwargs):
 def cmd_ds_privbayes(ctx, **kwargs):
 
     generator = DS_PRIVBAYES(**ctx.parents.params, **kwargs)
-    generator.run()
+    run_generator(generator)
     return generator.output
@@ -1,8 +1,10 @@
 """Generative models adapted from https://github.com/DataResponsibly/DataSynthesizer"""
 # Copyright <2018> <dataresponsibly.com>
 
+import numpy as np
+from numpy import bincount, ndindex, ravel_multi_index
 from numpy.random import seed, laplace, choice
-from pandas import DataFrame, merge
+from pandas import DataFrame
 from itertools import product
 
 from .data_synthesiser_utils.datatypes.FloatAttribute import (
@@ -16,7 +18,10 @@ from .data_synthesiser_utils.datatypes.StringAttribute import (
 )
 from .data_synthesiser_utils.utils import (
     bayes_worker,
+    marginal_counts,
     normalize_given_distribution,
+    normalize_given_distributions,
+    sample_binning_indices,
     exponential_mechanism,
 )
 
@@ -71,18 +76,21 @@ class IndependentHistogram(GenerativeModel):
     def generate_samples(self, nsamples):
         assert self.trained, "Model must be fitted to some data first"
 
-        synthetic_dataset = DataFrame(columns=self.DataDescriber.attr_names)
-        for attr_name, Attr in self.DataDescriber.attr_dict.items():
-            binning_indices = (
-                Attr.sample_binning_indices_in_independent_attribute_mode(
-                    nsamples
-                )
-            )
-            synthetic_dataset[
-                attr_name
-            ] = Attr.sample_values_from_binning_indices(binning_indices)
+        attr_dict = self.DataDescriber.attr_dict
+        binning_indices = sample_binning_indices(
+            [Attr.distribution_probabilities for Attr in attr_dict.values()],
+            nsamples,
+        )
 
-        return synthetic_dataset
+        return DataFrame(
+            {
+                attr_name: Attr.sample_values_from_binning_indices(indices)
+                for (attr_name, Attr), indices in zip(
+                    attr_dict.items(), binning_indices
+                )
+            },
+            columns=self.DataDescriber.attr_names,
+        )
 
     def _read_meta(self, metadata):
         """Read metadata from metadata file."""
@@ -145,7 +153,14 @@ class BayesianNet(GenerativeModel):
 
         self.__name__ = "BayesianNet"
 
-    def fit(self, data):
+    def fit(self, data, progress=None):
+        """Fits the network with GreedyBayes, and its conditional
+        distributions.
+
+        :param progress: callable: Optional ``progress(name, total)``
+            returning a ``ProgressReporter`` of the attributes added to the
+            network
+        """
         assert isinstance(
             data, self.datatype
         ), f"{self.__class__.__name__} expects {self.datatype} as input data but got {type(data)}"
@@ -164,12 +179,18 @@ class BayesianNet(GenerativeModel):
         )
         self.DataDescriber.describe(data)
 
-        encoded_df = DataFrame(columns=self.DataDescriber.attr_names)
-        for attr_name, column in self.DataDescriber.attr_dict.items():
-            encoded_df[attr_name] = column.encode_values_into_bin_idx()
+        encoded_df = DataFrame(
+            {
+                attr_name: column.encode_values_into_bin_idx()
+                for attr_name, column in self.DataDescriber.attr_dict.items()
+            }
+        )
 
         self.bayesian_network = self._greedy_bayes_linear(
-            encoded_df, self.degree
+            encoded_df,
+            self.degree,
+            progress
+            and progress("greedy_bayes", total=encoded_df.shape[1] - 1),
         )
 
         self.conditional_probabilities = (
@@ -197,9 +218,9 @@ class BayesianNet(GenerativeModel):
                 )
             else:
                 # For attributes not in BN use independent attribute mode
-                binning_indices = column.sample_binning_indices_in_independent_attribute_mode(
-                    nsamples
-                )
+                binning_indices = sample_binning_indices(
+                    [column.distribution_probabilities], nsamples
+                )[0]
                 synthetic_data[
                     attr
                 ] = column.sample_values_from_binning_indices(binning_indices)
@@ -258,9 +279,9 @@ class BayesianNet(GenerativeModel):
             order.append(child)
         return order
 
-    def _greedy_bayes_linear(self, encoded_df, k=1):
+    def _greedy_bayes_linear(self, encoded_df, k=1, progress=None):
         """Construct a Bayesian Network (BN) using greedy algorithm."""
-        dataset = encoded_df.astype(str, copy=False)
+        dataset = encoded_df
 
         # Optional: Fix sed for reproducibility
         if self.seed is not None:
@@ -290,6 +311,8 @@ class BayesianNet(GenerativeModel):
             adding_attribute = parents_pair_list[idx][0]
             V.append(adding_attribute)
             rest_attributes.remove(adding_attribute)
+            if progress is not None:
+                progress.update()
 
         return bayesian_net
 
@@ -310,71 +333,51 @@ class BayesianNet(GenerativeModel):
         )
 
         # get distribution of root attribute
-        root_marginal_freqs = (
-            freqs_of_kplus1_attributes.loc[:, [root, "count"]]
-            .groupby(root)
-            .sum()["count"]
+        root_marginal_freqs = marginal_counts(
+            freqs_of_kplus1_attributes, kplus1_attributes, [root]
         )
         conditional_distributions[root] = normalize_given_distribution(
             root_marginal_freqs
         ).tolist()
 
         for idx, (child, parents) in enumerate(bayesian_network):
-            conditional_distributions[child] = {}
-
             if idx < k:
-                stats = freqs_of_kplus1_attributes.copy().loc[
-                    :, parents + [child, "count"]
-                ]
+                stats = marginal_counts(
+                    freqs_of_kplus1_attributes,
+                    kplus1_attributes,
+                    parents + [child],
+                )
             else:
                 stats = self._get_attribute_frequency_counts(
                     parents + [child], encoded_dataset
                 )
 
-            stats = DataFrame(
-                stats.loc[:, parents + [child, "count"]]
-                .groupby(parents + [child])
-                .sum()
-            )
-
-            if len(parents) == 1:
-                for parent_instance in stats.index.levels[0]:
-                    dist = normalize_given_distribution(
-                        stats.loc[parent_instance]["count"]
-                    ).tolist()
-                    conditional_distributions[child][
-                        str([parent_instance])
-                    ] = dist
-            else:
-                for parents_instance in product(*stats.index.levels[:-1]):
-                    dist = normalize_given_distribution(
-                        stats.loc[parents_instance]["count"]
-                    ).tolist()
-                    conditional_distributions[child][
-                        str(list(parents_instance))
-                    ] = dist
+            # one distribution of the child per combination of parents
+            dists = normalize_given_distributions(stats)
+            dists = dists.reshape(-1, stats.shape[-1]).tolist()
+            conditional_distributions[child] = {
+                str(list(parents_instance)): dist
+                for parents_instance, dist in zip(
+                    ndindex(stats.shape[:-1]), dists
+                )
+            }
 
         return conditional_distributions
 
     def _get_attribute_frequency_counts(self, attributes, encoded_dataset):
-        # Get attribute counts for category combinations present in data
-        counts = encoded_dataset.groupby(attributes).size()
-        counts.name = "count"
-        counts = counts.reset_index()
-
-        # Get all possible attribute combinations
-        attr_combs = [
-            range(self.DataDescriber.attr_dict[attr].domain_size)
+        """Counts of every combination of values of ``attributes``, as a
+        dense array with one axis per attribute, in the given order."""
+        shape = tuple(
+            self.DataDescriber.attr_dict[attr].domain_size
             for attr in attributes
-        ]
-        full_space = DataFrame(
-            columns=attributes, data=list(product(*attr_combs))
         )
-        # stats.reset_index(inplace=True)
-        full_counts = merge(full_space, counts, how="left")
-        full_counts.fillna(0, inplace=True)
+        codes = encoded_dataset[attributes].to_numpy().T
 
-        return full_counts
+        # missing values are encoded outside the domain and not counted
+        valid = ((codes >= 0) & (codes < [[size] for size in shape])).all(0)
+        cells = ravel_multi_index(codes[:, valid], shape)
+
+        return bincount(cells, minlength=int(np.prod(shape))).reshape(shape)
 
     def _read_meta(self, metadata):
         """Read metadata from metadata file."""
@@ -438,9 +441,9 @@ class PrivBayes(BayesianNet):
     def laplace_noise_scale(self):
         return 2 * (self.num_attributes - self.degree) / (self.epsilon / 2)
 
-    def _greedy_bayes_linear(self, encoded_df, k=1):
+    def _greedy_bayes_linear(self, encoded_df, k=1, progress=None):
         """Construct a Bayesian Network (BN) using greedy algorithm."""
-        dataset = encoded_df.astype(str, copy=False)
+        dataset = encoded_df
         num_tuples, num_attributes = dataset.shape
 
         # Optional: Fix seed for reproducibility
@@ -485,33 +488,24 @@ class PrivBayes(BayesianNet):
             adding_attribute = parents_pair_list[idx][0]
             V.append(adding_attribute)
             rest_attributes.remove(adding_attribute)
+            if progress is not None:
+                progress.update()
 
         return bayesian_net
 
     def _get_attribute_frequency_counts(self, attributes, encoded_dataset):
         """Differentially private mechanism to get attribute frequency counts"""
-        # Get attribute counts for category combinations present in data
-        counts = encoded_dataset.groupby(attributes).size()
-        counts.name = "count"
-        counts = counts.reset_index()
-
-        # Get all possible attribute combinations
-        attr_combs = [
-            range(self.DataDescriber.attr_dict[attr].domain_size)
-            for attr in attributes
-        ]
-        full_space = DataFrame(
-            columns=attributes, data=list(product(*attr_combs))
+        full_counts = (
+            super()
+            ._get_attribute_frequency_counts(attributes, encoded_dataset)
+            .astype(float)
         )
-        full_counts = merge(full_space, counts, how="left")
-        full_counts.fillna(0, inplace=True)
 
-        # Get Laplace noise sample
-        noise_sample = laplace(
-            0, scale=self.laplace_noise_scale, size=full_counts.index.size
+        # Add Laplace noise
+        full_counts += laplace(
+            0, scale=self.laplace_noise_scale, size=full_counts.shape
         )
-        full_counts["count"] += noise_sample
-        full_counts.loc[full_counts["count"] < 0, "count"] = 0
+        full_counts.clip(0, out=full_counts)
 
         return full_counts
 
@@ -1,10 +1,8 @@
 from abc import ABCMeta, abstractmethod
 from bisect import bisect_right
-from random import uniform
 
 import numpy as np
-from numpy.random import choice
-from pandas import Series
+from pandas import Categorical, CategoricalDtype, Series
 
 from ..utils import normalize_given_distribution
 
@@ -37,10 +35,10 @@ class AbstractAttribute(object):
     @abstractmethod
     def infer_distribution(self):
         if self.is_categorical:
-            histogram = self.data_dropna.value_counts()
-            for value in set(self.distribution_bins) - set(histogram.index):
-                histogram[value] = 0
-            histogram = histogram[self.distribution_bins]
+            codes = self.category_codes()
+            histogram = np.bincount(
+                codes[codes >= 0], minlength=len(self.distribution_bins)
+            )
             self.distribution_probabilities = normalize_given_distribution(
                 histogram
             )
@@ -53,17 +51,37 @@ class AbstractAttribute(object):
                 histogram
             )
 
+    def category_codes(self):
+        """
+        Index of each value in ``distribution_bins``, -1 for missing values.
+
+        Works on the codes of categorical data, rather than on the values.
+        Values are matched to bins by their string representation.
+        """
+        data = self.data
+        if not isinstance(data.dtype, CategoricalDtype):
+            data = data.astype("category")
+        data = data.cat.rename_categories(
+            data.cat.categories.astype(str)
+        ).cat.set_categories(self.distribution_bins)
+
+        codes = data.cat.codes.to_numpy()
+        unknown = (codes < 0) & self.data.notna().to_numpy()
+        if unknown.any():
+            raise ValueError(
+                f"Values of {self.name} outside its domain: "
+                f"{set(self.data[unknown])}"
+            )
+        return codes
+
     def encode_values_into_bin_idx(self):
         """
         Encode values into bin indices for Bayesian Network construction.
         """
         if self.is_categorical:
-            value_to_bin_idx = {
-                value: idx for idx, value in enumerate(self.distribution_bins)
-            }
-            encoded = self.data.map(
-                lambda x: value_to_bin_idx[str(x)], na_action="ignore"
-            )
+            codes = self.category_codes().astype(int)
+            codes[codes < 0] = len(self.distribution_bins)
+            return Series(codes, index=self.data.index, name=self.name)
         else:
             encoded = self.data.map(
                 lambda x: bisect_right(self.distribution_bins[:-1], x) - 1,
@@ -91,31 +109,28 @@ class AbstractAttribute(object):
         """When attribute should be a candidate key in output dataset."""
         return np.arange(n)
 
-    def sample_binning_indices_in_independent_attribute_mode(self, n):
-        """Sample an array of binning indices."""
-        return Series(
-            choice(
-                len(self.distribution_probabilities),
-                size=n,
-                p=self.distribution_probabilities,
-            )
-        )
-
     @abstractmethod
     def sample_values_from_binning_indices(self, binning_indices):
-        """Convert binning indices into values in domain. Used by both independent and correlated attribute mode."""
-        return binning_indices.apply(
-            lambda x: self.uniform_sampling_within_a_bin(x)
-        )
+        """Convert binning indices into values in domain. Used by both independent and correlated attribute mode.
 
-    def uniform_sampling_within_a_bin(self, bin_idx):
-        num_bins = len(self.distribution_probabilities)
-        if bin_idx == num_bins:
-            return np.nan
-        elif self.is_categorical:
-            return self.distribution_bins[bin_idx]
-        else:
-            return uniform(
-                self.distribution_bins[bin_idx],
-                self.distribution_bins[bin_idx + 1],
+        Index ``len(distribution_probabilities)`` stands for a missing value.
+        Categorical values are decoded to a categorical column over
+        ``distribution_bins``, numerical values are drawn uniformly within
+        their bins.
+        """
+        indices = np.asarray(binning_indices, dtype=np.intp)
+        index = getattr(binning_indices, "index", None)
+        missing = indices == len(self.distribution_probabilities)
+
+        if self.is_categorical:
+            values = Categorical.from_codes(
+                np.where(missing, -1, indices),
+                categories=self.distribution_bins,
             )
+        else:
+            bins = np.asarray(self.distribution_bins, dtype=float)
+            indices = np.where(missing, 0, indices)
+            values = np.random.uniform(bins[indices], bins[indices + 1])
+            values[missing] = np.nan
+
+        return Series(values, index=index, name=self.name)
@@ -2,7 +2,7 @@ import numpy as np
 
 from .AbstractAttribute import AbstractAttribute
 from .utils.DataType import DataType
-from ..utils import normalize_given_distribution, generate_random_string
+from ..utils import generate_random_string
 
 
 class StringAttribute(AbstractAttribute):
@@ -13,30 +13,20 @@ class StringAttribute(AbstractAttribute):
         self.is_categorical = True
         self.is_numerical = False
         self.data_type = DataType.STRING
-        self.data_dropna_len = self.data_dropna.astype(str).map(len)
 
     def set_domain(self, domain=None):
-        if domain is not None:
-            lengths = [len(i) for i in domain]
-            self.min = min(lengths)
-            self.max = max(lengths)
-            self.distribution_bins = np.array(domain)
-        else:
-            self.min = int(self.data_dropna_len.min())
-            self.max = int(self.data_dropna_len.max())
-            self.distribution_bins = self.data_dropna.unique()
+        if domain is None:
+            domain = self.data_dropna.unique().astype(str)
+
+        lengths = [len(i) for i in domain]
+        self.min = min(lengths)
+        self.max = max(lengths)
+        self.distribution_bins = np.array(domain)
 
         self.domain_size = len(self.distribution_bins)
 
     def infer_distribution(self):
-
-        histogram = self.data_dropna.value_counts()
-        for attr_cat in set(self.distribution_bins) - set(histogram.index):
-            histogram[attr_cat] = 0
-        histogram = histogram[self.distribution_bins]
-        self.distribution_probabilities = normalize_given_distribution(
-            histogram
-        )
+        super().infer_distribution()
 
     def generate_values_as_candidate_key(self, n):
         length = np.random.randint(self.min, self.max)
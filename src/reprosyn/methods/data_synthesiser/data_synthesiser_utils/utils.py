@@ -1,10 +1,13 @@
 from math import log, ceil
-from numpy import array, exp, isinf, full_like
-from numpy.random import choice
+import numpy as np
+from numpy import array, divide, empty, exp, intp, isinf, full_like, nonzero
+from numpy.random import choice, random_sample
 from string import ascii_lowercase
 from itertools import combinations
-from pandas import Series, DataFrame
-from sklearn.metrics import mutual_info_score, normalized_mutual_info_score
+from pandas import Series, DataFrame, factorize
+from sklearn.metrics import mutual_info_score
+
+from reprosyn.marginals import pairwise_normalized_mutual_information
 
 
 def mutual_information(labels_x: Series, labels_y: DataFrame):
@@ -14,29 +17,103 @@ def mutual_information(labels_x: Series, labels_y: DataFrame):
     ----------
     labels_x : Series
     labels_y : DataFrame
+        integer-coded labels, several columns are combined into one label
     """
     if labels_y.shape[1] == 1:
         labels_y = labels_y.iloc[:, 0]
     else:
-        labels_y = labels_y.apply(lambda x: " ".join(x.values), axis=1)
+        labels_y = combine_labels(labels_y)
 
     return mutual_info_score(labels_x, labels_y)
 
 
-def pairwise_attributes_mutual_information(dataset):
-    """Compute normalized mutual information for all pairwise attributes. Return a DataFrame."""
+def combine_labels(labels: DataFrame):
+    """A single integer label for each distinct row of integer-coded labels.
+
+    Labels are combined one column at a time and re-coded after each, so
+    they stay below the number of rows.
+    """
+    columns = [labels[c].to_numpy() for c in labels.columns]
+    key = columns[0]
+    for col in columns[1:]:
+        key, _ = factorize(key * (int(col.max()) + 1) + col)
+    return key
+
+
+def pairwise_attributes_mutual_information(dataset, workers=1):
+    """Compute normalized mutual information for all pairwise attributes. Return a DataFrame.
+
+    See :func:`pairwise_normalized_mutual_information`, values match
+    ``normalized_mutual_info_score`` with ``average_method="arithmetic"``.
+    """
     sorted_columns = sorted(dataset.columns)
-    mi_df = DataFrame(
-        columns=sorted_columns, index=sorted_columns, dtype=float
+    codes, shape = encode_labels(dataset[sorted_columns])
+    return DataFrame(
+        pairwise_normalized_mutual_information(codes, shape, workers),
+        columns=sorted_columns,
+        index=sorted_columns,
     )
-    for row in mi_df.columns:
-        for col in mi_df.columns:
-            mi_df.loc[row, col] = normalized_mutual_info_score(
-                dataset[row].astype(str),
-                dataset[col].astype(str),
-                average_method="arithmetic",
-            )
-    return mi_df
+
+
+def compare_pairwise_attributes_mutual_information(real, synthetic, workers=1):
+    """Normalized mutual information matrices of a real and a synthetic
+    dataset, over the columns they share.
+
+    Returns
+    -------
+    DataFrame
+        matrix of the real dataset, see
+        :func:`pairwise_attributes_mutual_information`
+    DataFrame
+        matrix of the synthetic dataset, with the same index and columns
+    """
+    columns = [col for col in real.columns if col in set(synthetic.columns)]
+    return (
+        pairwise_attributes_mutual_information(real[columns], workers),
+        pairwise_attributes_mutual_information(synthetic[columns], workers),
+    )
+
+
+def encode_labels(dataset):
+    """Integer codes of the values of every column of a DataFrame.
+
+    Missing values are a label of their own.
+
+    Returns
+    -------
+    ndarray
+        codes, of shape (rows, columns)
+    list[int]
+        number of labels of each column
+    """
+    codes = empty(dataset.shape, dtype=intp)
+    shape = []
+    for j, col in enumerate(dataset.columns):
+        col_codes, uniques = factorize(dataset[col])
+        missing = col_codes < 0
+        codes[:, j] = np.where(missing, len(uniques), col_codes)
+        shape.append(len(uniques) + int(missing.any()))
+
+    return codes, shape
+
+
+def marginal_counts(counts, attributes, subset):
+    """Marginal of a dense contingency table on a subset of its attributes.
+
+    Parameters
+    ----------
+    counts : ndarray
+        counts with one axis per attribute
+    attributes : list
+        attribute of each axis of ``counts``
+    subset : list
+        attributes to keep, in the order of the returned axes
+    """
+    keep = [attributes.index(attr) for attr in subset]
+    summed = counts.sum(
+        axis=tuple(i for i in range(len(attributes)) if i not in keep)
+    )
+    return summed.transpose([sorted(keep).index(i) for i in keep])
 
 
 def normalize_given_distribution(frequencies):
@@ -52,6 +129,53 @@ def normalize_given_distribution(frequencies):
         return full_like(distribution, 1 / distribution.size)
 
 
+def normalize_given_distributions(frequencies):
+    """:func:`normalize_given_distribution` of every distribution along the
+    last axis of ``frequencies`` at once."""
+    distributions = array(frequencies, dtype=float).clip(0)
+    summation = distributions.sum(axis=-1, keepdims=True)
+
+    normalized = full_like(distributions, 1 / distributions.shape[-1])
+    divide(
+        distributions,
+        summation,
+        out=normalized,
+        where=(summation > 0) & ~isinf(summation),
+    )
+    for idx in zip(*nonzero(isinf(summation[..., 0]))):
+        normalized[idx] = normalize_given_distribution(distributions[idx])
+
+    return normalized
+
+
+def sample_binning_indices(distributions, nsamples):
+    """Samples bin indices of several attributes in one batch.
+
+    Draws the same indices as ``choice(len(p), nsamples, p=p)`` for each
+    distribution ``p`` in turn, from one matrix of uniform samples.
+
+    Parameters
+    ----------
+    distributions : list[ndarray]
+        probabilities of the bins of each attribute
+    nsamples : int
+        number of samples
+
+    Returns
+    -------
+    ndarray
+        bin indices, with one row per attribute
+    """
+    uniform_samples = random_sample((len(distributions), nsamples))
+    indices = empty((len(distributions), nsamples), dtype=intp)
+    for row, p, u in zip(indices, distributions, uniform_samples):
+        cdf = array(p, dtype=float).cumsum()
+        cdf /= cdf[-1]
+        row[:] = cdf.searchsorted(u, side="right")
+
+    return indices
+
+
 def infer_numerical_attributes_in_dataframe(dataframe):
     describe = dataframe.describe()
     # DataFrame.describe() usually returns 8 rows.
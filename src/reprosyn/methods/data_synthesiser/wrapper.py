@@ -1,22 +1,63 @@
-from reprosyn.generator import PipelineBase
+import math
+
+from reprosyn.costs import BYTES_PER_CELL, clique_cells, domain_sizes
+from reprosyn.generator import PipelineBase, describe_columns
 
 from .data_synthesiser import IndependentHistogram, BayesianNet, PrivBayes
+from .data_synthesiser_utils.datatypes.constants import (
+    CATEGORICAL,
+    INTEGER,
+    FLOAT,
+)
 
 
-def get_metadata(metadata):
+# column types of the numeric representations
+NUMERIC_TYPES = {"integer": INTEGER, "number": FLOAT}
 
-    # TODO: for now, just do everything as categorical. Need to edit to pick up data type from columns
-    meta = {}
-    meta["columns"] = [
-        {
-            "name": col["name"],
-            "type": "Categorical",
-            "size": len(col["representation"]),
-            "i2s": col["representation"],
-        }
-        for col in metadata
-    ]
-    return meta
+
+def get_metadata(metadata, data=None, epsilon=None):
+    """Transform metadata into the form read by :class:`DataDescriber`
+
+    Finite columns are categorical, and "integer" and "number" columns are
+    numeric, with their range taken from metadata or else from ``data``,
+    which warns under a privacy budget ``epsilon``, see
+    :func:`~generator.describe_columns`.
+    """
+
+    return describe_columns(
+        metadata, CATEGORICAL, NUMERIC_TYPES, data, epsilon
+    )
+
+
+def bayes_net_cost(metadata, rows, size, histogram_bins=10, degree=1):
+    """Memory and compute of fitting and sampling a :class:`BayesianNet`.
+
+    Numeric columns are binned into ``histogram_bins`` values. Each step of
+    the greedy search counts one table of ``degree + 1`` columns per
+    candidate child and parent set, and the network keeps one conditional
+    table per column, as lists of at most the largest such table. A
+    ``degree`` of 0 stands for independent histograms, without search.
+
+    Returns
+    -------
+    dict
+        see :meth:`~reprosyn.generator.PipelineBase.estimate_cost`
+    """
+
+    sizes = domain_sizes(metadata, numeric_size=histogram_bins)
+    width = len(sizes)
+    cells = clique_cells(sizes, degree + 1)
+    candidates = degree and sum(
+        (width - n) * math.comb(n, min(n, degree)) for n in range(1, width)
+    )
+    data = width * (rows + size)
+
+    return {
+        "memory": BYTES_PER_CELL * (2 * data + 4 * width * cells),
+        "compute": candidates * (rows * (degree + 1) + cells) + data,
+        "clique_cells": cells,
+        "candidates": candidates,
+    }
 
 
 class DS_INDHIST(PipelineBase):
@@ -29,9 +70,18 @@ class DS_INDHIST(PipelineBase):
 
         super().__init__(**kw, **parameters)
 
+    def estimate_cost(self):
+        return bayes_net_cost(
+            self.dataset.metadata,
+            len(self.dataset.data),
+            self.size,
+            self.params["histogram_bins"],
+            degree=0,
+        )
+
     def preprocess(self):
 
-        self.domain = get_metadata(self.dataset.metadata)
+        self.domain = get_metadata(self.dataset.metadata, self.dataset.data)
 
     def generate(self, refit=False):
 
@@ -54,17 +104,24 @@ class DS_BAYNET(PipelineBase):
 
         super().__init__(**kw, **parameters)
 
+    def estimate_cost(self):
+        return bayes_net_cost(
+            self.dataset.metadata,
+            len(self.dataset.data),
+            self.size,
+            self.params["histogram_bins"],
+            self.params["degree"],
+        )
+
     def preprocess(self):
 
-        self.domain = get_metadata(self.dataset.metadata)
+        self.domain = get_metadata(self.dataset.metadata, self.dataset.data)
 
     def generate(self, refit=False):
 
         if (not self.gen) or refit:
             self.gen = BayesianNet(self.domain, **self.params)
-            self.gen.fit(
-                self.dataset.data.astype("object")
-            )  # hack to get round a not implemented error when dtype=="category"
+            self.gen.fit(self.dataset.data, progress=self.progress_reporter)
 
         self.output = self.gen.generate_samples(self.size)
 
@@ -84,14 +141,27 @@ class DS_PRIVBAYES(PipelineBase):
 
         super().__init__(**kw, **parameters)
 
+    def estimate_cost(self):
+        return bayes_net_cost(
+            self.dataset.metadata,
+            len(self.dataset.data),
+            self.size,
+            self.params["histogram_bins"],
+            self.params["degree"],
+        )
+
     def preprocess(self):
 
-        self.domain = get_metadata(self.dataset.metadata)
+        self.domain = get_metadata(
+            self.dataset.metadata,
+            self.dataset.data,
+            epsilon=self.params["epsilon"],
+        )
 
     def generate(self, refit=False):
 
         if (not self.gen) or refit:
             self.gen = PrivBayes(self.domain, **self.params)
-            self.gen.fit(self.dataset.data.astype("object"))
+            self.gen.fit(self.dataset.data, progress=self.progress_reporter)
 
         self.output = self.gen.generate_samples(self.size)
@@ -1,6 +1,6 @@
 import click
 
-from reprosyn.cli_utils import wrap_generator
+from reprosyn.cli_utils import run_generator, wrap_generator
 from reprosyn.methods.gans.gans import CTGAN, PATEGAN
 
 
@@ -47,14 +47,22 @@ from reprosyn.methods.gans.gans import CTGAN, PATEGAN
     default=300,
     help="Number of iterations",
 )
+@click.option(
+    "--load_model",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Synthesizer saved by CTGAN.save_model, to sample without fitting",
+)
 @wrap_generator
-def cmd_ctgan(ctx, **kwargs):
+def cmd_ctgan(ctx, load_model=None, **kwargs):
     """Runs ctgan on --dataset or STDIN
 
     See rsyn ctgan --help.
     """
     generator = CTGAN(**ctx.parent.params, **kwargs)
-    generator.run()
+    if load_model is not None:
+        generator.load_model(load_model)
+    run_generator(generator)
     return generator.output
 
 
@@ -95,9 +103,29 @@ def cmd_ctgan(ctx, **kwargs):
     type=float,
     default=1e-4,
 )
+@click.option(
+    "--checkpoint_dir",
+    type=click.Path(file_okay=False),
+    default=None,
+    help="Directory to checkpoint training to, and resume from",
+)
+@click.option(
+    "--checkpoint_every",
+    type=int,
+    default=100,
+    help="Training iterations between checkpoints",
+)
+@click.option(
+    "--load_model",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Generator saved by PATEGAN.save_model, to sample without fitting",
+)
 @wrap_generator
-def cmd_pategan(ctx, **kwargs):
+def cmd_pategan(ctx, load_model=None, **kwargs):
 
     generator = PATEGAN(**ctx.parent.params, **kwargs)
-    generator.run()
+    if load_model is not None:
+        generator.load_model(load_model)
+    run_generator(generator)
     return generator.output
@@ -1,12 +1,147 @@
 """ CTGAN interface to CTGANSynthesiser. See https://github.com/alan-turing-institute/CTGAN/blob/dependencies/ctgan/synthesizer.py """
 
-from reprosyn.generator import PipelineBase
+import contextlib
+import io
+import pickle
+import re
+import sys
+
+from reprosyn.costs import BYTES_PER_CELL, domain_sizes
+from reprosyn.generator import PipelineBase, describe_columns
 
 from ctgan import CTGANSynthesizer
 from reprosyn.methods.gans.pate_gan import PateGan
 
 
-def get_metadata(metadata, col_type="categorical"):
+# column types of the numeric representations, as read by CTGAN
+CTGAN_NUMERIC_TYPES = {"integer": "continuous", "number": "continuous"}
+
+# column types of the numeric representations, as read by PateGan
+PATEGAN_NUMERIC_TYPES = {"integer": "Integer", "number": "Float"}
+
+# one-hot width of a continuous column in CTGAN, its value and the modes of
+# its Bayesian Gaussian mixture
+CTGAN_CONTINUOUS_WIDTH = 1 + 10
+
+# CTGAN's discriminator reads packs of this many rows at once
+CTGAN_PAC = 10
+
+# float32 weights, gradients and both Adam moments of each parameter
+BYTES_PER_PARAMETER = 4 * 4
+
+# line printed by CTGANSynthesizer.fit after each epoch.
+# STOPGAP: the CTGAN fork has no epoch callback, so progress is parsed from
+# this log line, see :func:`report_epochs`. Replace with a callback once the
+# fork accepts one.
+CTGAN_EPOCH_LOG = re.compile(
+    r"Epoch (\d+), Loss G: *(-?[\d.]+), *Loss D: *(-?[\d.]+)"
+)
+
+
+class _EpochLog(io.TextIOBase):
+    """Passes CTGAN's output through, reporting the epochs it logs.
+
+    A stopgap until the CTGAN fork has an epoch callback, see
+    :func:`report_epochs`.
+    """
+
+    def __init__(self, stream, reporter, rows):
+        self.stream = stream
+        self.reporter = reporter
+        self.rows = rows
+        self.line = ""
+
+    def write(self, text):
+        self.stream.write(text)
+        *lines, self.line = (self.line + text).split("\n")
+        for line in lines:
+            match = CTGAN_EPOCH_LOG.search(line)
+            if match:
+                epoch, loss_g, loss_d = match.groups()
+                self.reporter.update(
+                    int(epoch) - self.reporter.iteration,
+                    loss={
+                        "generator": float(loss_g),
+                        "discriminator": float(loss_d),
+                    },
+                    rows=self.rows,
+                )
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+@contextlib.contextmanager
+def report_epochs(reporter, rows):
+    """Reports the epochs CTGANSynthesizer.fit prints, which has no
+    callbacks of its own, as training iterations of ``rows`` rows.
+
+    This is a stopgap until the CTGAN fork takes an epoch callback. It
+    depends on the exact format of CTGAN's log line, :data:`CTGAN_EPOCH_LOG`,
+    and redirects the process-wide ``sys.stdout`` while fitting, so it is
+    not thread-safe: output printed by other threads during a fit passes
+    through it too, and concurrent fits must not report progress. Progress
+    is only reported, never relied on, so a changed log format loses the
+    reports but not the fit.
+    """
+
+    if not reporter.enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(_EpochLog(sys.stdout, reporter, rows)):
+        yield
+
+
+def dense_parameters(dims):
+    """Weights of a stack of dense layers of sizes ``dims``, from input to
+    output."""
+
+    return sum(n * m for n, m in zip(dims, dims[1:]))
+
+
+def gan_cost(rows, width, parameters, steps, batch_rows):
+    """Memory and compute of training a GAN on one-hot encoded data.
+
+    Parameters
+    ----------
+    rows : int
+        rows of the training data, held in memory as float64
+    width : int
+        one-hot width of a row
+    parameters : int
+        weights of the generator and discriminators, see
+        :func:`dense_parameters`
+    steps : int
+        training steps
+    batch_rows : int
+        rows through the networks at each step
+
+    Returns
+    -------
+    dict
+        see :meth:`~reprosyn.generator.PipelineBase.estimate_cost`
+    """
+
+    return {
+        "memory": (
+            2 * BYTES_PER_CELL * rows * width
+            + BYTES_PER_PARAMETER * parameters
+        ),
+        # forward and backward passes of each row through each weight
+        "compute": 3 * steps * batch_rows * parameters,
+        "width": width,
+        "parameters": parameters,
+    }
+
+
+def get_metadata(
+    metadata,
+    col_type="categorical",
+    numeric_types=CTGAN_NUMERIC_TYPES,
+    data=None,
+    epsilon=None,
+):
     """Transform metadata into a form useful for the generator
 
     Parameters
@@ -14,30 +149,24 @@ def get_metadata(metadata, col_type="categorical"):
     metadata : list[dict]
         metadata, see `Data Format <https://privacy-sdg-toolbox.readthedocs.io/en/latest/dataset-schema.html>`_
     col_type : str, optional
-        column type, by default "categorical"
+        column type of finite columns, by default "categorical"
+    numeric_types : dict, optional
+        column type of each numeric representation, "integer" and "number",
+        by default :data:`CTGAN_NUMERIC_TYPES`
+    data : pd.DataFrame, optional
+        dataset, used for the range of numeric columns without ``min`` and
+        ``max`` in metadata, see :func:`~generator.column_bounds`
+    epsilon : float, optional
+        privacy budget of the generator, by default None. Ranges taken from
+        ``data`` under a budget warn that they are not private.
 
     Returns
     -------
     dict
-        a 'columns' key gives a list[dict] of column info, with keys 'name', 'type', 'size', 'i2s'.
-
-    Notes
-    -----
-
-    To be more flexible ``col_type`` should be a named list.
+        see :func:`~generator.describe_columns`
     """
 
-    meta = {}
-    meta["columns"] = [
-        {
-            "name": col["name"],
-            "type": col_type,
-            "size": len(col["representation"]),
-            "i2s": col["representation"],
-        }
-        for col in metadata
-    ]
-    return meta
+    return describe_columns(metadata, col_type, numeric_types, data, epsilon)
 
 
 class CTGAN(PipelineBase):
@@ -79,7 +208,7 @@ class CTGAN(PipelineBase):
         l2scale=1e-6,
         batch_size=500,
         epochs=300,
-        **kw
+        **kw,
     ):
 
         parameters = {
@@ -95,10 +224,38 @@ class CTGAN(PipelineBase):
 
         super().__init__(**kw, **parameters)
 
+    def estimate_cost(self):
+        """Memory and compute of training, see :func:`gan_cost`, over the
+        one-hot width of the data and its conditional vector."""
+
+        rows = len(self.dataset.data)
+        width = sum(
+            domain_sizes(self.dataset.metadata, CTGAN_CONTINUOUS_WIDTH)
+        )
+        inputs = self.params["embedding_dim"] + width
+        # each residual layer concatenates its output to its input
+        generator = sum(
+            (inputs + sum(self.params["gen_dim"][:i])) * dim
+            for i, dim in enumerate(self.params["gen_dim"])
+        ) + width * (inputs + sum(self.params["gen_dim"]))
+        discriminator = dense_parameters(
+            [CTGAN_PAC * 2 * width, *self.params["dis_dim"], 1]
+        )
+
+        cost = gan_cost(
+            rows,
+            width,
+            generator + discriminator,
+            self.params["epochs"] * max(rows // self.params["batch_size"], 1),
+            self.params["batch_size"],
+        )
+        cost["memory"] += 2 * BYTES_PER_CELL * self.size * width
+        return cost
+
     def preprocess(self):
         """Gets metadata using :func:`get_metadata`"""
 
-        self.meta = get_metadata(self.dataset.metadata)
+        self.meta = get_metadata(self.dataset.metadata, data=self.dataset.data)
 
     def generate(self, refit=False):
         """See `CTGANSynthesizer.fit() <https://github.com/alan-turing-institute/CTGAN/blob/master/ctgan/synthesizer.py#L111>`_ and `CTGANSynthesizer.sample() <https://github.com/alan-turing-institute/CTGAN/blob/master/ctgan/synthesizer.py#L240>`_
@@ -109,14 +266,67 @@ class CTGAN(PipelineBase):
            If true refits a `CTGANSynthesizer <https://github.com/alan-turing-institute/CTGAN/blob/master/ctgan/synthesizer.py#L20>`_ class
         """
 
+        self._fit(refit)
+        self.output = self.ctgan.sample(self.size)
+
+    def iter_generate(self, refit=False):
+        """Samples in chunks of at most ``chunksize`` rows, see
+        :meth:`generate`"""
+
+        self._fit(refit)
+        for start in range(0, self.size, self.chunksize):
+            self.output = self.ctgan.sample(
+                min(self.chunksize, self.size - start)
+            )
+            yield self.output
+
+    def _fit(self, refit):
         if (not self.ctgan) or refit:
             self.ctgan = CTGANSynthesizer(**self.params)
-            self.ctgan.fit(self.dataset.data, self.meta)
+            reporter = self.progress_reporter(
+                "fit", total=self.params["epochs"]
+            )
+            with report_epochs(reporter, rows=len(self.dataset.data)):
+                self.ctgan.fit(self.dataset.data, self.meta)
 
-        self.output = self.ctgan.sample(self.size)
+    def is_fitted(self):
+        return self.ctgan is not None
+
+    def save_model(self, path):
+        """Saves the fitted synthesizer, pickled whole.
+
+        The pickle holds the synthesizer's classes by reference, so it only
+        loads with the version of the CTGAN fork it was saved with, and
+        should only be loaded from trusted files.
+        """
+
+        with open(path, "wb") as f:
+            pickle.dump(self.ctgan, f)
+
+    def load_model(self, path):
+        """Loads a synthesizer saved by :meth:`save_model`, so that
+        :meth:`generate` samples from it without refitting. It must have
+        been saved with the installed version of the CTGAN fork."""
+
+        with open(path, "rb") as f:
+            self.ctgan = pickle.load(f)
 
 
 class PATEGAN(PipelineBase):
+    """Generator class for PATEGAN, see :class:`~pate_gan.PateGan`.
+
+    Parameters
+    ----------
+    checkpoint_dir : str, optional
+        directory to checkpoint training to, by default None. If it holds a
+        checkpoint of the same data and parameters, training resumes from
+        it, so a finished checkpoint is sampled from without further
+        training. ``generate(refit=True)`` deletes its checkpoints and
+        trains afresh.
+    checkpoint_every : int, optional
+        training iterations between checkpoints, by default 100
+    """
+
     def __init__(
         self,
         epsilon=1,
@@ -125,7 +335,9 @@ class PATEGAN(PipelineBase):
         n_iters=100,
         batch_size=128,
         learning_rate=1e-4,
-        **kw
+        checkpoint_dir=None,
+        checkpoint_every=100,
+        **kw,
     ):
 
         parameters = {
@@ -135,20 +347,85 @@ class PATEGAN(PipelineBase):
             "n_iters": n_iters,
             "batch_size": batch_size,
             "learning_rate": learning_rate,
+            "checkpoint_dir": checkpoint_dir,
+            "checkpoint_every": checkpoint_every,
         }
 
         self.gen = None
 
         super().__init__(**kw, **parameters)
 
+    def estimate_cost(self):
+        """Memory and compute of training, see :func:`gan_cost`, with the
+        layer sizes of :class:`~pate_gan.PateGan`."""
+
+        width = sum(domain_sizes(self.dataset.metadata))
+        teachers = self.params["num_teachers"]
+        generator = dense_parameters([width // 4, width, width, width])
+        discriminator = dense_parameters([width, width, width, 1])
+
+        cost = gan_cost(
+            len(self.dataset.data),
+            width,
+            generator + (teachers + 1) * discriminator,
+            self.params["n_iters"],
+            # a real and a generated batch through each discriminator
+            2 * self.params["batch_size"],
+        )
+        cost["memory"] += 2 * BYTES_PER_CELL * self.size * width
+        return cost
+
     def preprocess(self):
 
-        self.meta = get_metadata(self.dataset.metadata, col_type="Categorical")
+        self.meta = get_metadata(
+            self.dataset.metadata,
+            col_type="Categorical",
+            numeric_types=PATEGAN_NUMERIC_TYPES,
+            data=self.dataset.data,
+            epsilon=self.params["epsilon"],
+        )
 
     def generate(self, refit=False):
 
+        self._fit(refit)
+        self.output = self.gen.generate_samples(self.size)
+
+    def iter_generate(self, refit=False):
+        """Samples in chunks of at most ``chunksize`` rows, see
+        :meth:`~pate_gan.PateGan.iter_samples`"""
+
+        self._fit(refit)
+        for chunk in self.gen.iter_samples(self.size, self.chunksize):
+            self.output = chunk
+            yield chunk
+
+    def _fit(self, refit):
         if (not self.gen) or refit:
             self.gen = PateGan(self.meta, **self.params)
-            self.gen.fit(self.dataset.data)
+            self.gen.fit(
+                self.dataset.data,
+                progress=self.progress_reporter,
+                resume=not refit,
+            )
 
-        self.output = self.gen.generate_samples(self.size)
+    def is_fitted(self):
+        return self.gen is not None and self.gen.trained
+
+    def save_model(self, path):
+        """Saves the fitted generator, with the metadata it decodes samples
+        with, see :meth:`~pate_gan.PateGan.save_generator`"""
+
+        self.gen.save_generator(path)
+
+    def load_model(self, path):
+        """Loads a generator saved by :meth:`save_model`, so that
+        :meth:`generate` samples from it without refitting.
+
+        Samples are decoded with the saved metadata, e.g. the ranges of
+        numeric columns the generator was trained with, rather than with
+        metadata derived from the current dataset.
+        """
+
+        self.meta = PateGan.load_generator_metadata(path)
+        self.gen = PateGan(self.meta, **self.params)
+        self.gen.load_generator(path)
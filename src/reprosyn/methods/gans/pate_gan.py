@@ -5,18 +5,19 @@ by J. Yoon, J. Jordon, M. van der Schaar, published in International Conference
 Adapted from: https://bitbucket.org/mvdschaar/mlforhealthlabpub/src/82d7f91d46db54d256ff4fc920d513499ddd2ab8/alg/pategan/
 """
 
+import hashlib
+import json
 import os
 
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"  ##silence unneccesary warnings
 
-import tensorflow.compat.v1 as tf
+import tensorflow as tf
 
-tf.logging.set_verbosity(tf.logging.ERROR)
-tf.disable_v2_behavior()
+tf.get_logger().setLevel("ERROR")
 
 
 import numpy as np
-from pandas import DataFrame
+from pandas import DataFrame, RangeIndex, concat, factorize
 
 
 ##### use synthetic_data_release code
@@ -32,9 +33,20 @@ from reprosyn.methods.data_synthesiser.data_synthesiser_utils.datatypes.constant
 
 ZERO_TOL = 1e-8
 
+# number of records generated and decoded at once when sampling
+SAMPLE_BATCH_SIZE = 2**16
+
 
 class PateGan(GenerativeModel):
-    """A generative adversarial network trained under the PATE framework to achieve differential privacy"""
+    """A generative adversarial network trained under the PATE framework to achieve differential privacy
+
+    Each of the ``num_teachers`` teachers has its own discriminator, trained
+    on its own disjoint partition of the data, and the generator is updated
+    against the mean output of all teachers. The discriminators are stacked
+    along a leading axis, so that all teachers are updated in one batched
+    step. Earlier versions trained a single discriminator shared by every
+    teacher, so fits differ from theirs.
+    """
 
     def __init__(
         self,
@@ -47,6 +59,8 @@ class PateGan(GenerativeModel):
         batch_size=128,
         learning_rate=1e-4,
         multiprocess=False,
+        checkpoint_dir=None,
+        checkpoint_every=100,
     ):
         """
         :param metadata: dict: Attribute metadata describing the data domain of the synthetic target data
@@ -55,6 +69,8 @@ class PateGan(GenerativeModel):
         :param target: str: Name of the target variable for downstream classification tasks
         :param num_teachers: int: Number of teacher discriminators
         :param n_iters: int: Number of training iterations
+        :param checkpoint_dir: str: Directory to checkpoint training to. If it holds a checkpoint, fit resumes from it
+        :param checkpoint_every: int: Number of training iterations between checkpoints
         """
         # Data description
         self.metadata, self.attribute_list = self.read_meta(metadata)
@@ -81,20 +97,10 @@ class PateGan(GenerativeModel):
         else:
             self.device_spec = tf.DeviceSpec(device_type="GPU", device_index=0)
 
-        with tf.device(self.device_spec.to_string()):
-            # Variable init
-            # Feature matrix
-            self.X = tf.placeholder(tf.float32, shape=[None, self.nfeatures])
-            # Latent space
-            self.Z = tf.placeholder(tf.float32, shape=[None, self.z_dim])
-            # Noise variable
-            self.M = tf.placeholder(tf.float32, shape=[None, 1])
-            # Generator
-            self.GDist = None
-            self._generator()
-            # Discriminator
-            self._discriminator()
-            self.sess = tf.Session()
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_every = checkpoint_every
+
+        self._build()
 
         self.multiprocess = multiprocess
 
@@ -152,6 +158,44 @@ class PateGan(GenerativeModel):
 
         return meta_dict, attr_names
 
+    def _build(self):
+        """Creates fresh networks, solvers and training state"""
+        with tf.device(self.device_spec.to_string()):
+            # Generator
+            self._generator()
+            # Discriminator
+            self._discriminator()
+
+            # Solver, built up front so that checkpoints restore into
+            # their slots
+            self.discriminator_solver = tf.keras.optimizers.Adam(
+                learning_rate=self.learning_rate, beta_1=0.5, epsilon=1e-8
+            )
+            self.discriminator_solver.build(self.theta_D)
+            self.generator_solver = tf.keras.optimizers.Adam(
+                learning_rate=self.learning_rate, beta_1=0.5, epsilon=1e-8
+            )
+            self.generator_solver.build(self.theta_G)
+
+            # Training state, the seed fixes the teacher partitions
+            self.iteration = tf.Variable(0, dtype=tf.int64, trainable=False)
+            self.partition_seed = tf.Variable(
+                np.random.randint(2**31), dtype=tf.int64, trainable=False
+            )
+            # digest of the data and parameters trained on, see
+            # _fingerprint
+            self.fingerprint = tf.Variable("", trainable=False)
+
+        self.checkpoint = tf.train.Checkpoint(
+            generator=self.theta_G,
+            discriminator=self.theta_D,
+            generator_solver=self.generator_solver,
+            discriminator_solver=self.discriminator_solver,
+            iteration=self.iteration,
+            partition_seed=self.partition_seed,
+            fingerprint=self.fingerprint,
+        )
+
     def _generator(self):
         self.G_W1 = tf.Variable(self._xavier_init([self.z_dim, self.h_dim]))
         self.G_b1 = tf.Variable(tf.zeros(shape=[self.h_dim]))
@@ -174,16 +218,19 @@ class PateGan(GenerativeModel):
         ]
 
     def _discriminator(self):
+        # One discriminator per teacher, stacked along the first axis
+        n = self.num_teachers
+
         self.D_W1 = tf.Variable(
-            self._xavier_init([self.nfeatures, self.h_dim])
+            self._xavier_init([n, self.nfeatures, self.h_dim])
         )
-        self.D_b1 = tf.Variable(tf.zeros(shape=[self.h_dim]))
+        self.D_b1 = tf.Variable(tf.zeros(shape=[n, 1, self.h_dim]))
 
-        self.D_W2 = tf.Variable(self._xavier_init([self.h_dim, self.h_dim]))
-        self.D_b2 = tf.Variable(tf.zeros(shape=[self.h_dim]))
+        self.D_W2 = tf.Variable(self._xavier_init([n, self.h_dim, self.h_dim]))
+        self.D_b2 = tf.Variable(tf.zeros(shape=[n, 1, self.h_dim]))
 
-        self.D_W3 = tf.Variable(self._xavier_init([self.h_dim, 1]))
-        self.D_b3 = tf.Variable(tf.zeros(shape=[1]))
+        self.D_W3 = tf.Variable(self._xavier_init([n, self.h_dim, 1]))
+        self.D_b3 = tf.Variable(tf.zeros(shape=[n, 1, 1]))
 
         self.theta_D = [
             self.D_W1,
@@ -194,9 +241,14 @@ class PateGan(GenerativeModel):
             self.D_b3,
         ]
 
-    def fit(self, data):
+    def fit(self, data, progress=None, resume=True):
         """Fit a generative model of the training data distribution.
         :param data: DataFrame: Training set
+        :param progress: callable: Optional ``progress(name, total, start)``
+            returning a ``ProgressReporter`` of the training iterations
+        :param resume: bool: Resume from the latest checkpoint in
+            ``checkpoint_dir``, if any. If False, its checkpoints are deleted
+            and training starts afresh
         """
         assert isinstance(
             data, self.datatype
@@ -204,119 +256,285 @@ class PateGan(GenerativeModel):
 
         # Clean up
         if self.trained:
-            self._generator()
-            self._discriminator()
-            self.sess = tf.Session()
+            self._build()
             self.trained = False
 
-        nsamples = len(data)
+        if len(data) < self.num_teachers:
+            raise ValueError(
+                f"PateGan needs at least one row per teacher, but got "
+                f"{len(data)} rows for {self.num_teachers} teachers"
+            )
+
         features_train = self._encode_data(data)
+        fingerprint = self._fingerprint(features_train)
+        self.fingerprint.assign(fingerprint)
+
+        # Resume from the latest checkpoint, if any
+        manager = None
+        if self.checkpoint_dir is not None:
+            if not resume:
+                self._clear_checkpoints()
+            manager = tf.train.CheckpointManager(
+                self.checkpoint, self.checkpoint_dir, max_to_keep=3
+            )
+            if manager.latest_checkpoint:
+                self.checkpoint.restore(
+                    manager.latest_checkpoint
+                ).assert_existing_objects_matched()
+                if self.fingerprint.numpy().decode() != fingerprint:
+                    raise ValueError(
+                        f"The checkpoint in {self.checkpoint_dir} was "
+                        "trained on other data or parameters, refit to "
+                        "train afresh"
+                    )
+        saved = int(self.iteration)
+        reporter = progress and progress(
+            "fit", total=self.n_iters, start=saved
+        )
+        rows = self.num_teachers * self.batch_size
 
         with tf.device(self.device_spec.to_string()):
-            # Generator
-            self.GDist = self.gen_out(self.Z)
+            train_step = tf.function(self._train_step)
 
-            # Discriminator
-            D_real = self.discriminator_out(self.X)
-            D_fake = self.discriminator_out(self.GDist)
-            D_entire = tf.concat(axis=0, values=[D_real, D_fake])
+            teacher_batches = iter(self._teacher_dataset(features_train))
 
-            # Replacement of Clipping algorithm to Penalty term
-            # 1. Line 6 in Algorithm 1
-            noisy_vals = tf.random_uniform(
-                [self.batch_size, 1], minval=0.0, maxval=1.0
+            # Training iterations
+            for _ in range(int(self.iteration), self.n_iters):
+                discriminator_loss_iter, generator_loss_iter = train_step(
+                    next(teacher_batches)
+                )
+                self.iteration.assign_add(1)
+
+                if reporter is not None and reporter.enabled:
+                    reporter.update(
+                        loss={
+                            "discriminator": float(discriminator_loss_iter),
+                            "generator": float(generator_loss_iter),
+                        },
+                        rows=rows,
+                    )
+
+                if (
+                    manager is not None
+                    and int(self.iteration) % self.checkpoint_every == 0
+                ):
+                    manager.save(checkpoint_number=self.iteration)
+                    saved = int(self.iteration)
+
+        if manager is not None and saved != int(self.iteration):
+            manager.save(checkpoint_number=self.iteration)
+
+        self.trained = True
+
+    def _fingerprint(self, features_train):
+        """Digest of the encoded training set and of the parameters that
+        change training, so that fit only resumes checkpoints of the same
+        model. ``n_iters`` is left out, so that training can be extended.
+        :param features_train: ndarray: Encoded training set
+        :return: str: Hex digest
+        """
+        digest = hashlib.sha256(np.ascontiguousarray(features_train))
+        params = (
+            self.epsilon,
+            self.delta,
+            self.num_teachers,
+            self.batch_size,
+            self.learning_rate,
+        )
+        digest.update(repr(params).encode())
+        return digest.hexdigest()
+
+    def _clear_checkpoints(self):
+        """Deletes the checkpoints written to ``checkpoint_dir`` by fit,
+        leaving any other files"""
+        manager = tf.train.CheckpointManager(
+            self.checkpoint, self.checkpoint_dir, max_to_keep=3
+        )
+        for path in manager.checkpoints:
+            for fn in tf.io.gfile.glob(f"{path}.*"):
+                tf.io.gfile.remove(fn)
+        state = os.path.join(self.checkpoint_dir, "checkpoint")
+        if tf.io.gfile.exists(state):
+            tf.io.gfile.remove(state)
+
+    def columns(self):
+        """Metadata of the attributes, in the form read by ``read_meta``,
+        with the ranges the numeric attributes were encoded with
+        :return: dict: Metadata, with a 'columns' key
+        """
+        columns = []
+        for attr_name, cdict in self.metadata.items():
+            if cdict["type"] == FLOAT or cdict["type"] == INTEGER:
+                columns.append(
+                    {
+                        "name": attr_name,
+                        "type": cdict["type"],
+                        "min": cdict["min"],
+                        "max": cdict["max"],
+                    }
+                )
+            else:
+                columns.append(
+                    {
+                        "name": attr_name,
+                        "type": cdict["type"],
+                        "i2s": cdict["categories"],
+                    }
+                )
+        return {"columns": columns}
+
+    def save_generator(self, path):
+        """Saves the weights of the fitted generator, and to ``path.json``
+        the metadata it decodes samples with, see ``columns``
+        :param path: str: Checkpoint path prefix
+        :return: str: Path of the written checkpoint
+        """
+        with open(f"{path}.json", "w") as f:
+            json.dump(self.columns(), f, default=lambda value: value.item())
+        return tf.train.Checkpoint(generator=self.theta_G).write(path)
+
+    @staticmethod
+    def load_generator_metadata(path):
+        """Loads the metadata saved by ``save_generator``, to build the
+        ``PateGan`` that loads the generator
+        :param path: str: Checkpoint path prefix
+        :return: dict: Metadata, with a 'columns' key
+        """
+        with open(f"{path}.json") as f:
+            return json.load(f)
+
+    def load_generator(self, path):
+        """Loads generator weights saved by ``save_generator``, after which
+        samples can be generated without fitting
+        :param path: str: Checkpoint path prefix
+        """
+        saved, _ = self.read_meta(self.load_generator_metadata(path))
+        if saved != self.metadata:
+            raise ValueError(
+                f"The generator in {path} was saved with other metadata, "
+                "see load_generator_metadata"
             )
-            X_inter = noisy_vals * self.X + (1.0 - noisy_vals) * self.GDist
+        tf.train.Checkpoint(generator=self.theta_G).read(
+            path
+        ).assert_existing_objects_matched()
+        self.trained = True
 
-            # 2. Line 7 in Algorithm 1
-            grad = tf.gradients(self.discriminator_out(X_inter), [X_inter])[0]
-            grad_norm = tf.sqrt(tf.reduce_sum(grad**2 + ZERO_TOL, axis=1))
-            grad_pen = self.num_teachers * tf.reduce_mean((grad_norm - 1) ** 2)
+    def _train_step(self, teacher_batches):
+        """One training iteration: for fixed generator weights a batched
+        update of all teacher discriminators, then a generator update.
 
-            # Loss function
-            discriminator_loss = (
-                tf.reduce_mean((1 - self.M) * D_entire)
-                - tf.reduce_mean(self.M * D_entire)
-                + grad_pen
+        :param teacher_batches: Tensor: real batches of shape
+            (num_teachers, batch_size, nfeatures)
+        """
+        discriminator_loss = self._discriminator_step(teacher_batches)
+
+        # Update generator weights against the average of all teachers
+        with tf.GradientTape() as tape:
+            fake_batch = self.gen_out(self._sample_latent_z())
+            generator_loss = -tf.reduce_mean(
+                self.discriminator_out(
+                    tf.broadcast_to(
+                        fake_batch,
+                        [self.num_teachers, self.batch_size, self.nfeatures],
+                    )
+                )
             )
-            generator_loss = -tf.reduce_mean(D_fake)
+        grads = tape.gradient(generator_loss, self.theta_G)
+        self.generator_solver.apply_gradients(zip(grads, self.theta_G))
 
-            # Solver
-            discriminator_solver = tf.train.AdamOptimizer(
-                learning_rate=self.learning_rate, beta1=0.5
-            ).minimize(discriminator_loss, var_list=self.theta_D)
-            generator_solver = tf.train.AdamOptimizer(
-                learning_rate=self.learning_rate, beta1=0.5
-            ).minimize(generator_loss, var_list=self.theta_G)
+        return discriminator_loss, generator_loss
 
-            # Start session
-            self.sess.run(tf.global_variables_initializer())
+    def _discriminator_step(self, real_batches):
+        """Updates every teacher on its own real batch at once.
 
-            # Training iterations
-            for _ in range(self.n_iters):
-                # TODO: Move dataset splitting here
-                # For fixed generator weights run teacher training
-                for _ in range(self.num_teachers):
-                    # Sample latent vars
-                    latent_batch = self._sample_latent_z(
-                        self.batch_size, self.z_dim
-                    )
+        Teachers share no weights, so minimising the sum of their losses
+        updates each one exactly as if it were trained alone.
+        """
+        shape = [self.num_teachers, self.batch_size]
 
-                    # Sample real
-                    train_idx_teach = self._sample_real_x(
-                        nsamples, self.batch_size
-                    )  # Does this way of sampling satisfy DP? Should be disjoint subsets!
-                    features_train_batch = features_train[train_idx_teach, :]
+        # Noisy labels, real then fake
+        labels_batch = tf.concat([tf.ones(shape), tf.zeros(shape)], 1)
+        labels_batch += tf.random.normal(
+            [self.num_teachers, 2 * self.batch_size],
+            stddev=self.laplace_noise_scale,
+        )
+        labels_batch = tf.expand_dims(
+            tf.cast(labels_batch > 0.5, tf.float32), -1
+        )
 
-                    labels_real = np.ones(
-                        [
-                            self.batch_size,
-                        ]
-                    )
-                    labels_fake = np.zeros(
-                        [
-                            self.batch_size,
-                        ]
-                    )
+        with tf.GradientTape() as tape:
+            fake_batches = tf.reshape(
+                self.gen_out(
+                    self._sample_latent_z(self.num_teachers * self.batch_size)
+                ),
+                shape + [self.nfeatures],
+            )
 
-                    labels_batch = np.concatenate(
-                        (labels_real, labels_fake), 0
-                    )
+            D_real = self.discriminator_out(real_batches)
+            D_fake = self.discriminator_out(fake_batches)
+            D_entire = tf.concat(axis=1, values=[D_real, D_fake])
 
-                    gaussian_noise = np.random.normal(
-                        loc=0.0,
-                        scale=self.laplace_noise_scale,
-                        size=self.batch_size * 2,
-                    )
+            # Replacement of Clipping algorithm to Penalty term
+            # 1. Line 6 in Algorithm 1
+            noisy_vals = tf.random.uniform(shape + [1], minval=0.0, maxval=1.0)
+            X_inter = (
+                noisy_vals * real_batches + (1.0 - noisy_vals) * fake_batches
+            )
 
-                    labels_batch = labels_batch + gaussian_noise
+            # 2. Line 7 in Algorithm 1
+            with tf.GradientTape() as penalty_tape:
+                penalty_tape.watch(X_inter)
+                D_inter = self.discriminator_out(X_inter)
+            grad = penalty_tape.gradient(D_inter, X_inter)
+            grad_norm = tf.sqrt(tf.reduce_sum(grad**2 + ZERO_TOL, axis=2))
+            grad_pen = self.num_teachers * tf.reduce_mean(
+                (grad_norm - 1) ** 2, axis=1
+            )
 
-                    labels_batch = labels_batch > 0.5
+            # Loss function of each teacher
+            discriminator_loss = (
+                tf.reduce_mean((1 - labels_batch) * D_entire, axis=[1, 2])
+                - tf.reduce_mean(labels_batch * D_entire, axis=[1, 2])
+                + grad_pen
+            )
+            total_loss = tf.reduce_sum(discriminator_loss)
 
-                    labels_batch = np.reshape(
-                        labels_batch.astype(float), (2 * self.batch_size, 1)
-                    )
+        grads = tape.gradient(total_loss, self.theta_D)
+        self.discriminator_solver.apply_gradients(zip(grads, self.theta_D))
 
-                    _, discriminator_loss_iter = self.sess.run(
-                        [discriminator_solver, discriminator_loss],
-                        feed_dict={
-                            self.X: features_train_batch,
-                            self.Z: latent_batch,
-                            self.M: labels_batch,
-                        },
-                    )
+        return tf.reduce_mean(discriminator_loss)
 
-                # Update generator weights
-                latent_batch = self._sample_latent_z(
-                    self.batch_size, self.z_dim
-                )
+    def _teacher_dataset(self, features_train):
+        """A ``tf.data`` pipeline of real batches for every teacher.
 
-                _, generator_loss_iter = self.sess.run(
-                    [generator_solver, generator_loss],
-                    feed_dict={self.Z: latent_batch},
-                )
+        The training set is split once into ``num_teachers`` disjoint
+        partitions. Each element stacks one batch per teacher, sampled
+        from that teacher's partition only, with a single gather.
+        """
+        rng = np.random.default_rng(int(self.partition_seed))
+        partitions = np.array_split(
+            rng.permutation(len(features_train)), self.num_teachers
+        )
+        # Teachers' rows are contiguous in the reordered training set
+        features = tf.constant(features_train[np.concatenate(partitions)])
+        sizes = np.array([len(idx) for idx in partitions])
+        starts = tf.constant(np.cumsum(sizes) - sizes, dtype=tf.int32)
+        sizes = tf.constant(sizes, dtype=tf.int32)
+
+        def sample_batches(_):
+            idx = tf.random.uniform(
+                [self.num_teachers, self.batch_size],
+                maxval=tf.int32.max,
+                dtype=tf.int32,
+            )
+            return tf.gather(features, starts[:, None] + idx % sizes[:, None])
 
-        self.trained = True
+        return (
+            tf.data.Dataset.from_tensors(0)
+            .repeat()
+            .map(sample_batches)
+            .prefetch(tf.data.AUTOTUNE)
+        )
 
     def generate_samples(self, nsamples):
         """ ""
@@ -324,22 +542,35 @@ class PateGan(GenerativeModel):
         :param nsamples: int: Number of synthetic records to generate
         :return synData: DataFrame: A synthetic dataset
         """
-        with tf.device(self.device_spec.to_string()):
-            # Output generation
-            features_synthetic_encoded = self.sess.run(
-                [self.GDist],
-                feed_dict={
-                    self.Z: self._sample_latent_z(nsamples, self.z_dim)
-                },
-            )[0]
-
-        # Revers numerical encoding
-        synthetic_data = self._decode_data(features_synthetic_encoded)
-        synthetic_data = synthetic_data.iloc[
-            np.random.permutation(synthetic_data.index)
-        ].reset_index(drop=True)
-
-        return synthetic_data
+        if nsamples == 0:
+            return self._decode_data(
+                np.zeros((0, self.nfeatures), dtype=np.float32)
+            )
+        return concat(self.iter_samples(nsamples))
+
+    def iter_samples(self, nsamples, batch_size=SAMPLE_BATCH_SIZE):
+        """Samples synthetic data records in chunks, so that only one chunk
+        is held in memory at a time. Records are i.i.d., so chunks need no
+        shuffling.
+        :param nsamples: int: Number of synthetic records to generate
+        :param batch_size: int: Maximum number of records per chunk
+        :return: Iterator[DataFrame]: Chunks of the synthetic dataset, indexed
+            by record number
+        """
+        for start in range(0, nsamples, batch_size):
+            n = min(batch_size, nsamples - start)
+
+            with tf.device(self.device_spec.to_string()):
+                # Output generation
+                features_synthetic_encoded = self.gen_out(
+                    self._sample_latent_z(n)
+                ).numpy()
+
+            # Revers numerical encoding
+            synthetic_data = self._decode_data(features_synthetic_encoded)
+            synthetic_data.index = RangeIndex(start, start + n)
+
+            yield synthetic_data
 
     def gen_out(self, z):
         G_h1 = tf.nn.tanh(tf.matmul(z, self.G_W1) + self.G_b1)
@@ -349,6 +580,8 @@ class PateGan(GenerativeModel):
         return G_log_prob
 
     def discriminator_out(self, x):
+        """Outputs of every teacher, for inputs of shape
+        (num_teachers, batch, nfeatures)."""
         D_h1 = tf.nn.relu(tf.matmul(x, self.D_W1) + self.D_b1)
         D_h2 = tf.nn.relu(tf.matmul(D_h1, self.D_W2) + self.D_b2)
         out = tf.matmul(D_h2, self.D_W3) + self.D_b3
@@ -356,20 +589,22 @@ class PateGan(GenerativeModel):
         return out
 
     def _xavier_init(self, size):
-        in_dim = size[0]
+        in_dim = size[-2]
         xavier_stddev = 1.0 / tf.sqrt(in_dim / 2.0)
 
-        return tf.random_normal(shape=size, stddev=xavier_stddev)
-
-    def _sample_latent_z(self, nsamples, ndims):
-        return np.random.uniform(-1.0, 1.0, size=[nsamples, ndims])
+        return tf.random.normal(shape=size, stddev=xavier_stddev)
 
-    def _sample_real_x(self, data_size, batch_size):
-        return np.random.permutation(data_size)[:batch_size]
+    def _sample_latent_z(self, nsamples=None):
+        if nsamples is None:
+            nsamples = self.batch_size
+        return tf.random.uniform([nsamples, self.z_dim], -1.0, 1.0)
 
     def _encode_data(self, data):
         n_samples = len(data)
-        features_encoded = np.empty((n_samples, self.nfeatures))
+        features_encoded = np.zeros(
+            (n_samples, self.nfeatures), dtype=np.float32
+        )
+        rows = np.arange(n_samples)
         cidx = 0
 
         for attr_name, cdict in self.metadata.items():
@@ -390,18 +625,16 @@ class PateGan(GenerativeModel):
                     col_min = cdict["min"]
 
                 features_encoded[:, cidx] = np.true_divide(
-                    col_data - col_min, col_max + ZERO_TOL
+                    col_data - col_min, col_max - col_min + ZERO_TOL
                 )
 
                 cidx += 1
 
             elif data_type == CATEGORICAL or data_type == ORDINAL:
-                # One-hot encoded categorical columns
+                # One-hot encoded categorical columns, written in place
                 col_cats = cdict["categories"]
-                col_data_onehot = self._one_hot(col_data, col_cats)
-                features_encoded[
-                    :, cidx : cidx + len(col_cats)
-                ] = col_data_onehot
+                codes = self._category_codes(data[attr_name], col_cats)
+                features_encoded[rows, cidx + codes] = 1
 
                 cidx += len(col_cats)
 
@@ -409,7 +642,7 @@ class PateGan(GenerativeModel):
 
     def _decode_data(self, features_encoded):
         """Revers feature encoding."""
-        data = DataFrame(columns=self.attribute_list)
+        columns = {}
 
         cidx = 0
 
@@ -421,8 +654,8 @@ class PateGan(GenerativeModel):
                 col_max = cdict["max"]
 
                 col_data = features_encoded[:, cidx]
-                col_data = col_data * (col_max + ZERO_TOL) + col_min
-                data[attr_name] = col_data.astype(float)
+                col_data = col_data * (col_max - col_min + ZERO_TOL) + col_min
+                columns[attr_name] = col_data.astype(float)
                 cidx += 1
 
             elif data_type == INTEGER:
@@ -430,8 +663,8 @@ class PateGan(GenerativeModel):
                 col_max = cdict["max"]
 
                 col_data = features_encoded[:, cidx]
-                col_data = col_data * (col_max + ZERO_TOL) + col_min
-                data[attr_name] = col_data.astype(int)
+                col_data = col_data * (col_max - col_min + ZERO_TOL) + col_min
+                columns[attr_name] = col_data.astype(int)
                 cidx += 1
 
             elif data_type == CATEGORICAL or data_type == ORDINAL:
@@ -439,22 +672,42 @@ class PateGan(GenerativeModel):
                 ncats = len(col_cats)
 
                 col_data_onehot = features_encoded[:, cidx : cidx + ncats]
-                col_data = self._reverse_one_hot(col_data_onehot, col_cats)
-                data[attr_name] = col_data.astype(str)
+                columns[attr_name] = self._reverse_one_hot(
+                    col_data_onehot, col_cats
+                )
 
                 cidx += ncats
 
-        return data
+        return DataFrame(columns, columns=self.attribute_list)
+
+    def _category_codes(self, col_data, categories):
+        """Index of each value in ``categories``, compared as strings.
+
+        Only the distinct values of the column are looked up, every row is
+        then mapped with ``np.take``."""
+        codes, uniques = factorize(col_data)
+        if (codes < 0).any():
+            raise ValueError("Missing values cannot be one-hot encoded")
+
+        position = {str(c): i for i, c in enumerate(categories)}
+        unknown = [u for u in uniques if str(u) not in position]
+        if unknown:
+            raise ValueError(f"Values {unknown} are not in {categories}")
+
+        lookup = np.array([position[str(u)] for u in uniques], dtype=np.intp)
+        return np.take(lookup, codes)
 
     def _one_hot(self, col_data, categories):
-        col_data_onehot = np.zeros((len(col_data), len(categories)))
-        cidx = [categories.index(str(c)) for c in col_data]
+        col_data_onehot = np.zeros(
+            (len(col_data), len(categories)), dtype=np.float32
+        )
+        cidx = self._category_codes(col_data, categories)
         col_data_onehot[np.arange(len(col_data)), cidx] = 1
 
         return col_data_onehot
 
     def _reverse_one_hot(self, col_encoded, categories):
         cat_idx = np.argmax(col_encoded, axis=1)
-        col_data = np.array([categories[i] for i in cat_idx])
+        col_data = np.take(np.asarray(categories, dtype=str), cat_idx)
 
         return col_data
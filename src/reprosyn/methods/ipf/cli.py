@@ -1,15 +1,52 @@
+import json
+
 import click
 
-from reprosyn.cli_utils import wrap_generator
+from reprosyn.cli_utils import run_generator, wrap_generator
 from reprosyn.methods.ipf.ipf import IPF
 
 
+def _parse_marginals(ctx, param, value):
+    """Marginals from JSON or a config file, or "auto"."""
+    if value == "auto":
+        return value
+    try:
+        if isinstance(value, str):
+            value = json.loads(value)
+        return [tuple(m) for m in value]
+    except (ValueError, TypeError):
+        raise click.BadParameter('either "auto" or a JSON list of lists')
+
+
 @click.command(
     "ipf",
     short_help="Iterative proportional fitting",
     options_metavar="[GENERATOR OPTIONS]",
 )
-# TODO: Add marginals as a click.unprocessed option
+@click.option(
+    "--marginals",
+    type=str,
+    default="auto",
+    callback=_parse_marginals,
+    help='"auto", or column indices to preserve, e.g. "[[0, 1], [0, 2]]"',
+)
+@click.option(
+    "--degree",
+    type=click.IntRange(min=1),
+    default=2,
+    help="maximum parents of each column in auto marginals",
+)
+@click.option(
+    "--max_clique_cells",
+    type=click.IntRange(min=1),
+    default=10**5,
+    help="maximum cells of each auto marginal",
+)
+@click.option(
+    "--dense",
+    is_flag=True,
+    help="fit one tensor over all columns, rather than a junction tree",
+)
 @wrap_generator
 def cmd_ipf(ctx, **params):
     """Runs IPF on --dataset or STDIN
@@ -23,7 +60,7 @@ def cmd_ipf(ctx, **params):
     """
 
     generator = IPF(**ctx.parent.params, **params)
-    generator.run()
+    run_generator(generator)
     return generator.output
 
 
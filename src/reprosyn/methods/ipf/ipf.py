@@ -5,7 +5,23 @@ import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
+from reprosyn.costs import BYTES_PER_CELL, clique_cells, domain_sizes
 from reprosyn.generator import PipelineBase, encode_ordinal, decode_ordinal
+from reprosyn.marginals import marginal_tables
+from reprosyn.methods.ipf.junction_tree import (
+    JunctionTree,
+    junction_tree,
+    select_marginals,
+)
+
+# peak bytes per cell of the joint: the uint16 counts, the int64 support, and
+# the float64 tensors of :func:`sinkhorn_tensor` before and after an update,
+# and the einsum result
+IPF_BYTES_PER_CELL = 2 + 4 * BYTES_PER_CELL
+
+# peak bytes per clique cell of a junction tree: its potential, belief, and
+# the product of its potential and messages, while calibrating
+TREE_BYTES_PER_CELL = 4 * BYTES_PER_CELL
 
 
 def get_count_matrix(X, metadata):
@@ -82,6 +98,7 @@ def sinkhorn_tensor(
     max_iterations=1e4,
     iter_tolerance=5e-1,
     eps=1e-5,
+    progress=None,
 ):
     """A version of iterative proportional fitting algorithm, in high dimension, with multivariate marginals
 
@@ -100,6 +117,9 @@ def sinkhorn_tensor(
         tolerance value for stopping
     eps : _type_, optional
         _description_, by default 1e-5
+    progress : ProgressReporter, optional
+        reports each iteration, with the change in the tensor as its loss,
+        by default None
 
     Returns
     -------
@@ -124,6 +144,8 @@ def sinkhorn_tensor(
 
         err = abs(run_tensor - initial_tensor).sum()
         initial_tensor = run_tensor
+        if progress is not None:
+            progress.update(loss=float(err))
 
     return initial_tensor
 
@@ -163,7 +185,14 @@ def sampler(N, probability_array):
 
 
 def ipf(
-    data, counts, support, size, marginals, max_iterations, iter_tolerance
+    data,
+    counts,
+    support,
+    size,
+    marginals,
+    max_iterations,
+    iter_tolerance,
+    progress=None,
 ):
     """Runs ipf algorithm steps: :func:`get_margin_grids`, :func:`sinkhorn_tensor`, :func:`sampler`
 
@@ -183,6 +212,11 @@ def ipf(
         maximum number of iterations
     iter_tolerance : float
         tolerance value for stopping
+    progress : callable, optional
+        ``progress(name, total)`` returns the
+        :class:`~reprosyn.instrumentation.ProgressReporter` of the fit, e.g.
+        :meth:`~reprosyn.generator.PipelineBase.progress_reporter`, by
+        default None
 
     Returns
     -------
@@ -203,6 +237,7 @@ def ipf(
         marginals=margin_grids,
         max_iterations=max_iterations,
         iter_tolerance=iter_tolerance,
+        progress=progress and progress("ipf", total=int(max_iterations)),
     )
 
     approx_sample = sampler(size, approx_count)
@@ -210,40 +245,122 @@ def ipf(
     return approx_sample
 
 
+def ipf_junction_tree(
+    data,
+    shape,
+    size,
+    marginals,
+    max_iterations,
+    iter_tolerance,
+    progress=None,
+):
+    """Runs ipf over the cliques of a junction tree of the marginals, see
+    :class:`~reprosyn.methods.ipf.junction_tree.JunctionTree`, rather than
+    over the full joint as :func:`ipf`.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        numpy array with shape (features, individuals).
+    shape : tuple[int]
+        number of categories of each feature
+    size : int
+        number of samples
+    marginals : list[tuples]
+        list of marginals to preserve, specified by tuples of column indices
+    max_iterations : float
+        maximum number of iterations
+    iter_tolerance : float
+        tolerance value for stopping
+    progress : callable, optional
+        ``progress(name, total)`` returns the
+        :class:`~reprosyn.instrumentation.ProgressReporter` of the fit, as in
+        :func:`ipf`, by default None
+
+    Returns
+    -------
+    np.ndarray
+        matrix of samples (features, individuals)
+    """
+
+    values = np.asarray(data, dtype=np.int64).T
+    tree = JunctionTree(marginals, shape)
+    tree.fit(
+        list(zip(marginals, marginal_tables(values, shape, marginals))),
+        max_iterations=max_iterations,
+        iter_tolerance=iter_tolerance,
+        progress=progress and progress("ipf", total=int(max_iterations)),
+    )
+
+    return tree.sample(size).T
+
+
 class IPF(PipelineBase):
     """Generator class for iterative proportional fitting.
 
     Parameters
     ----------
+    marginals : list[tuple[int]] | str, optional
+        A list of marginal combinations to preserve, by default "auto",
+        which picks them from the data with
+        :func:`~reprosyn.methods.ipf.junction_tree.select_marginals`.
+    max_iterations : float, optional
+        maximum number of iterations, by default 1e4
+    iter_tolerance : float, optional
+        tolerance value for stopping, by default 5e-1
+    degree : int, optional
+        maximum number of parents of each column in "auto" marginals, by
+        default 2
+    max_clique_cells : int, optional
+        maximum number of cells of each "auto" marginal, by default 10**5
+    dense : bool, optional
+        if True, fits one dense tensor over all columns with :func:`ipf`,
+        rather than tables over the cliques of a junction tree with
+        :func:`ipf_junction_tree`, by default False
+
+    Attributes
+    ----------
     marginals : list[tuple[int]]
-        A list of marginal combinations to preserve.
+        the marginals fitted, as sorted column index tuples, set by
+        :meth:`preprocess`
 
     Notes
     -----
 
     IPF deals solely with categorical data.
 
-    The count matrix (see :func:`count_matrix`) is the computational bottleneck,
-    so is calculated once during preprocessing. This is the key obstacle to scaling.
+    The marginals are fitted over the cliques of a junction tree, so memory
+    is the sum of the clique sizes, see :meth:`estimate_cost`. Both
+    converge to the maximum entropy distribution with the given marginals.
+
+    With ``dense``, the count matrix (see :func:`count_matrix`) is the
+    computational bottleneck, so is calculated once during preprocessing.
+    Its size is the product of all domain sizes, and runs can be refused
+    before allocating it with ``max_memory``.
 
     Code adapted from original draft by Sam Cohen.
 
     """
 
-    generator = staticmethod(ipf)
+    generator = staticmethod(ipf_junction_tree)
 
     def __init__(
         self,
-        marginals=[(0, 1), (0, 2)],
+        marginals="auto",
         max_iterations=1e4,
         iter_tolerance=5e-1,
+        degree=2,
+        max_clique_cells=10**5,
+        dense=False,
         **kw
     ):
-        # TODO: check that marginals are ordered tuples.
         parameters = {
             "marginals": marginals,
             "max_iterations": max_iterations,
             "iter_tolerance": iter_tolerance,
+            "degree": degree,
+            "max_clique_cells": max_clique_cells,
+            "dense": dense,
         }
         super().__init__(**kw, **parameters)
 
@@ -252,26 +369,112 @@ class IPF(PipelineBase):
 
         1. encode dataset, see :func:`encode_ordinal`.
         2. save encoded data as a transposed numpy array.
-        3. calculate count matrix, see :func:`count_matrix`."""
+        3. select marginals if "auto", see
+           :func:`~reprosyn.methods.ipf.junction_tree.select_marginals`.
+        4. calculate count matrix if ``dense``, see :func:`count_matrix`."""
 
         data, self.encoders = encode_ordinal(self.dataset)
         self.data_array = data.to_numpy().T
+        self.shape = domain_sizes(self.dataset.metadata)
+
+        if self.params["marginals"] == "auto":
+            with self.timer("select"):
+                self.marginals = select_marginals(
+                    self.data_array.T.astype(np.int64),
+                    self.shape,
+                    degree=self.params["degree"],
+                    max_cells=self.params["max_clique_cells"],
+                )
+        else:
+            self.marginals = [
+                tuple(sorted(m)) for m in self.params["marginals"]
+            ]
+
+        if self.params["dense"]:
+            # the size of the joint is checked by run(), see estimate_cost
+            self.count_matrix = get_count_matrix(
+                self.data_array, self.dataset.metadata
+            )
 
-        # TODO: To avoid hanging, check matrix size and warn if too much
-        self.count_matrix = get_count_matrix(
-            self.data_array, self.dataset.metadata
-        )
+    def estimate_cost(self):
+        """Memory of the tables, and compute of ``max_iterations`` updates
+        of each marginal, and of sampling.
+
+        With ``dense``, tables span the joint domain of all columns, which
+        sampling scans once per row. Otherwise they span the cliques of a
+        junction tree, each update recalibrates all of them, and sampling
+        reads one row of each. "auto" marginals are bounded by the
+        ``degree + 1`` largest columns or ``max_clique_cells``, and fit in
+        two sweeps.
+        """
+
+        sizes = domain_sizes(self.dataset.metadata)
+        rows = len(self.dataset.data)
+        data = len(sizes) * (rows + self.size)
+        iterations = int(self.params["max_iterations"])
+        marginals = self.params["marginals"]
+        auto = marginals == "auto"
+        select = 0
+
+        if self.params["dense"]:
+            cells = clique_cells(sizes, len(sizes))
+            updates = 2 * (len(sizes) if auto else len(marginals))
+            return {
+                "memory": (
+                    IPF_BYTES_PER_CELL * cells + 2 * BYTES_PER_CELL * data
+                ),
+                "compute": cells * (updates * iterations + 2 * self.size),
+                "cells": cells,
+                "max_iterations": iterations,
+            }
+
+        if auto:
+            degree = self.params["degree"]
+            largest = min(
+                clique_cells(sizes, degree + 1),
+                self.params["max_clique_cells"],
+            )
+            cells = len(sizes) * largest
+            # parent sets scored by the greedy search, counting each row
+            select = rows * len(sizes) ** 2 * 2**degree
+            updates = 2 * len(sizes)
+        else:
+            cliques, _ = junction_tree(marginals, sizes)
+            cells = sum(
+                clique_cells([sizes[col] for col in clique], len(clique))
+                for clique in cliques
+            )
+            updates = len(marginals) * iterations
+
+        return {
+            "memory": TREE_BYTES_PER_CELL * cells + 2 * BYTES_PER_CELL * data,
+            "compute": select + 4 * cells * updates + 2 * data,
+            "cells": cells,
+            "max_iterations": iterations,
+        }
 
     def generate(self):
-        """See generator function :func:`ipf`"""
-
-        self.output = self.generator(
-            self.data_array,
-            counts=self.count_matrix,
-            support=(self.count_matrix * 0 + 1).astype(int),
-            size=self.size,
-            **self.params
-        )
+        """See generator functions :func:`ipf_junction_tree` and, if
+        ``dense``, :func:`ipf`"""
+
+        fit = {
+            "marginals": self.marginals,
+            "max_iterations": self.params["max_iterations"],
+            "iter_tolerance": self.params["iter_tolerance"],
+            "progress": self.progress_reporter,
+        }
+        if self.params["dense"]:
+            self.output = ipf(
+                self.data_array,
+                counts=self.count_matrix,
+                support=(self.count_matrix * 0 + 1).astype(int),
+                size=self.size,
+                **fit
+            )
+        else:
+            self.output = self.generator(
+                self.data_array, self.shape, size=self.size, **fit
+            )
 
     def postprocess(self):
         """Decodes output, see :func:`decode_ordinal` and saves as pd.DataFrame"""
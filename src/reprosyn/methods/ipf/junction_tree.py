@@ -0,0 +1,413 @@
+"""Junction trees, so that IPF fits and samples tables over cliques of
+columns rather than one dense tensor over all of them.
+
+:func:`select_marginals` picks informative marginals forming a decomposable
+model, :func:`junction_tree` triangulates any set of marginals into a tree
+of cliques, and :class:`JunctionTree` fits the marginals over the cliques
+and samples from the fit. Memory is then the sum of the clique sizes,
+rather than the product of all domain sizes.
+"""
+
+import itertools
+import math
+
+import numpy as np
+from disjoint_set import DisjointSet
+
+from reprosyn.marginals import mutual_information
+
+
+def select_marginals(values, shape, degree=2, max_cells=10**5, workers=1):
+    """Greedily picks informative marginals forming a decomposable model.
+
+    Starting from the column sharing most mutual information with the
+    others, each step adds the column, and the parent set of at most
+    ``degree`` columns already added, of highest mutual information, see
+    :func:`~reprosyn.marginals.mutual_information`. Parents are taken from
+    within a single marginal picked before, so that the marginals are the
+    cliques of a junction tree, as in the greedy Bayesian network of
+    PrivBayes restricted to a chordal graph.
+
+    Parameters
+    ----------
+    values : np.ndarray
+        integer matrix of shape (individuals, features), where column ``i``
+        takes values in ``range(shape[i])``.
+    shape : tuple[int]
+        number of categories of each column.
+    degree : int, optional
+        maximum number of parents of a column, so that marginals have at
+        most ``degree + 1`` columns, by default 2
+    max_cells : int, optional
+        maximum number of cells of a marginal, by default 10**5. Columns
+        too large for any parent set are added on their own.
+    workers : int, optional
+        number of threads counting marginals, by default 1
+
+    Returns
+    -------
+    list[tuple[int]]
+        the picked marginals, as sorted column index tuples
+    """
+
+    ncols = len(shape)
+    if ncols == 0:
+        return []
+
+    # mutual information is symmetric, so pairs score either way round
+    pairs = list(itertools.combinations(range(ncols), 2))
+    scores, total = {}, np.zeros(ncols)
+    pair_scores = mutual_information(values, shape, pairs, workers)
+    for (a, b), mi in zip(pairs, pair_scores):
+        scores[(a, b)] = scores[(b, a)] = mi
+        total[[a, b]] += mi
+
+    root = int(np.argmax(total))
+    cliques = [(root,)]
+    rest = set(range(ncols)) - {root}
+    while rest:
+        candidates = set()
+        for clique in cliques:
+            for k in range(1, min(degree, len(clique)) + 1):
+                for parents in itertools.combinations(clique, k):
+                    cells = math.prod(shape[col] for col in parents)
+                    candidates.update(
+                        (*parents, child)
+                        for child in rest
+                        if cells * shape[child] <= max_cells
+                    )
+
+        new = sorted(candidates - scores.keys())
+        scores.update(
+            zip(new, mutual_information(values, shape, new, workers))
+        )
+        if candidates:
+            best = max(sorted(candidates), key=scores.get)
+        else:
+            best = (min(rest),)
+
+        rest.remove(best[-1])
+        cliques.append(tuple(sorted(best)))
+
+    return _maximal(cliques)
+
+
+def junction_tree(marginals, shape):
+    """Triangulates the graph linking the columns of each marginal, and
+    joins its cliques into a junction tree.
+
+    Columns are eliminated greedily, first those adding the fewest edges,
+    then those leaving the fewest cells in their clique. A decomposable set
+    of marginals, such as that of :func:`select_marginals`, is its own
+    triangulation. Cliques are joined by a maximum spanning tree over the
+    number of columns they share, see Koller & Friedman (2009),
+    Probabilistic Graphical Models, section 10.4.
+
+    Parameters
+    ----------
+    marginals : list[tuple[int]]
+        column index tuples. Columns outside every marginal form cliques of
+        their own.
+    shape : tuple[int]
+        number of categories of each column.
+
+    Returns
+    -------
+    list[tuple[int]]
+        cliques, as sorted column index tuples, in breadth-first order from
+        the root
+    list[int]
+        index of the parent of each clique, -1 for the root
+    """
+
+    neighbours = [set() for _ in shape]
+    for marginal in marginals:
+        for a, b in itertools.combinations(marginal, 2):
+            neighbours[a].add(b)
+            neighbours[b].add(a)
+
+    def elimination_cost(col):
+        fill = sum(
+            b not in neighbours[a]
+            for a, b in itertools.combinations(neighbours[col], 2)
+        )
+        cells = math.prod(shape[n] for n in neighbours[col]) * shape[col]
+        return fill, cells, col
+
+    remaining, cliques = set(range(len(shape))), []
+    while remaining:
+        col = min(remaining, key=elimination_cost)
+        for a, b in itertools.combinations(neighbours[col], 2):
+            neighbours[a].add(b)
+            neighbours[b].add(a)
+        for n in neighbours[col]:
+            neighbours[n].discard(col)
+        remaining.remove(col)
+        cliques.append(tuple(sorted(neighbours[col] | {col})))
+    cliques = _maximal(cliques)
+    if not cliques:
+        return [], []
+
+    # components are joined by cliques sharing no columns
+    edges = sorted(
+        itertools.combinations(range(len(cliques)), 2),
+        key=lambda e: -len(set(cliques[e[0]]) & set(cliques[e[1]])),
+    )
+    tree, ds = [[] for _ in cliques], DisjointSet()
+    for a, b in edges:
+        if not ds.connected(a, b):
+            ds.union(a, b)
+            tree[a].append(b)
+            tree[b].append(a)
+
+    order, parents = [0], {0: -1}
+    for c in order:
+        for n in tree[c]:
+            if n not in parents:
+                parents[n] = c
+                order.append(n)
+    index = {c: i for i, c in enumerate(order)}
+
+    return (
+        [cliques[c] for c in order],
+        [index[parents[c]] if parents[c] >= 0 else -1 for c in order],
+    )
+
+
+class JunctionTree:
+    """Tables over the cliques of a junction tree, fitted to marginals by
+    iterative proportional fitting.
+
+    The fitted distribution is the product of the clique potentials, whose
+    marginal over each clique :meth:`calibrate` computes by passing messages
+    along the tree. Fitting a marginal then only rescales the potential of
+    a clique holding it, see :meth:`fit`.
+
+    Parameters
+    ----------
+    marginals : list[tuple[int]]
+        column index tuples of the marginals to fit, see
+        :func:`junction_tree`
+    shape : tuple[int]
+        number of categories of each column.
+
+    Attributes
+    ----------
+    cliques : list[tuple[int]]
+        sorted column index tuples, in breadth-first order from the root
+    parents : list[int]
+        index of the parent of each clique, -1 for the root
+    potentials : list[np.ndarray]
+        table of each clique, with an axis per column in order, initially
+        uniform
+    beliefs : list[np.ndarray]
+        marginal counts of each clique under the fitted distribution, see
+        :meth:`calibrate`
+    """
+
+    def __init__(self, marginals, shape):
+        self.shape = tuple(int(n) for n in shape)
+        self.cliques, self.parents = junction_tree(marginals, self.shape)
+        self.potentials = [np.ones(self._shape(c)) for c in self.cliques]
+        self.beliefs = None
+
+    @property
+    def cells(self):
+        """Cells of all clique tables."""
+        return sum(math.prod(self._shape(c)) for c in self.cliques)
+
+    def calibrate(self, total=1.0):
+        """Computes :attr:`beliefs`, scaled to ``total`` rows, with one pass
+        of messages from the leaves to the root and one back."""
+
+        n = len(self.cliques)
+        children = [[] for _ in range(n)]
+        for c, parent in enumerate(self.parents[1:], start=1):
+            children[parent].append(c)
+
+        # each clique's potential times the messages of its children, and
+        # its message to its parent, normalized so that nothing overflows
+        inner, upward = [None] * n, [None] * n
+        for c in reversed(range(n)):
+            table = self.potentials[c]
+            for child in children[c]:
+                table = table * self._expand(
+                    upward[child], self._separator(child), c
+                )
+            norm = table.sum()
+            inner[c] = table / norm if norm > 0 else table
+            if c > 0:
+                upward[c] = self._project(inner[c], c, self._separator(c))
+
+        beliefs = [inner[0] * total]
+        for c in range(1, n):
+            parent = self.parents[c]
+            given = self._project(beliefs[parent], parent, self._separator(c))
+            ratio = np.divide(
+                given,
+                upward[c],
+                out=np.zeros_like(given),
+                where=upward[c] > 0,
+            )
+            beliefs.append(
+                inner[c] * self._expand(ratio, self._separator(c), c)
+            )
+        self.beliefs = beliefs
+
+    def fit(
+        self,
+        targets,
+        max_iterations=1e4,
+        iter_tolerance=5e-1,
+        eps=1e-5,
+        progress=None,
+    ):
+        """Fits the potentials to the ``targets`` by iterative proportional
+        fitting, as :func:`~reprosyn.methods.ipf.ipf.sinkhorn_tensor`.
+
+        Each sweep rescales, for every target, the potential of a clique
+        holding it, and recalibrates. Fitting stops once the summed absolute
+        difference between the targets and the fitted marginals over a sweep
+        is within ``iter_tolerance``, so decomposable targets, such as those
+        of :func:`select_marginals`, stop after the second sweep.
+
+        Parameters
+        ----------
+        targets : list[tuple[tuple[int], np.ndarray]]
+            sorted column index tuples and their counts, with an axis per
+            column in order
+        max_iterations : float, optional
+            maximum number of sweeps
+        iter_tolerance : float, optional
+            tolerance value for stopping
+        eps : float, optional
+            added to the fitted marginals before dividing, by default 1e-5
+        progress : ProgressReporter, optional
+            reports each sweep, with the difference of the sweep as its
+            loss, by default None
+
+        Returns
+        -------
+        JunctionTree
+            the fitted tree
+        """
+
+        total = float(targets[0][1].sum()) if targets else 1.0
+        homes = [self._clique_of(columns) for columns, _ in targets]
+        self.calibrate(total)
+
+        count = 0
+        err = 1 + iter_tolerance
+        while (count < max_iterations) and (err > iter_tolerance):
+            count += 1
+            err = 0.0
+            for (columns, counts), c in zip(targets, homes):
+                fitted = self._project(self.beliefs[c], c, columns)
+                err += np.abs(fitted - counts).sum()
+                factors = counts / (eps + fitted)
+                self.potentials[c] = self.potentials[c] * self._expand(
+                    factors, columns, c
+                )
+                self.calibrate(total)
+            if progress is not None:
+                progress.update(loss=float(err))
+
+        return self
+
+    def sample(self, n, rng=None):
+        """Samples ``n`` rows from the fitted distribution, clique by clique
+        from the root, each given the columns it shares with its parent.
+
+        Parameters
+        ----------
+        n : int
+            number of rows
+        rng : int | np.random.Generator, optional
+            seed or generator, by default None
+
+        Returns
+        -------
+        np.ndarray
+            integer matrix of shape (individuals, features)
+        """
+
+        rng = np.random.default_rng(rng)
+        codes = np.zeros((n, len(self.shape)), dtype=np.int64)
+        for c, clique in enumerate(self.cliques):
+            given = self._separator(c) if c > 0 else ()
+            new = tuple(col for col in clique if col not in given)
+            axes = [clique.index(col) for col in given + new]
+            table = self.beliefs[c].transpose(axes)
+            table = table.reshape(-1, math.prod(self._shape(new)))
+
+            # inverse CDF of each row of the conditional table at once,
+            # offset by the row so that one sorted search covers all rows
+            rows = table.sum(axis=1, keepdims=True)
+            cdf = np.divide(
+                table,
+                rows,
+                out=np.full(table.shape, 1 / table.shape[1]),
+                where=rows > 0,
+            ).cumsum(axis=1)
+            cdf[:, -1] = 1.0
+            cdf += np.arange(len(cdf))[:, None]
+
+            if given:
+                row = np.ravel_multi_index(
+                    codes[:, list(given)].T, self._shape(given)
+                )
+            else:
+                row = np.zeros(n, dtype=np.int64)
+            cells = np.searchsorted(cdf.ravel(), row + rng.random(n), "right")
+            cells = np.minimum(
+                cells - row * table.shape[1], table.shape[1] - 1
+            )
+            codes[:, list(new)] = np.column_stack(
+                np.unravel_index(cells, self._shape(new))
+            )
+
+        return codes
+
+    def _shape(self, columns):
+        return tuple(self.shape[col] for col in columns)
+
+    def _separator(self, c):
+        parent = set(self.cliques[self.parents[c]])
+        return tuple(col for col in self.cliques[c] if col in parent)
+
+    def _clique_of(self, columns):
+        return next(
+            c
+            for c, clique in enumerate(self.cliques)
+            if set(columns) <= set(clique)
+        )
+
+    def _project(self, table, c, columns):
+        """Sums ``table`` over clique ``c`` onto ``columns``, a subset."""
+        clique = self.cliques[c]
+        return table.sum(
+            axis=tuple(i for i, col in enumerate(clique) if col not in columns)
+        )
+
+    def _expand(self, table, columns, c):
+        """Reshapes ``table`` over ``columns``, a subset of clique ``c``, to
+        broadcast against it."""
+        return table.reshape(
+            [
+                self.shape[col] if col in columns else 1
+                for col in self.cliques[c]
+            ]
+        )
+
+
+def _maximal(cliques):
+    """The cliques not contained in another, in order, without repeats."""
+
+    maximal = []
+    for i, clique in enumerate(cliques):
+        others = cliques[:i] + cliques[i + 1 :]
+        if not any(set(clique) < set(o) for o in others) and (
+            clique not in maximal
+        ):
+            maximal.append(clique)
+    return maximal
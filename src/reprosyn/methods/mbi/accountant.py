@@ -0,0 +1,198 @@
+"""Fast privacy accounting for concentrated differential privacy.
+
+Computes the same conservative conversions as :mod:`cdp2adp`, but the binary
+searches stop once they stop making progress, or once the search interval is
+within a relative tolerance. Since any point of a search interval gives a
+valid bound, stopping early only loosens the bound in the conservative
+direction. :func:`cdp_rho` is memoized, and :func:`cdp_delta_array` and
+:func:`cdp_rho_array` evaluate whole sweeps of parameters at once.
+"""
+
+import functools
+import math
+
+import numpy as np
+
+MAX_ITERATIONS = 1000
+
+# don't let alpha be too small, due to numerical stability, see cdp2adp
+ALPHA_MIN = 1.01
+
+
+def _converged(lo, hi, tol):
+    return hi - lo <= tol * abs(hi)
+
+
+def cdp_delta(rho, eps, tol=0.0):
+    """Smallest delta such that rho-CDP implies (eps, delta)-DP.
+
+    Parameters
+    ----------
+    rho : float
+        zCDP parameter
+    eps : float
+        privacy parameter epsilon
+    tol : float, optional
+        relative tolerance of the search over alpha, by default 0.0, which
+        searches until the interval no longer shrinks
+
+    Returns
+    -------
+    float
+        delta
+    """
+
+    assert rho >= 0
+    assert eps >= 0
+    if rho == 0:
+        return 0  # degenerate case
+
+    amin = ALPHA_MIN
+    amax = (eps + 1) / (2 * rho) + 2
+    for _ in range(MAX_ITERATIONS):
+        alpha = (amin + amax) / 2
+        derivative = (2 * alpha - 1) * rho - eps + math.log1p(-1.0 / alpha)
+        if derivative < 0:
+            lo, hi = alpha, amax
+        else:
+            lo, hi = amin, alpha
+        if (lo, hi) == (amin, amax) or _converged(lo, hi, tol):
+            break
+        amin, amax = lo, hi
+
+    delta = math.exp(
+        (alpha - 1) * (alpha * rho - eps) + alpha * math.log1p(-1 / alpha)
+    ) / (alpha - 1.0)
+    return min(delta, 1.0)  # delta<=1 always
+
+
+@functools.lru_cache(maxsize=4096)
+def cdp_rho(eps, delta, tol=0.0):
+    """Largest rho such that rho-CDP implies (eps, delta)-DP.
+
+    Results are memoized, so repeated runs with the same parameters only pay
+    for the search once.
+
+    Parameters
+    ----------
+    eps : float
+        privacy parameter epsilon
+    delta : float
+        privacy parameter delta
+    tol : float, optional
+        relative tolerance of the searches, by default 0.0, which searches
+        until the interval no longer shrinks
+
+    Returns
+    -------
+    float
+        rho
+    """
+
+    assert eps >= 0
+    assert delta > 0
+    if delta >= 1:
+        return 0.0  # if delta>=1 anything goes
+
+    rhomin = 0.0  # maintain cdp_delta(rho,eps)<=delta
+    rhomax = eps + 1  # maintain cdp_delta(rhomax,eps)>delta
+    for _ in range(MAX_ITERATIONS):
+        rho = (rhomin + rhomax) / 2
+        if cdp_delta(rho, eps, tol) <= delta:
+            lo, hi = rho, rhomax
+        else:
+            lo, hi = rhomin, rho
+        if (lo, hi) == (rhomin, rhomax):
+            break
+        rhomin, rhomax = lo, hi
+        if _converged(rhomin, rhomax, tol):
+            break
+
+    return rhomin
+
+
+def cdp_delta_array(rho, eps, tol=0.0):
+    """Vectorized :func:`cdp_delta` over arrays of ``rho`` and ``eps``.
+
+    Parameters
+    ----------
+    rho : array_like
+        zCDP parameters
+    eps : array_like
+        privacy parameters epsilon, broadcast against ``rho``
+    tol : float, optional
+        relative tolerance of the search over alpha, by default 0.0
+
+    Returns
+    -------
+    np.ndarray
+        delta of each pair of parameters
+    """
+
+    rho, eps = np.broadcast_arrays(
+        np.asarray(rho, dtype=float), np.asarray(eps, dtype=float)
+    )
+    assert np.all(rho >= 0)
+    assert np.all(eps >= 0)
+
+    zero = rho == 0
+    rho = np.where(zero, 1.0, rho)  # degenerate case, replaced below
+
+    amin = np.full(rho.shape, ALPHA_MIN)
+    amax = (eps + 1) / (2 * rho) + 2
+    for _ in range(MAX_ITERATIONS):
+        alpha = (amin + amax) / 2
+        derivative = (2 * alpha - 1) * rho - eps + np.log1p(-1.0 / alpha)
+        below = derivative < 0
+        lo = np.where(below, alpha, amin)
+        hi = np.where(below, amax, alpha)
+        if np.array_equal(lo, amin) and np.array_equal(hi, amax):
+            break
+        amin, amax = lo, hi
+        if np.all(_converged(amin, amax, tol)):
+            break
+
+    delta = np.exp(
+        (alpha - 1) * (alpha * rho - eps) + alpha * np.log1p(-1 / alpha)
+    ) / (alpha - 1.0)
+    return np.where(zero, 0.0, np.minimum(delta, 1.0))
+
+
+def cdp_rho_array(eps, delta, tol=0.0):
+    """Vectorized :func:`cdp_rho` over arrays of ``eps`` and ``delta``.
+
+    Parameters
+    ----------
+    eps : array_like
+        privacy parameters epsilon
+    delta : array_like
+        privacy parameters delta, broadcast against ``eps``
+    tol : float, optional
+        relative tolerance of the searches, by default 0.0
+
+    Returns
+    -------
+    np.ndarray
+        rho of each pair of parameters
+    """
+
+    eps, delta = np.broadcast_arrays(
+        np.asarray(eps, dtype=float), np.asarray(delta, dtype=float)
+    )
+    assert np.all(eps >= 0)
+    assert np.all(delta > 0)
+
+    rhomin = np.zeros(eps.shape)
+    rhomax = eps + 1
+    for _ in range(MAX_ITERATIONS):
+        rho = (rhomin + rhomax) / 2
+        within = cdp_delta_array(rho, eps, tol) <= delta
+        lo = np.where(within, rho, rhomin)
+        hi = np.where(within, rhomax, rho)
+        if np.array_equal(lo, rhomin) and np.array_equal(hi, rhomax):
+            break
+        rhomin, rhomax = lo, hi
+        if np.all(_converged(rhomin, rhomax, tol)):
+            break
+
+    return np.where(delta >= 1, 0.0, rhomin)  # if delta>=1 anything goes
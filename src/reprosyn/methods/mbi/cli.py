@@ -1,7 +1,7 @@
 import click
 
-from reprosyn.cli_utils import wrap_generator
-from reprosyn.methods.mbi.mst import MST
+from reprosyn.cli_utils import run_generator, wrap_generator
+from reprosyn.methods.mbi.mst import BACKENDS, MST
 from reprosyn.methods.mbi.privbayes import PRIVBAYES
 
 
@@ -28,6 +28,35 @@ from reprosyn.methods.mbi.privbayes import PRIVBAYES
     default=2,
     help="degree of marginals in workload",
 )
+@click.option(
+    "--iters",
+    type=int,
+    default=1000,
+    help="maximum mirror descent iterations of the final estimate",
+)
+@click.option(
+    "--select_iters",
+    type=int,
+    default=50,
+    help="mirror descent iterations of the selection-stage estimate",
+)
+@click.option(
+    "--warm_start/--no_warm_start",
+    default=True,
+    help="start the final estimate from the selection-stage potentials",
+)
+@click.option(
+    "--tol",
+    type=float,
+    default=None,
+    help="relative loss tolerance for stopping the final estimate early",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(BACKENDS),
+    default="numpy",
+    help="FactoredInference backend, torch needs torch installed",
+)
 # @click.option(
 #     "--num_marginals",
 #     type=int,
@@ -52,7 +81,7 @@ def cmd_mst(ctx, **kwargs):
     $ rsyn mst < census.csv
     """
     generator = MST(**ctx.parent.params, **kwargs)
-    generator.run()
+    run_generator(generator)
     return generator.output
 
 
@@ -88,5 +117,5 @@ def cmd_pb(ctx, **kwargs):
     $ rsyn privbayes < census.csv
     """
     generator = PRIVBAYES(**ctx.parent.params, **kwargs)
-    generator.run()
+    run_generator(generator)
     return generator.output
@@ -7,33 +7,221 @@ dataset, and does not rely on public provisional data for measurement
 selection. Code from `private-pgm <https://github.com/ryan112358/private-pgm/blob/master/mechanisms/mst.py>`_
 """
 
+import contextlib
+import copy
+import importlib.util
 import itertools
 import json
 
 import networkx as nx
 import numpy as np
+import pandas as pd
 from disjoint_set import DisjointSet
-from mbi import Dataset, Domain, FactoredInference
+from mbi import Dataset, Domain, Factor, FactoredInference, GraphicalModel
+from mbi.clique_vector import CliqueVector
 from scipy import sparse
 from scipy.special import logsumexp
 
-from reprosyn.methods.mbi.cdp2adp import cdp_rho
+from reprosyn.costs import BYTES_PER_CELL, pair_cells, tree_cells
+from reprosyn.methods.mbi.accountant import cdp_rho
+from reprosyn.marginals import pairwise_counts
 from reprosyn.generator import PipelineBase, encode_ordinal, decode_ordinal
 
+# backends of FactoredInference in private-pgm, torch only where installed.
+# FactoredInference has no JAX backend: private-pgm uses JAX only in its
+# other estimators, which MST does not use.
+BACKENDS = ("numpy", "torch")
+TORCH = importlib.util.find_spec("torch") is not None
+
+
+def mst(
+    data,
+    epsilon,
+    delta,
+    rows,
+    iters=1000,
+    select_iters=50,
+    warm_start=True,
+    tol=None,
+    backend="numpy",
+    initial_model=None,
+):
 
-def mst(data, epsilon, delta, rows):
+    est, supports = mst_fit(
+        data,
+        epsilon,
+        delta,
+        iters=iters,
+        select_iters=select_iters,
+        warm_start=warm_start,
+        tol=tol,
+        backend=backend,
+        initial_model=initial_model,
+    )
+    synth = est.synthetic_data(rows)
+    return reverse_data(synth, supports)
+
+
+def mst_fit(
+    data,
+    epsilon,
+    delta,
+    iters=1000,
+    select_iters=50,
+    warm_start=True,
+    tol=None,
+    backend="numpy",
+    initial_model=None,
+    timer=None,
+    progress=None,
+):
+    """Measures and estimates the MST graphical model, see :func:`mst`.
+
+    Parameters
+    ----------
+    timer : callable, optional
+        ``timer(name)`` returns a context manager timing the ``measure``,
+        ``select`` and ``estimate`` stages, e.g.
+        :meth:`~reprosyn.generator.PipelineBase.timer`, by default None
+    progress : callable, optional
+        ``progress(name, total)`` returns the
+        :class:`~reprosyn.instrumentation.ProgressReporter` of the final
+        estimate, e.g.
+        :meth:`~reprosyn.generator.PipelineBase.progress_reporter`, by
+        default None
+
+    Returns
+    -------
+    mbi.GraphicalModel
+        estimated model, over the compressed domain
+    dict
+        support of each attribute in the compressed domain, see
+        :func:`compress_domain` and :func:`reverse_data`
+    """
+
+    timer = timer or (lambda name: contextlib.nullcontext())
 
     rho = cdp_rho(epsilon, delta)
     sigma = np.sqrt(3 / (2 * rho))
     cliques = [(col,) for col in data.domain]
-    log1 = measure(data, cliques, sigma)
-    data, log1, undo_compress_fn = compress_domain(data, log1)
-    cliques = select(data, rho / 3.0, log1)
-    log2 = measure(data, cliques, sigma)
-    engine = FactoredInference(data.domain, iters=1000)
-    est = engine.estimate(log1 + log2)
-    synth = est.synthetic_data(rows)
-    return undo_compress_fn(synth)
+    with timer("measure"):
+        log1 = measure(data, cliques, sigma)
+        data, log1, supports = compress_domain(data, log1)
+    engine = FactoredInference(
+        data.domain, backend=backend, iters=select_iters, warm_start=True
+    )
+    with timer("select"):
+        cliques = select(data, rho / 3.0, log1, engine=engine)
+    with timer("measure"):
+        log2 = measure(data, cliques, sigma)
+    if initial_model is not None:
+        engine = FactoredInference(data.domain, backend=backend)
+        seed_engine(engine, initial_model)
+    elif not warm_start:
+        engine = FactoredInference(
+            data.domain, backend=backend, warm_start=True
+        )
+    reporter = progress and progress("estimate", total=iters)
+    with timer("estimate"):
+        est = estimate(engine, log1 + log2, iters, tol=tol, progress=reporter)
+    return est, supports
+
+
+def seed_engine(engine, model):
+    """Warm starts an inference engine from a previously fitted model.
+
+    Only potentials whose domain matches the engine's are kept. A model
+    fitted at a nearby epsilon, where some attributes were compressed
+    differently, can then still seed the remaining cliques.
+
+    Parameters
+    ----------
+    engine : mbi.FactoredInference
+        engine to warm start
+    model : mbi.GraphicalModel
+        previously fitted model
+    """
+
+    domain = engine.domain
+    potentials = {
+        cl: factor
+        for cl, factor in model.potentials.items()
+        if set(cl) <= set(domain.attrs) and factor.domain == domain.project(cl)
+    }
+
+    seed = copy.copy(model)
+    seed.potentials = type(model.potentials)(potentials)
+    engine.model = seed
+    engine.warm_start = True
+
+
+def estimate(
+    engine, measurements, iters, tol=None, check_every=50, progress=None
+):
+    """Fits a graphical model to noisy measurements by mirror descent.
+
+    Without ``tol`` this is a single ``engine.estimate`` of ``iters``
+    iterations. With ``tol``, the iterations are run in rounds of
+    ``check_every``, each warm started from the last, and stop early once
+    the relative change in :func:`measurement_loss` falls below ``tol``.
+
+    Parameters
+    ----------
+    engine : mbi.FactoredInference
+        inference engine, if ``engine.warm_start`` the fit starts from the
+        potentials of its previous estimate
+    measurements : list[tuple]
+        noisy measurements ``(Q, y, sigma, proj)``
+    iters : int
+        maximum number of mirror descent iterations
+    tol : float, optional
+        relative loss tolerance for early stopping, by default None
+    check_every : int, optional
+        iterations between convergence checks, by default 50
+    progress : ProgressReporter, optional
+        reports each mirror descent iteration, and the loss at each
+        convergence check, by default None
+
+    Returns
+    -------
+    mbi.GraphicalModel
+        estimated model
+    """
+
+    callback = (
+        (lambda marginals: progress.update())
+        if progress is not None and progress.enabled
+        else None
+    )
+
+    if tol is None:
+        engine.iters = iters
+        return engine.estimate(measurements, callback=callback)
+
+    engine.warm_start = True
+    done, loss = 0, None
+    while done < iters:
+        engine.iters = min(check_every, iters - done)
+        est = engine.estimate(measurements, callback=callback)
+        done += engine.iters
+
+        previous, loss = loss, measurement_loss(est, measurements)
+        if callback is not None:
+            progress.update(iterations=0, loss=loss)
+        if previous is not None and previous - loss <= tol * previous:
+            break
+
+    return est
+
+
+def measurement_loss(est, measurements):
+    """Weighted squared error of a model against noisy measurements."""
+
+    loss = 0.0
+    for Q, y, sigma, proj in measurements:
+        diff = Q.dot(est.project(proj).datavector()) - y
+        loss += 0.5 * diff.dot(diff) / sigma**2
+    return loss
 
 
 def measure(data, cliques, sigma, weights=None):
@@ -66,8 +254,7 @@ def compress_domain(data, measurements):
             y2[-1] /= np.sqrt(y.size - y2.size + 1.0)
             I2 = sparse.diags(I2)
             new_measurements.append((I2, y2, sigma, proj))
-    undo_compress_fn = lambda data: reverse_data(data, supports)
-    return transform_data(data, supports), new_measurements, undo_compress_fn
+    return transform_data(data, supports), new_measurements, supports
 
 
 def exponential_mechanism(
@@ -79,16 +266,71 @@ def exponential_mechanism(
     return prng.choice(q.size, p=probas)
 
 
-def select(data, rho, measurement_log, cliques=[]):
-    engine = FactoredInference(data.domain, iters=50)
+def pairwise_errors(data, est, candidates, measurement_log, workers=1):
+    """L1 error of the estimated 2-way marginals of every candidate pair.
+
+    All true 2-way marginals are counted together with
+    :func:`~reprosyn.marginals.pairwise_counts`. When ``est`` was fitted on
+    1-way measurements only, it is a product of independent factors, so its
+    2-way marginals are outer products of its 1-way marginals.
+
+    Parameters
+    ----------
+    data : mbi.Dataset
+        integer-encoded dataset
+    est : mbi.GraphicalModel
+        estimated model
+    candidates : list[tuple[str]]
+        attribute pairs to score
+    measurement_log : list[tuple]
+        measurements ``est`` was fitted on
+    workers : int, optional
+        number of threads used for counting, by default 1
+
+    Returns
+    -------
+    np.ndarray
+        L1 error of each candidate
+    """
+
+    attrs = data.domain.attrs
+    index = {a: i for i, a in enumerate(attrs)}
+    pairs = [(index[a], index[b]) for a, b in candidates]
+
+    x, offsets = pairwise_counts(
+        data.df.loc[:, list(attrs)].to_numpy(),
+        data.domain.shape,
+        pairs,
+        workers=workers,
+    )
+
+    if all(len(proj) == 1 for _, _, _, proj in measurement_log):
+        marginals = [est.project([a]).datavector() for a in attrs]
+        xhat = np.concatenate(
+            [
+                np.outer(marginals[i], marginals[j]).ravel()
+                / marginals[i].sum()
+                for i, j in pairs
+            ]
+        )
+    else:
+        xhat = np.concatenate(
+            [est.project([a, b]).datavector() for a, b in candidates]
+        )
+
+    return np.add.reduceat(np.abs(x - xhat), offsets[:-1])
+
+
+def select(data, rho, measurement_log, cliques=[], workers=1, engine=None):
+    if engine is None:
+        engine = FactoredInference(data.domain, iters=50)
     est = engine.estimate(measurement_log)
 
-    weights = {}
     candidates = list(itertools.combinations(data.domain.attrs, 2))
-    for a, b in candidates:
-        xhat = est.project([a, b]).datavector()
-        x = data.project([a, b]).datavector()
-        weights[a, b] = np.linalg.norm(x - xhat, 1)
+    errors = pairwise_errors(
+        data, est, candidates, measurement_log, workers=workers
+    )
+    weights = dict(zip(candidates, errors))
 
     T = nx.Graph()
     T.add_nodes_from(data.domain.attrs)
@@ -111,46 +353,142 @@ def select(data, rho, measurement_log, cliques=[]):
     return list(T.edges)
 
 
+def support_lookup(support):
+    """Lookup table from original to compressed codes of an attribute.
+
+    Codes in the support are numbered in order, codes outside it all map to
+    the extra category ``support.sum()``.
+
+    Parameters
+    ----------
+    support : np.ndarray
+        boolean mask of the supported codes
+
+    Returns
+    -------
+    np.ndarray
+        compressed code of each original code
+    """
+
+    size = support.sum()
+    lookup = np.full(support.size, size, dtype=np.min_scalar_type(size))
+    lookup[support] = np.arange(size)
+    return lookup
+
+
 def transform_data(data, supports):
-    df = data.df.copy()
+    columns = {}
     newdom = {}
     for col in data.domain:
         support = supports[col]
-        size = support.sum()
-        newdom[col] = int(size)
+        size = int(support.sum())
+        newdom[col] = size
         if size < support.size:
             newdom[col] += 1
-        mapping = {}
-        idx = 0
-        for i in range(support.size):
-            mapping[i] = size
-            if support[i]:
-                mapping[i] = idx
-                idx += 1
-        assert idx == size
-        df[col] = df[col].map(mapping)
+        columns[col] = np.take(
+            support_lookup(support), data.df[col].to_numpy()
+        )
+    df = pd.DataFrame(columns, index=data.df.index, copy=False)
     newdom = Domain.fromdict(newdom)
     return Dataset(df, newdom)
 
 
 def reverse_data(data, supports):
-    df = data.df.copy()
+    columns = {}
     newdom = {}
     for col in data.domain:
         support = supports[col]
-        mx = support.sum()
         newdom[col] = int(support.size)
         idx, extra = np.where(support)[0], np.where(~support)[0]
-        mask = df[col] == mx
+        codes = data.df[col].to_numpy()
         if extra.size == 0:
-            pass
+            columns[col] = np.take(idx, codes)
         else:
-            df.loc[mask, col] = np.random.choice(extra, mask.sum())
-        df.loc[~mask, col] = idx[df.loc[~mask, col]]
+            # the extra category maps to a random code outside the support
+            values = np.take(np.append(idx, -1), codes)
+            mask = codes == idx.size
+            values[mask] = np.random.choice(extra, mask.sum())
+            columns[col] = values
+    df = pd.DataFrame(columns, index=data.df.index, copy=False)
     newdom = Domain.fromdict(newdom)
     return Dataset(df, newdom)
 
 
+def save_graphical_model(path, model, supports):
+    """Saves a fitted graphical model to a compressed ``.npz`` file.
+
+    The file holds the domain, cliques and total of the model, its clique
+    potentials, and the attribute supports needed to undo domain compression.
+
+    Parameters
+    ----------
+    path : str | Path
+        file to write
+    model : mbi.GraphicalModel
+        fitted model
+    supports : dict
+        support of each attribute, see :func:`compress_domain`
+    """
+
+    cliques = list(model.cliques)
+    header = {
+        "attrs": list(model.domain.attrs),
+        "shape": [int(n) for n in model.domain.shape],
+        "cliques": [list(cl) for cl in cliques],
+        "total": float(model.total),
+        "supports": list(supports),
+    }
+    arrays = {
+        f"potential_{i}": model.potentials[cl].values
+        for i, cl in enumerate(cliques)
+    }
+    arrays.update(
+        {f"support_{i}": supports[col] for i, col in enumerate(supports)}
+    )
+
+    with open(path, "wb") as f:
+        np.savez_compressed(f, header=json.dumps(header), **arrays)
+
+
+def load_graphical_model(path):
+    """Loads a graphical model saved by :func:`save_graphical_model`.
+
+    Parameters
+    ----------
+    path : str | Path
+        file to read
+
+    Returns
+    -------
+    mbi.GraphicalModel
+        fitted model, with marginals recomputed from its potentials
+    dict
+        support of each attribute
+    """
+
+    with np.load(path) as f:
+        header = json.loads(str(f["header"]))
+        saved = {
+            tuple(cl): f[f"potential_{i}"]
+            for i, cl in enumerate(header["cliques"])
+        }
+        supports = {
+            col: f[f"support_{i}"] for i, col in enumerate(header["supports"])
+        }
+
+    domain = Domain(header["attrs"], header["shape"])
+    model = GraphicalModel(domain, list(saved), header["total"])
+
+    potentials = {}
+    for cl in model.cliques:
+        key = next(k for k in saved if set(k) == set(cl))
+        potentials[cl] = Factor(domain.project(key), saved[key]).transpose(cl)
+    model.potentials = CliqueVector(potentials)
+    model.marginals = model.belief_propagation(model.potentials)
+
+    return model, supports
+
+
 def domain_from_metadata(metadata: list[dict]):
     """From the dataset metadata, return dictionary of column names and sizes
 
@@ -177,6 +515,35 @@ class MST(PipelineBase):
         privacy budget parameter
     delta : float
         privacy parameter
+    iters : int, optional
+        maximum mirror descent iterations of the final estimate, by default
+        1000
+    select_iters : int, optional
+        mirror descent iterations of the selection-stage estimate, by default
+        50
+    warm_start : bool, optional
+        if True, the final estimate starts from the selection-stage
+        potentials, by default True
+    tol : float, optional
+        relative loss tolerance for stopping the final estimate early, by
+        default None, which always runs ``iters`` iterations
+    backend : str, optional
+        ``FactoredInference`` backend, one of ``BACKENDS``, by default
+        "numpy". There is no JAX backend: ``FactoredInference`` in the
+        pinned private-pgm only runs on numpy or torch, so the ``jax`` extra
+        does not change MST.
+    initial_model : mbi.GraphicalModel, optional
+        a model fitted on the same data, e.g. at a nearby epsilon in a sweep,
+        used to warm start the final estimate, see :func:`seed_engine`
+
+    Attributes
+    ----------
+    initial_model : mbi.GraphicalModel | None
+        the ``initial_model`` parameter, kept out of ``params``
+    model : mbi.GraphicalModel
+        the fitted model, over the compressed domain
+    supports : dict
+        support of each attribute in the compressed domain
 
     Notes
     -----
@@ -193,8 +560,38 @@ class MST(PipelineBase):
 
     generator = staticmethod(mst)
 
-    def __init__(self, epsilon=1.0, delta=1e-9, **kw):
-        parameters = {"epsilon": epsilon, "delta": delta}
+    def __init__(
+        self,
+        epsilon=1.0,
+        delta=1e-9,
+        iters=1000,
+        select_iters=50,
+        warm_start=True,
+        tol=None,
+        backend="numpy",
+        initial_model=None,
+        **kw,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"backend must be one of {BACKENDS}")
+        if backend == "torch" and not TORCH:
+            raise ValueError("The torch backend needs torch installed")
+
+        parameters = {
+            "epsilon": epsilon,
+            "delta": delta,
+            "iters": iters,
+            "select_iters": select_iters,
+            "warm_start": warm_start,
+            "tol": tol,
+            "backend": backend,
+        }
+
+        # a fitted model is state, like self.model, not a setting in params
+        self.initial_model = initial_model
+        self.model = None
+        self.supports = None
+
         super().__init__(**kw, **parameters)
 
     def preprocess(self):
@@ -213,24 +610,91 @@ class MST(PipelineBase):
             self.encoded_dataset, Domain.fromdict(self.domain)
         )
 
-    def generate(self):
-        """See generator function :func:`mst`"""
+    def estimate_cost(self):
+        """Memory and compute of :func:`mst_fit`, before the domain is
+        compressed.
 
-        self.output = self.generator(
-            self.encoded_dataset,
-            self.params["epsilon"],
-            self.params["delta"],
-            self.size,
-        )
+        Selection counts every 2-way marginal of the data and of the
+        1-way estimate, and the final estimate keeps its potentials,
+        marginals, gradients and messages over the cliques of a spanning
+        tree, of at most the 2-way marginals around the largest column.
+        """
+
+        sizes = list(domain_from_metadata(self.dataset.metadata).values())
+        rows = len(self.dataset.data)
+        candidates = len(sizes) * (len(sizes) - 1) // 2
+        pairs, tree = pair_cells(sizes), tree_cells(sizes)
+        data = len(sizes) * (rows + self.size)
+
+        return {
+            "memory": BYTES_PER_CELL * (2 * data + max(2 * pairs, 4 * tree)),
+            "compute": (
+                rows * (len(sizes) + candidates)
+                + self.params["select_iters"] * sum(sizes)
+                + 4 * self.params["iters"] * tree
+                + data
+            ),
+            "pair_cells": pairs,
+            "tree_cells": tree,
+        }
+
+    def generate(self, refit=False):
+        """Fits the model with :func:`mst_fit` and samples from it. See
+        generator function :func:`mst`
+
+        Sampling from a fitted model is post-processing, so it spends no
+        further privacy budget.
+
+        Parameters
+        ----------
+        refit : bool, optional
+            If true refits the model, otherwise samples from ``self.model``
+            when there is one, e.g. after :meth:`load_model`
+        """
+
+        if (self.model is None) or refit:
+            self.model, self.supports = mst_fit(
+                self.encoded_dataset,
+                self.params["epsilon"],
+                self.params["delta"],
+                iters=self.params["iters"],
+                select_iters=self.params["select_iters"],
+                warm_start=self.params["warm_start"],
+                tol=self.params["tol"],
+                backend=self.params["backend"],
+                initial_model=self.initial_model,
+                timer=self.timer,
+                progress=self.progress_reporter,
+            )
+
+        with self.timer("sample"):
+            self.output = reverse_data(
+                self.model.synthetic_data(self.size), self.supports
+            )
         return self.output
 
+    def is_fitted(self):
+        return self.model is not None
+
     def postprocess(self):
         """Decodes output using :func:`decode_ordinal`"""
 
         self.output = decode_ordinal(self.output.df, self.encoders)
 
-    def save(self, domain_fn="domain.json"):
+    def save(self, append=False, domain_fn="domain.json"):
         """Saves output, additional saves domain json"""
-        super().save()
-        with open(self.output_dir / domain_fn, "w") as outfile:
-            json.dump(self.domain, outfile)
+        super().save(append=append)
+        if not append:
+            with open(self.output_dir / domain_fn, "w") as outfile:
+                json.dump(self.domain, outfile)
+
+    def save_model(self, path):
+        """Saves the fitted model, see :func:`save_graphical_model`"""
+
+        save_graphical_model(path, self.model, self.supports)
+
+    def load_model(self, path):
+        """Loads a model saved by :meth:`save_model`, so that
+        :meth:`generate` samples from it without refitting"""
+
+        self.model, self.supports = load_graphical_model(path)
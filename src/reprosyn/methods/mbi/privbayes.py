@@ -3,6 +3,7 @@ import json
 
 import numpy as np
 import pandas as pd
+from scipy import sparse
 
 from mbi import Dataset, Domain, Factor
 
@@ -117,8 +118,60 @@ def domain_from_metadata(metadata: list[dict]):
     return {col["name"]: len(col["representation"]) for col in metadata}
 
 
+def save_measurements(path, measurements, domain):
+    """Saves noisy PrivBayes measurements to a compressed ``.npz`` file.
+
+    Parameters
+    ----------
+    path : str | Path
+        file to write
+    measurements : list[tuple]
+        noisy measurements ``(Q, y, sigma, proj)``, see
+        :func:`privbayes_measurements`
+    domain : dict
+        dictionary of feature:size
+    """
+
+    header = {
+        "domain": {k: int(v) for k, v in domain.items()},
+        "projections": [list(proj) for _, _, _, proj in measurements],
+    }
+    arrays = {f"y_{i}": y for i, (_, y, _, _) in enumerate(measurements)}
+
+    with open(path, "wb") as f:
+        np.savez_compressed(f, header=json.dumps(header), **arrays)
+
+
+def load_measurements(path):
+    """Loads measurements saved by :func:`save_measurements`.
+
+    Returns
+    -------
+    list[tuple]
+        noisy measurements ``(Q, y, sigma, proj)``
+    dict
+        dictionary of feature:size
+    """
+
+    with np.load(path) as f:
+        header = json.loads(str(f["header"]))
+        measurements = [
+            (sparse.eye(f[f"y_{i}"].size), f[f"y_{i}"], 1.0, tuple(proj))
+            for i, proj in enumerate(header["projections"])
+        ]
+
+    return measurements, header["domain"]
+
+
 class PRIVBAYES(PipelineBase):
-    """Generator class for the PRIVBAYES mechanism."""
+    """Generator class for the PRIVBAYES mechanism.
+
+    Attributes
+    ----------
+    measurements : list[tuple]
+        the noisy conditional measurements, see
+        :func:`privbayes_measurements`
+    """
 
     generator = staticmethod(privbayes)
 
@@ -127,6 +180,9 @@ class PRIVBAYES(PipelineBase):
             "epsilon": epsilon,
             "seed": seed,
         }
+
+        self.measurements = None
+
         super().__init__(**kw, **parameters)
 
     def preprocess(self):
@@ -138,19 +194,48 @@ class PRIVBAYES(PipelineBase):
 
         self.encoded_dataset = Dataset(df, Domain.fromdict(self.domain))
 
-    def generate(self):
-        self.output = self.generator(
-            self.encoded_dataset,
-            self.params["epsilon"],
-            self.params["seed"],
-            self.size,
+    def generate(self, refit=False):
+        """Measures with :func:`privbayes_measurements` and samples with
+        :func:`privbayes_inference`. See generator function :func:`privbayes`
+
+        Parameters
+        ----------
+        refit : bool, optional
+            If true remeasures, otherwise samples from ``self.measurements``
+            when there are some, e.g. after :meth:`load_model`
+        """
+
+        if (self.measurements is None) or refit:
+            self.measurements = privbayes_measurements(
+                self.encoded_dataset,
+                self.params["epsilon"],
+                self.params["seed"],
+            )
+
+        self.output = privbayes_inference(
+            self.encoded_dataset.domain, self.measurements, self.size
         )
         return self.output
 
+    def is_fitted(self):
+        return self.measurements is not None
+
     def postprocess(self):
         self.output = decode_ordinal(self.output.df, self.encoders)
 
-    def save(self, domain_fn="domain.json"):
-        super().save()
-        with open(self.output_dir / domain_fn, "w") as outfile:
-            json.dump(self.domain, outfile)
+    def save(self, append=False, domain_fn="domain.json"):
+        super().save(append=append)
+        if not append:
+            with open(self.output_dir / domain_fn, "w") as outfile:
+                json.dump(self.domain, outfile)
+
+    def save_model(self, path):
+        """Saves the noisy measurements, see :func:`save_measurements`"""
+
+        save_measurements(path, self.measurements, self.domain)
+
+    def load_model(self, path):
+        """Loads measurements saved by :meth:`save_model`, so that
+        :meth:`generate` samples from them without remeasuring"""
+
+        self.measurements, _ = load_measurements(path)
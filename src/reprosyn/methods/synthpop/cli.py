@@ -1,6 +1,6 @@
 import click
 
-from reprosyn.cli_utils import wrap_generator
+from reprosyn.cli_utils import run_generator, wrap_generator
 from reprosyn.methods.synthpop.synthpop import SYNTHPOP
 
 
@@ -25,5 +25,5 @@ def cmd_spop(ctx, **kwargs):
     See rsyn synthpop --help for general use.
     """
     generator = SYNTHPOP(**ctx.parent.params, **kwargs)
-    generator.run()
+    run_generator(generator)
     return generator.output
@@ -1,5 +1,9 @@
+import math
+
 from synthpop import Synthpop
 
+from reprosyn.costs import BYTES_PER_CELL
+
 from reprosyn.generator import PipelineBase
 from reprosyn.dataset import Dataset
 
@@ -73,6 +77,26 @@ class SYNTHPOP(PipelineBase):
 
         super().__init__(**kw, **parameters)
 
+    def estimate_cost(self):
+        """Memory and compute of fitting one CART per column, on all the
+        columns before it in the visit sequence.
+
+        Trees are grown until their leaves are pure, so each can hold as
+        many nodes as there are rows.
+        """
+
+        rows, width = len(self.dataset.data), len(self.dataset.metadata)
+        depth = math.log2(max(rows, 2))
+        data = width * (rows + self.size)
+        # a tree node holds about as much as a row of a few cells
+        trees = 4 * width * rows
+
+        return {
+            "memory": BYTES_PER_CELL * (2 * data + trees),
+            "compute": rows * depth * width * (width - 1) / 2
+            + self.size * depth * width,
+        }
+
     def preprocess(self):
         """Saves pandas dtypes using :func:`Dataset.dtypes_from_metadata`"""
 
@@ -0,0 +1,107 @@
+"""Profiling of whole runs, used by ``rsyn --profile``.
+
+:class:`RunProfiler` wraps either the deterministic ``cProfile``, or the
+sampling profiler `pyinstrument <https://github.com/joerick/pyinstrument>`_
+when it is installed, whose overhead is low enough for production jobs.
+"""
+
+import cProfile
+import io
+import pathlib
+import pstats
+
+try:
+    import pyinstrument
+
+    PYINSTRUMENT = True
+except ImportError:
+    PYINSTRUMENT = False
+
+
+PROFILERS = ("auto", "cprofile", "pyinstrument")
+
+
+class RunProfiler:
+    """Profiles the code run between :meth:`start` and :meth:`stop`.
+
+    Parameters
+    ----------
+    profiler : str, optional
+        one of ``PROFILERS``, by default "auto", which uses pyinstrument if
+        it is installed and cProfile otherwise
+    top : int, optional
+        number of functions in the text summary, by default 30
+
+    Raises
+    ------
+    ValueError
+        If pyinstrument is asked for but not installed.
+    """
+
+    def __init__(self, profiler="auto", top=30):
+        if profiler not in PROFILERS:
+            raise ValueError(f"profiler must be one of {PROFILERS}")
+        if profiler == "pyinstrument" and not PYINSTRUMENT:
+            raise ValueError("pyinstrument is not installed")
+        if profiler == "auto":
+            profiler = "pyinstrument" if PYINSTRUMENT else "cprofile"
+
+        self.profiler = profiler
+        self.top = top
+        if profiler == "pyinstrument":
+            self._profiler = pyinstrument.Profiler()
+        else:
+            self._profiler = cProfile.Profile()
+
+    def start(self):
+        if self.profiler == "pyinstrument":
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self):
+        if self.profiler == "pyinstrument":
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+    def save(self, out, fn="profile"):
+        """Writes the profile and its text summary to directory ``out``.
+
+        cProfile writes ``<fn>.prof``, readable by ``pstats`` or snakeviz,
+        and pyinstrument writes ``<fn>.html``. Both write ``<fn>.txt``, the
+        top functions by own and cumulative time for cProfile, or the call
+        tree for pyinstrument.
+
+        Returns
+        -------
+        list[pathlib.Path]
+            files written
+        """
+
+        out = pathlib.Path(out)
+        summary = out / f"{fn}.txt"
+
+        if self.profiler == "pyinstrument":
+            profile = out / f"{fn}.html"
+            profile.write_text(self._profiler.output_html())
+            summary.write_text(
+                self._profiler.output_text(unicode=False, color=False)
+            )
+        else:
+            profile = out / f"{fn}.prof"
+            self._profiler.dump_stats(profile)
+            summary.write_text(self.summary())
+
+        return [profile, summary]
+
+    def summary(self):
+        """The ``top`` functions of a cProfile run, by own and by cumulative
+        time."""
+
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=stream)
+        for sort in ["tottime", "cumulative"]:
+            stream.write(f"Top {self.top} functions by {sort}\n")
+            stats.sort_stats(sort).print_stats(self.top)
+        return stream.getvalue()
@@ -0,0 +1,92 @@
+"""Per-run limits on the threads used by numerical backends.
+
+By default TensorFlow, torch and the BLAS libraries behind numpy each size
+their thread pools to every core of the host, which oversubscribes the CPU
+when several runs share a node. :func:`configure_threads` caps all of them
+for the current process.
+
+Backends are only configured if they are already imported, so this module
+never pulls in TensorFlow or torch by itself. Environment variables are set
+as well, which covers backends loaded afterwards and child processes.
+"""
+
+import os
+import sys
+import warnings
+
+try:
+    from threadpoolctl import threadpool_limits
+
+    THREADPOOLCTL = True
+except ImportError:
+    THREADPOOLCTL = False
+
+
+# variables read by BLAS/OpenMP runtimes when they are loaded
+BLAS_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+def configure_threads(threads=None, interop_threads=None):
+    """Limits the thread pools of BLAS, TensorFlow and torch.
+
+    Parameters
+    ----------
+    threads : int, optional
+        threads used within an operation (intra-op), and by BLAS, by
+        default None, which leaves them unchanged
+    interop_threads : int, optional
+        threads running independent operations concurrently (inter-op), by
+        default None, which leaves them unchanged
+
+    Notes
+    -----
+    TensorFlow and torch only accept some of these settings before their
+    runtime starts. Settings that come too late are skipped with a warning.
+    """
+
+    if threads is not None:
+        for var in BLAS_ENV_VARS:
+            os.environ[var] = str(threads)
+        os.environ["TF_NUM_INTRAOP_THREADS"] = str(threads)
+        if THREADPOOLCTL:
+            # applies to BLAS libraries that are already loaded
+            threadpool_limits(limits=threads)
+
+    if interop_threads is not None:
+        os.environ["TF_NUM_INTEROP_THREADS"] = str(interop_threads)
+
+    if "tensorflow" in sys.modules:
+        _configure_tensorflow(
+            sys.modules["tensorflow"], threads, interop_threads
+        )
+
+    if "torch" in sys.modules:
+        _configure_torch(sys.modules["torch"], threads, interop_threads)
+
+
+def _configure_tensorflow(tf, threads, interop_threads):
+    threading = tf.config.threading
+    try:
+        if threads is not None:
+            threading.set_intra_op_parallelism_threads(threads)
+        if interop_threads is not None:
+            threading.set_inter_op_parallelism_threads(interop_threads)
+    except RuntimeError as err:
+        warnings.warn(f"TensorFlow thread settings not applied: {err}")
+
+
+def _configure_torch(torch, threads, interop_threads):
+    if threads is not None:
+        torch.set_num_threads(threads)
+    if interop_threads is not None:
+        try:
+            torch.set_interop_threads(interop_threads)
+        except RuntimeError as err:
+            warnings.warn(f"torch inter-op threads not applied: {err}")
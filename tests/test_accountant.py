@@ -0,0 +1,25 @@
+""" Tests that the fast accountant agrees with cdp2adp """
+
+import numpy as np
+
+from reprosyn.methods.mbi import accountant, cdp2adp
+
+params = [(0.1, 1e-9), (1.0, 1e-9), (10.0, 1e-5), (1.0, 0.5)]
+
+
+def test_cdp_rho_matches():
+    for eps, delta in params:
+        assert accountant.cdp_rho(eps, delta) == cdp2adp.cdp_rho(eps, delta)
+
+
+def test_cdp_rho_tolerance_is_conservative():
+    for eps, delta in params:
+        rho = accountant.cdp_rho(eps, delta, tol=1e-4)
+        assert rho <= cdp2adp.cdp_rho(eps, delta)
+        assert cdp2adp.cdp_delta(rho, eps) <= delta
+
+
+def test_cdp_rho_array():
+    eps, delta = np.array(params).T
+    expected = [accountant.cdp_rho(e, d) for e, d in params]
+    assert np.allclose(accountant.cdp_rho_array(eps, delta), expected)
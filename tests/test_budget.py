@@ -0,0 +1,28 @@
+""" Tests that the privacy ledger composes and refuses over-budget runs """
+
+import pytest
+
+from reprosyn.budget import BudgetExceededError, PrivacyLedger, zcdp_rho
+
+
+def test_ledger_composes(tmp_path):
+    ledger = PrivacyLedger(tmp_path / "ledger.db", epsilon=2.0)
+
+    ledger.charge("census", epsilon=1.0, method="PRIVBAYES")
+    ledger.charge("census", epsilon=1.0, method="PRIVBAYES")
+
+    assert ledger.spent("census") == pytest.approx(2 * zcdp_rho(1.0))
+    assert ledger.spent("other") == 0.0
+    assert len(ledger.history("census")) == 2
+
+
+def test_ledger_refuses_over_budget(tmp_path):
+    ledger = PrivacyLedger(tmp_path / "ledger.db", epsilon=1.0)
+    ledger.charge("census", epsilon=0.9)
+
+    with pytest.raises(BudgetExceededError):
+        ledger.charge("census", epsilon=0.9)
+
+    # persisted, and the refused run was not recorded
+    reopened = PrivacyLedger(tmp_path / "ledger.db", epsilon=1.0)
+    assert reopened.spent("census") == pytest.approx(zcdp_rho(0.9))
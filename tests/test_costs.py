@@ -0,0 +1,45 @@
+""" Tests that runs are refused, or only estimated, before they start """
+
+import json
+
+import pandas as pd
+import pytest
+
+from reprosyn.cli_utils import run_generator
+from reprosyn.costs import ResourceLimitError, format_size, parse_size
+from tests.custom_method import RAW
+
+metadata = [{"name": "A", "type": "finite", "representation": ["a", "b"]}]
+dummy = pd.DataFrame({"A": ["a", "b"] * 50})
+
+
+def test_sizes():
+    assert parse_size("512M") == 512 * 2**20
+    assert parse_size("1.5gb") == 3 * 2**29
+    assert parse_size(1000) == 1000
+    assert format_size(3 * 2**29) == "1.5G"
+    with pytest.raises(ValueError):
+        parse_size("lots")
+
+
+def test_max_memory(tmp_path):
+    gen = RAW(
+        dataset=dummy.copy(), metadata=metadata, out=tmp_path, max_memory=1
+    )
+    with pytest.raises(ResourceLimitError):
+        gen.run()
+    assert gen.output is None
+
+
+def test_dry_run(tmp_path, capsys):
+    gen = RAW(
+        dataset=dummy.copy(), metadata=metadata, out=tmp_path, dry_run=True
+    )
+    estimate = gen.run()
+
+    assert estimate == {"method": "RAW", **gen.estimate_cost()}
+    assert capsys.readouterr().out == ""
+
+    run_generator(gen)
+    assert json.loads(capsys.readouterr().out) == estimate
+    assert not (tmp_path / "output.csv").exists()
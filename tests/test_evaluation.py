@@ -0,0 +1,48 @@
+""" Tests that the evaluation metrics agree with direct pandas computations """
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from reprosyn.evaluation import Evaluator
+
+rng = np.random.default_rng(0)
+n = 2000
+real = pd.DataFrame(
+    {
+        "a": rng.integers(0, 5, n),
+        "b": rng.choice(["x", "y", None], n),
+        "age": rng.normal(40, 10, n),
+    }
+)
+real["c"] = real["a"] * 2 + rng.integers(0, 2, n)
+synthetic = real.assign(a=rng.permutation(real["a"].to_numpy()))
+
+
+def test_identical_data_scores_zero():
+    scores = Evaluator(real).score(real.sample(frac=1, random_state=0))
+
+    assert set(scores) == {
+        "tvd_1",
+        "tvd_2",
+        "tvd_3",
+        "mutual_information_diff",
+        "cramers_v_diff",
+        "correlation_diff",
+        "pmse",
+    }
+    assert all(v == pytest.approx(0.0) for v in scores.values())
+
+
+def test_marginal_tvd():
+    evaluator = Evaluator(real, propensity=False)
+    tvd = evaluator.marginal_tvd(synthetic, k=2)
+
+    for a, b in [("a", "b"), ("a", "c"), ("b", "c")]:
+        p = real.groupby([a, b], dropna=False).size() / n
+        q = synthetic.groupby([a, b], dropna=False).size() / n
+        expected = p.sub(q, fill_value=0).abs().sum() / 2
+        assert tvd[(a, b)] == pytest.approx(expected)
+
+    assert tvd[("b", "c")] == 0.0
+    assert evaluator.score(synthetic)["tvd_2"] == pytest.approx(tvd.mean())
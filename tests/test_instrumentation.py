@@ -0,0 +1,78 @@
+""" Tests that runs record per-stage statistics """
+
+import json
+
+import pandas as pd
+
+from reprosyn.instrumentation import ProgressReporter
+from tests.custom_method import RAW
+
+metadata = [{"name": "A", "type": "finite", "representation": ["a", "b"]}]
+dummy = pd.DataFrame({"A": ["a", "b"] * 50})
+
+
+class TimedRAW(RAW):
+    def generate(self):
+        with self.timer("sample"):
+            super().generate()
+
+
+def test_run_stats(tmp_path):
+    gen = TimedRAW(
+        dataset=dummy.copy(),
+        metadata=metadata,
+        size=50,
+        out=tmp_path,
+        stats=True,
+    )
+    gen.run()
+
+    stages = ["preprocess", "generate", "generate.sample", "postprocess"]
+    assert set(gen.run_stats) == set(stages + ["save", "run"])
+    assert gen.run_stats["generate"]["calls"] == 1
+    assert gen.run_stats["save"]["rows"] == 50
+    if gen.run_stats["run"]["peak_rss"] is not None:
+        assert all(
+            0 <= entry["peak_rss_increase"] <= entry["peak_rss"]
+            for entry in gen.run_stats.values()
+        )
+    assert gen.run_stats["run"]["wall_time"] >= sum(
+        gen.run_stats[stage]["wall_time"] for stage in ["generate", "save"]
+    )
+
+    with open(tmp_path / "run_stats.jsonl") as f:
+        records = [json.loads(line) for line in f]
+    assert [r["stage"] for r in records] == list(gen.run_stats)
+    assert all(r["method"] == "TimedRAW" for r in records)
+
+
+def test_run_stats_chunked(tmp_path):
+    gen = RAW(
+        dataset=dummy.copy(),
+        metadata=metadata,
+        size=50,
+        out=tmp_path,
+        chunksize=10,
+    )
+    gen.run()
+
+    # one call per chunk, plus the one finding iter_generate exhausted
+    assert gen.run_stats["generate"]["calls"] == 2
+    assert gen.run_stats["save"]["calls"] == 1
+    assert not (tmp_path / "run_stats.jsonl").exists()
+
+
+def test_progress_reporter():
+    events = []
+    reporter = ProgressReporter(events.append, "fit", total=10, start=4)
+    reporter.update(loss=0.5, rows=100)
+    reporter.update(2)
+
+    assert [e["iteration"] for e in events] == [5, 7]
+    assert events[0]["loss"] == 0.5 and events[1]["loss"] is None
+    assert events[-1]["eta"] >= 0
+    assert events[-1]["rows_per_sec"] > 0
+
+    silent = ProgressReporter(None, "fit")
+    silent.update()
+    assert not silent.enabled and silent.iteration == 1
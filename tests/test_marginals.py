@@ -0,0 +1,74 @@
+""" Tests that the contingency engine agrees with direct counting """
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mutual_info_score, normalized_mutual_info_score
+
+from reprosyn.marginals import (
+    marginal_tables,
+    mutual_information,
+    pairwise_marginals,
+)
+from reprosyn.methods.data_synthesiser.data_synthesiser_utils.utils import (
+    pairwise_attributes_mutual_information,
+)
+
+rng = np.random.default_rng(0)
+shape = (3, 5, 2, 7)
+values = np.stack([rng.integers(0, s, 1000) for s in shape], axis=1)
+
+
+def direct_counts(a, b):
+    counts = np.zeros((shape[a], shape[b]), dtype=int)
+    np.add.at(counts, (values[:, a], values[:, b]), 1)
+    return counts
+
+
+def test_pairwise_marginals():
+    marginals = pairwise_marginals(values, shape)
+
+    assert len(marginals) == 6
+    for (a, b), counts in marginals.items():
+        assert np.array_equal(counts, direct_counts(a, b))
+
+
+def test_pairwise_marginals_chunked_threads():
+    marginals = pairwise_marginals(values, shape, chunksize=37, workers=4)
+
+    for (a, b), counts in marginals.items():
+        assert np.array_equal(counts, direct_counts(a, b))
+
+
+def test_marginal_tables_mutual_information():
+    marginals = [(1, 3), (0, 2, 3), (2, 0)]
+    tables = marginal_tables(values, shape, marginals)
+
+    assert [t.shape for t in tables] == [(5, 7), (3, 2, 7), (2, 3)]
+    assert np.array_equal(tables[2], direct_counts(2, 0))
+
+    # the parents of (0, 2, 3) together, as one column
+    parents = values[:, 0] * shape[2] + values[:, 2]
+    expected = [
+        mutual_info_score(values[:, 1], values[:, 3]),
+        mutual_info_score(parents, values[:, 3]),
+        mutual_info_score(values[:, 2], values[:, 0]),
+    ]
+    assert np.allclose(mutual_information(values, shape, marginals), expected)
+
+
+def test_pairwise_attributes_mutual_information():
+    df = pd.DataFrame(values, columns=list("dcba"))
+    df["constant"] = "x"
+    df["missing"] = df["b"].where(df["a"] > 2)
+
+    mi = pairwise_attributes_mutual_information(df, workers=2)
+
+    assert list(mi.columns) == sorted(df.columns)
+    for row in mi.index:
+        for col in mi.columns:
+            expected = normalized_mutual_info_score(
+                [str(v) for v in df[row]],
+                [str(v) for v in df[col]],
+                average_method="arithmetic",
+            )
+            assert np.isclose(mi.loc[row, col], expected)
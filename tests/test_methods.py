@@ -2,6 +2,7 @@
 
 import pandas as pd
 import numpy as np
+import pytest
 from reprosyn.methods import (
     IPF,
     MST,
@@ -13,6 +14,8 @@ from reprosyn.methods import (
     DS_PRIVBAYES,
     SYNTHPOP,
 )
+from reprosyn.methods.ipf.ipf import get_margin_grids, sinkhorn_tensor
+from reprosyn.methods.ipf.junction_tree import JunctionTree
 
 
 def choice(arr, n):
@@ -78,6 +81,27 @@ def test_ipf():
     check_output(ipf.output)
 
 
+def test_ipf_junction_tree():
+    kw = dict(dataset=dummy.copy(), metadata=metadata, size=synth_size)
+    auto = IPF(**kw)
+    auto.run()
+    check_output(auto.output)
+    assert all(len(m) <= 3 for m in auto.marginals)
+
+    # the dense and junction tree fits agree
+    dense = IPF(**kw, marginals=[(0, 1), (1, 2)], dense=True)
+    dense.preprocess()
+    grids = get_margin_grids(
+        dense.data_array, dense.count_matrix, dense.marginals
+    )
+    fitted = sinkhorn_tensor((dense.count_matrix * 0 + 1).astype(int), grids)
+    tree = JunctionTree(dense.marginals, dense.shape).fit(grids)
+
+    for c, clique in enumerate(tree.cliques):
+        dropped = tuple(set(range(3)) - set(clique))
+        assert np.allclose(fitted.sum(axis=dropped), tree.beliefs[c])
+
+
 def test_mst():
     mst = MST(
         dataset=dummy.copy(),
@@ -88,6 +112,65 @@ def test_mst():
     mst.run()
     check_output(mst.output)
 
+    with pytest.raises(ValueError, match="backend"):
+        MST(dataset=dummy.copy(), metadata=metadata, backend="cupy")
+
+
+def test_mst_inference_options():
+    kw = dict(
+        dataset=dummy.copy(),
+        metadata=metadata,
+        size=synth_size,
+        epsilon=epsilon,
+    )
+
+    cold = MST(warm_start=False, iters=100, **kw)
+    cold.run()
+    check_output(cold.output)
+
+    # any loss decrease is within a tolerance of 1, so the estimate stops
+    # at the second convergence check, long before iters
+    events = []
+    early = MST(tol=1.0, iters=1000, progress=events.append, **kw)
+    early.run()
+    check_output(early.output)
+    iterations = [
+        e["iteration"] for e in events if e["stage"] == "generate.estimate"
+    ]
+    assert max(iterations) < 1000
+
+
+def test_mst_initial_model():
+    from mbi import Domain, FactoredInference
+
+    from reprosyn.methods.mbi.mst import seed_engine
+
+    kw = dict(
+        dataset=dummy.copy(),
+        metadata=metadata,
+        size=synth_size,
+        epsilon=epsilon,
+    )
+    fitted = MST(**kw)
+    fitted.run()
+    model = fitted.model
+
+    # potentials over an attribute compressed differently are dropped
+    shape = [
+        n + 1 if attr == "A" else n
+        for attr, n in zip(model.domain.attrs, model.domain.shape)
+    ]
+    engine = FactoredInference(Domain(model.domain.attrs, shape))
+    seed_engine(engine, model)
+    assert engine.warm_start
+    assert set(engine.model.potentials) == {
+        cl for cl in model.potentials if "A" not in cl
+    }
+
+    seeded = MST(initial_model=model, iters=100, **kw)
+    seeded.run()
+    check_output(seeded.output)
+
 
 def test_privbayes():
     pb = PRIVBAYES(dataset=dummy.copy(), metadata=metadata, size=synth_size)
@@ -95,12 +178,53 @@ def test_privbayes():
     check_output(pb.output)
 
 
+def test_privbayes_save_load(tmp_path, monkeypatch):
+    from reprosyn.methods.mbi import privbayes
+
+    kw = dict(
+        dataset=dummy.copy(), metadata=metadata, size=synth_size, out=tmp_path
+    )
+    pb = PRIVBAYES(**kw)
+    pb.run()
+    pb.save_model(tmp_path / "measurements.npz")
+
+    def remeasure(*args):
+        raise AssertionError("loaded measurements were remeasured")
+
+    monkeypatch.setattr(privbayes, "privbayes_measurements", remeasure)
+
+    loaded = PRIVBAYES(**kw)
+    loaded.load_model(tmp_path / "measurements.npz")
+    assert loaded.is_fitted()
+    for (_, y, _, proj), (_, saved, _, saved_proj) in zip(
+        loaded.measurements, pb.measurements
+    ):
+        assert proj == tuple(saved_proj)
+        assert np.array_equal(y, saved)
+
+    loaded.run()
+    check_output(loaded.output)
+
+
 def test_ctgan():
     ctgan = CTGAN(dataset=dummy.copy(), metadata=metadata, size=synth_size)
     ctgan.run()
     check_output(ctgan.output)
 
 
+def test_ctgan_save_load(tmp_path):
+    params = dict(metadata=metadata, size=synth_size, epochs=2, out=tmp_path)
+    ctgan = CTGAN(dataset=dummy.copy(), **params)
+    ctgan.run()
+    ctgan.save_model(tmp_path / "ctgan.pkl")
+
+    loaded = CTGAN(dataset=dummy.copy(), **params)
+    loaded.load_model(tmp_path / "ctgan.pkl")
+    assert loaded.is_fitted()
+    loaded.generate(refit=False)
+    check_output(loaded.output)
+
+
 def test_PATEGAN():
     gen = PATEGAN(
         dataset=dummy.copy(),
@@ -111,6 +235,21 @@ def test_PATEGAN():
     gen.run()
     check_output(gen.output)
 
+    empty = gen.gen.generate_samples(0)
+    assert empty.shape == (0, len(names))
+    assert list(empty.columns) == names
+
+
+def test_PATEGAN_few_rows():
+    gen = PATEGAN(
+        dataset=dummy.head(5).copy(),
+        metadata=metadata,
+        size=synth_size,
+        num_teachers=10,
+    )
+    with pytest.raises(ValueError, match="one row per teacher"):
+        gen.run()
+
 
 def test_SYNTHPOP():
 
@@ -141,3 +280,164 @@ def test_DS_PRIVBAYES():
     )
     gen.run()
     check_output(gen.output)
+
+
+def test_mst_save_load(tmp_path):
+    mst = MST(
+        dataset=dummy.copy(),
+        metadata=metadata,
+        size=synth_size,
+        epsilon=epsilon,
+        out=tmp_path,
+    )
+    mst.run()
+    mst.save_model(tmp_path / "model.npz")
+
+    loaded = MST(
+        dataset=dummy.copy(),
+        metadata=metadata,
+        size=synth_size,
+        out=tmp_path,
+    )
+    loaded.load_model(tmp_path / "model.npz")
+    loaded.run()
+    check_output(loaded.output)
+
+
+def test_PATEGAN_checkpoint(tmp_path):
+    params = dict(
+        dataset=dummy.copy(),
+        metadata=metadata,
+        size=synth_size,
+        batch_size=100,
+        n_iters=20,
+        checkpoint_dir=str(tmp_path / "ckpt"),
+        checkpoint_every=10,
+        out=tmp_path,
+    )
+    gen = PATEGAN(**params)
+    gen.run()
+    gen.save_model(str(tmp_path / "generator"))
+
+    resumed = PATEGAN(**params)
+    resumed.run()
+    assert int(resumed.gen.iteration) == 20
+    check_output(resumed.output)
+
+    loaded = PATEGAN(**{**params, "checkpoint_dir": None})
+    loaded.load_model(str(tmp_path / "generator"))
+    assert loaded.is_fitted()
+    loaded.run()
+    check_output(loaded.output)
+
+
+def test_PATEGAN_refit(tmp_path):
+    events = []
+    params = dict(
+        metadata=metadata,
+        size=synth_size,
+        batch_size=100,
+        n_iters=20,
+        checkpoint_dir=str(tmp_path / "ckpt"),
+        out=tmp_path,
+        progress=events.append,
+    )
+    gen = PATEGAN(dataset=dummy.copy(), **params)
+    gen.run()
+    gen.generate(refit=True)
+    # a finished checkpoint is not resumed from on refit
+    assert len(events) == 40
+    check_output(gen.output)
+
+    other = PATEGAN(dataset=dummy.sample(frac=1).head(50), **params)
+    with pytest.raises(ValueError, match="other data"):
+        other.run()
+
+
+def test_PATEGAN_chunksize(tmp_path):
+    gen = PATEGAN(
+        dataset=dummy.copy(),
+        metadata=metadata,
+        size=synth_size,
+        batch_size=100,
+        chunksize=16,
+        out=tmp_path,
+    )
+    gen.run()
+    output = pd.read_csv(tmp_path / "output.csv", dtype=str)
+    check_output(output)
+
+
+def test_numeric_columns():
+    numeric = dummy.copy()
+    numeric["Age"] = np.random.default_rng().integers(16, 90, rows)
+    numeric_metadata = metadata + [
+        {
+            "name": "Age",
+            "type": "countable",
+            "representation": "integer",
+            "min": 0,
+            "max": 100,
+        }
+    ]
+
+    for method in [DS_INDHIST, PATEGAN]:
+        gen = method(
+            dataset=numeric.copy(),
+            metadata=numeric_metadata,
+            size=synth_size,
+        )
+        gen.run()
+        assert gen.output.shape[0] == synth_size
+        assert gen.output["Age"].between(0, 100).all()
+
+    # a range from the data is not private
+    unbounded = [dict(numeric_metadata[-1])]
+    del unbounded[0]["min"], unbounded[0]["max"]
+    with pytest.warns(UserWarning, match="not differentially private"):
+        DS_PRIVBAYES(
+            dataset=numeric.copy(),
+            metadata=metadata + unbounded,
+            size=synth_size,
+        ).preprocess()
+
+
+def test_PATEGAN_save_load(tmp_path):
+    numeric = dummy.copy()
+    numeric["Age"] = np.random.default_rng().integers(16, 90, rows)
+    age = {"name": "Age", "type": "countable", "representation": "integer"}
+
+    gen = PATEGAN(
+        dataset=numeric.copy(),
+        metadata=metadata + [{**age, "min": 0, "max": 100}],
+        size=synth_size,
+        out=tmp_path,
+    )
+    gen.run()
+    gen.save_model(str(tmp_path / "generator"))
+
+    # samples are decoded with the saved ranges, not those of the dataset
+    loaded = PATEGAN(
+        dataset=numeric.copy(),
+        metadata=metadata + [{**age, "min": 0, "max": 10}],
+        size=synth_size,
+        out=tmp_path,
+    )
+    loaded.load_model(str(tmp_path / "generator"))
+    loaded.run()
+    assert loaded.gen.metadata == gen.gen.metadata
+    assert loaded.output.shape[0] == synth_size
+    assert loaded.output["Age"].between(0, 100).all()
+
+
+def test_estimate_cost():
+    methods = [IPF, MST, CTGAN, PATEGAN, DS_INDHIST, DS_BAYNET, SYNTHPOP]
+    for method in methods:
+        gen = method(dataset=dummy.copy(), metadata=metadata, size=synth_size)
+        cost = gen.estimate_cost()
+        assert cost["memory"] > 0 and cost["compute"] > 0
+
+    ipf = IPF(
+        dataset=dummy.copy(), metadata=metadata, size=synth_size, dense=True
+    )
+    assert ipf.estimate_cost()["cells"] == 3 * 5 * 3
@@ -0,0 +1,18 @@
+""" Tests that profiles are written with a summary """
+
+import pstats
+
+from reprosyn.profiling import RunProfiler
+
+
+def test_cprofile_save(tmp_path):
+    profiler = RunProfiler("cprofile", top=5)
+    profiler.start()
+    sorted(range(10000), key=lambda x: -x)
+    profiler.stop()
+
+    profile, summary = profiler.save(tmp_path)
+
+    assert profile.name == "profile.prof"
+    assert pstats.Stats(str(profile)).total_calls > 0
+    assert "Top 5 functions by tottime" in summary.read_text()
@@ -0,0 +1,27 @@
+""" Tests that thread limits reach the environment of later backends """
+
+import os
+import sys
+
+from reprosyn import resources
+from reprosyn.resources import BLAS_ENV_VARS, configure_threads
+
+
+def test_configure_threads_env(monkeypatch):
+    # only check the environment, leave loaded backends untouched
+    monkeypatch.setattr(resources, "THREADPOOLCTL", False)
+    for module in ("tensorflow", "torch"):
+        monkeypatch.delitem(sys.modules, module, raising=False)
+    for var in BLAS_ENV_VARS + (
+        "TF_NUM_INTRAOP_THREADS",
+        "TF_NUM_INTEROP_THREADS",
+    ):
+        monkeypatch.delenv(var, raising=False)
+
+    configure_threads(threads=2)
+    assert all(os.environ[var] == "2" for var in BLAS_ENV_VARS)
+    assert os.environ["TF_NUM_INTRAOP_THREADS"] == "2"
+    assert "TF_NUM_INTEROP_THREADS" not in os.environ
+
+    configure_threads(interop_threads=1)
+    assert os.environ["TF_NUM_INTEROP_THREADS"] == "1"